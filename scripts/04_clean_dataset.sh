@@ -11,6 +11,8 @@ YELLOW='\033[1;33m'
 NC='\033[0m'
 
 WORK_DIR="$HOME/piper-training"
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+export PYTHONPATH="$SCRIPT_DIR${PYTHONPATH:+:$PYTHONPATH}"
 
 # Verificar que estamos en el entorno virtual
 if [ -z "$VIRTUAL_ENV" ]; then
@@ -20,7 +22,7 @@ fi
 
 # Solicitar ruta del dataset si no se proporciona
 if [ -z "$1" ]; then
-    echo -e "${YELLOW}Uso: $0 <ruta_al_dataset>${NC}"
+    echo -e "${YELLOW}Uso: $0 <ruta_al_dataset> [opciones de limpiar_dataset.py]${NC}"
     echo ""
     echo "Ejemplo: $0 $WORK_DIR/datasets/mi_voz"
     echo ""
@@ -74,90 +76,14 @@ echo -e "${GREEN}✅ wavs/${NC}"
 NUM_WAV=$(find wavs/ -name "*.wav" | wc -l)
 echo -e "\n📊 Archivos de audio encontrados: ${NUM_WAV}"
 
-# Ejecutar script de limpieza en Python
-echo -e "\n${YELLOW}🧹 Filtrando audios muy cortos (< 1.0s)...${NC}"
-
-python3 << 'PYEOF'
-import json
-import os
-from pathlib import Path
-import sys
-
-try:
-    import librosa
-except ImportError:
-    print("❌ Error: librosa no está instalado")
-    sys.exit(1)
-
-DATASET_DIR = Path(".")
-JSONL_PATH = DATASET_DIR / "dataset.jsonl"
-JSONL_FILTERED = DATASET_DIR / "dataset_filtered.jsonl"
-
-print(f"🔍 Analizando {JSONL_PATH}...")
-
-valid_lines = []
-rejected = 0
-MIN_DURATION = 1.0  # Segundos mínimos
-
-if not JSONL_PATH.exists():
-    print("❌ ERROR: No se encuentra dataset.jsonl")
-    sys.exit(1)
-
-with open(JSONL_PATH, 'r', encoding='utf-8') as f:
-    for line in f:
-        item = json.loads(line)
-        audio_rel = item.get('audio_file')
-        
-        if not audio_rel:
-            audio_id = item.get('id', item.get('audio_norm_file', ''))
-            if audio_id:
-                wav_path = DATASET_DIR / "wavs" / f"{audio_id}.wav"
-            else:
-                print(f"⚠️ Línea sin ID: {line[:50]}...")
-                rejected += 1
-                continue
-        else:
-            wav_path = DATASET_DIR / audio_rel
-
-        if wav_path.exists():
-            try:
-                duration = librosa.get_duration(path=str(wav_path))
-                if duration >= MIN_DURATION:
-                    valid_lines.append(line)
-                else:
-                    print(f"⚠️ Ignorando (muy corto): {wav_path.name} ({duration:.2f}s)")
-                    rejected += 1
-            except Exception as e:
-                print(f"⚠️ Ignorando (corrupto/error): {wav_path.name} - {e}")
-                rejected += 1
-        else:
-            print(f"⚠️ Ignorando (no encontrado): {wav_path}")
-            rejected += 1
-
-print(f"\n✅ Muestras válidas: {len(valid_lines)}")
-print(f"🗑️ Rechazadas: {rejected}")
-
-if len(valid_lines) == 0:
-    print("❌ ERROR: dataset vacío después del filtrado")
-    sys.exit(1)
-
-# Guardar dataset filtrado
-with open(JSONL_FILTERED, 'w', encoding='utf-8') as f:
-    f.writelines(valid_lines)
-
-# Crear backup y reemplazar solo si hubo cambios
-if rejected > 0:
-    print(f"\n🔄 Reemplazando dataset.jsonl (backup creado)...")
-    backup_path = DATASET_DIR / "dataset_backup.jsonl"
-    if backup_path.exists():
-        backup_path.unlink()
-    JSONL_PATH.rename(backup_path)
-    JSONL_FILTERED.rename(JSONL_PATH)
-    print("✅ Dataset actualizado")
-else:
-    print("\n✅ Dataset ya estaba limpio, no se requieren cambios")
-    JSONL_FILTERED.unlink()
-PYEOF
+# Filtros (se pueden ajustar con variables de entorno)
+MIN_DURATION="${MIN_DURATION:-1.0}"
+
+# Ejecutar script de limpieza en Python (argumentos extra se pasan tal cual,
+# p. ej. --max-duration 15 --max-phonemes 400 --workers 16)
+echo -e "\n${YELLOW}🧹 Filtrando audios muy cortos (< ${MIN_DURATION}s)...${NC}"
+
+python3 "$SCRIPT_DIR/limpiar_dataset.py" . --min-duration "$MIN_DURATION" "${@:2}"
 
 # Mostrar estadísticas finales
 echo -e "\n${GREEN}========================================"
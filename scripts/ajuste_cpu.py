@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Ajuste de hilos, afinidad y workers del DataLoader para entrenar en CPU
+
+Detecta los núcleos físicos y los nodos NUMA (sysfs en Linux, psutil en
+otros sistemas) y propone para el proceso de entrenamiento:
+  - hilos intra-operación (OMP_NUM_THREADS / torch.set_num_threads): uno por
+    núcleo físico, sin contar los hilos hermanos de hyperthreading
+  - hilos inter-operación (torch.set_num_interop_threads)
+  - workers del DataLoader, descontados de los núcleos de cálculo
+  - afinidad: núcleos físicos ordenados por nodo NUMA, para que un proceso
+    (o cada proceso data-parallel) quede dentro de un nodo
+
+El benchmark rápido (--benchmark) entrena unos pocos pasos con varias
+combinaciones de hilos y workers, elige la de más muestras/s y la guarda en
+~/.cache/piper-training/cpu_tuning.json; train.py la usa en esta máquina
+mientras no cambie la topología.
+
+Uso:
+    python ajuste_cpu.py                          # topología y ajuste propuesto
+    python ajuste_cpu.py dataset_procesado --benchmark
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+
+from paralelo_cpu import measure_throughput, slot_cores
+from perfiles_calidad import DEFAULT_QUALITY
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+CACHE_PATH = Path.home() / ".cache" / "piper-training" / "cpu_tuning.json"
+SYSFS_CPU = Path("/sys/devices/system/cpu")
+SYSFS_NODE = Path("/sys/devices/system/node")
+DEFAULT_BENCHMARK_STEPS = 10
+
+
+def _parse_cpulist(text):
+    """Convierte "0-3,8-11" en [0, 1, 2, 3, 8, 9, 10, 11]"""
+    cores = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-')
+            cores.extend(range(int(start), int(end) + 1))
+        else:
+            cores.append(int(part))
+    return cores
+
+
+def _read_int(path):
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def cpu_topology():
+    """
+    Núcleos lógicos, físicos y nodos NUMA utilizables por este proceso
+
+    Dentro de un hueco de barrido.py o de la cola (PIPER_CPU_CORES) solo
+    cuentan los núcleos del hueco, así que el ajuste propuesto no se sale de él.
+
+    Returns:
+        dict: logical (lista), physical (un núcleo lógico por núcleo físico,
+            ordenados por nodo NUMA), numa_nodes (lista de listas de núcleos
+            lógicos) y source ('sysfs', 'psutil' o 'os')
+    """
+    logical = slot_cores()
+    allowed = set(logical)
+
+    numa_nodes = []
+    for node in sorted(SYSFS_NODE.glob('node[0-9]*'), key=lambda p: int(p.name[4:])):
+        try:
+            cores = [c for c in _parse_cpulist((node / 'cpulist').read_text()) if c in allowed]
+        except (OSError, ValueError):
+            continue
+        if cores:
+            numa_nodes.append(cores)
+
+    physical = []
+    seen = set()
+    node_of = {c: i for i, cores in enumerate(numa_nodes) for c in cores}
+    for core in sorted(logical, key=lambda c: (node_of.get(c, 0), c)):
+        topology = SYSFS_CPU / f"cpu{core}" / "topology"
+        key = (_read_int(topology / 'physical_package_id'), _read_int(topology / 'core_id'))
+        if key == (None, None):
+            physical = []
+            break
+        if key not in seen:
+            seen.add(key)
+            physical.append(core)
+
+    if physical:
+        source = 'sysfs'
+    else:
+        # Sin sysfs: se supone que los hilos hermanos van al final de la numeración
+        count = psutil.cpu_count(logical=False) if psutil is not None else None
+        source = 'psutil' if count else 'os'
+        physical = logical[:min(count or len(logical), len(logical))]
+
+    return {
+        'logical': logical,
+        'physical': physical,
+        'numa_nodes': numa_nodes or [logical],
+        'source': source,
+    }
+
+
+def recommend_tuning(topology=None, processes=1):
+    """
+    Ajuste heurístico para ``processes`` procesos de entrenamiento
+
+    Returns:
+        dict: threads, interop_threads y dataloader_workers por proceso, y
+            cores (núcleos a repartir entre los procesos)
+    """
+    topology = topology or cpu_topology()
+    per_process = max(1, len(topology['physical']) // max(1, processes))
+    # Los datos ya están preprocesados (espectrogramas en disco): uno o dos
+    # workers bastan para que el cálculo no espere
+    workers = 0 if per_process < 4 else min(2, per_process // 4)
+    threads = max(1, per_process - workers)
+    return {
+        'threads': threads,
+        'interop_threads': max(1, min(4, threads // 4)),
+        'dataloader_workers': workers,
+        'cores': topology['physical'],
+    }
+
+
+def _machine_key(topology):
+    return {
+        'host': platform.node(),
+        'logical': len(topology['logical']),
+        'physical': len(topology['physical']),
+        'numa_nodes': len(topology['numa_nodes']),
+    }
+
+
+def load_cached_tuning(topology=None, processes=1):
+    """Resultado del benchmark guardado para esta máquina, o None"""
+    topology = topology or cpu_topology()
+    try:
+        with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('machine') != _machine_key(topology) or cached.get('processes', 1) != processes:
+        return None
+    tuning = dict(cached['tuning'], cores=topology['physical'])
+    return tuning
+
+
+def save_cached_tuning(tuning, topology, processes, results):
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        'machine': _machine_key(topology),
+        'processes': processes,
+        'tuning': {k: v for k, v in tuning.items() if k != 'cores'},
+        'results': results,
+    }
+    with open(CACHE_PATH, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+def thread_env(threads=None):
+    """
+    OMP_NUM_THREADS y MKL_NUM_THREADS para un proceso hijo de cálculo en CPU
+
+    Por defecto un hilo por núcleo físico; se respetan los valores ya
+    definidos en el entorno.
+    """
+    threads = threads or len(cpu_topology()['physical'])
+    return {key: os.environ.get(key, str(threads)) for key in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS')}
+
+
+def launcher_args(tuning):
+    """Opciones de piper_launcher.py que aplican un ajuste"""
+    args = [
+        '--threads-per-worker', str(tuning['threads']),
+        '--interop-threads', str(tuning['interop_threads']),
+        '--dataloader-workers', str(tuning['dataloader_workers']),
+    ]
+    if tuning.get('cores'):
+        args.extend(['--cpu-cores', ','.join(str(c) for c in tuning['cores'])])
+    return args
+
+
+def benchmark_tuning(dataset_dir, processes=1, batch_size=8, steps=DEFAULT_BENCHMARK_STEPS,
+                     quality=DEFAULT_QUALITY, verbose=True):
+    """
+    Prueba varias combinaciones de hilos y workers y guarda la mejor
+
+    Returns:
+        tuple: (mejor ajuste o el heurístico si ninguna prueba da datos,
+            lista de resultados)
+    """
+    topology = cpu_topology()
+    base = recommend_tuning(topology, processes)
+    per_process = max(1, len(topology['physical']) // max(1, processes))
+
+    candidates = []
+    for workers in sorted({0, base['dataloader_workers'], min(4, per_process // 2)}):
+        for threads in sorted({per_process - workers, (per_process - workers) // 2}, reverse=True):
+            if threads >= 1:
+                candidates.append(dict(base, threads=threads, dataloader_workers=workers,
+                                       interop_threads=max(1, min(4, threads // 4))))
+
+    results = []
+    for tuning in candidates:
+        result = measure_throughput(dataset_dir, processes, batch_size, steps, quality,
+                                    launcher_args=launcher_args(tuning))
+        result.update({k: v for k, v in tuning.items() if k != 'cores'})
+        results.append(result)
+        if verbose:
+            speed = result.get('samples_per_sec')
+            speed_str = f"{speed:.2f} muestras/s" if speed else ('falla' if not result['ok'] else 'sin datos')
+            print(f"  hilos {tuning['threads']:>3}  inter-op {tuning['interop_threads']}  "
+                  f"workers {tuning['dataloader_workers']}: {speed_str}")
+
+    measured = [(r, t) for r, t in zip(results, candidates) if r.get('samples_per_sec')]
+    if not measured:
+        return base, results
+    best = max(measured, key=lambda item: item[0]['samples_per_sec'])[1]
+    save_cached_tuning(best, topology, processes, results)
+    return best, results
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Muestra la topología de CPU y ajusta hilos y workers para entrenar en CPU'
+    )
+    parser.add_argument(
+        'dataset_dir',
+        nargs='?',
+        help='Dataset preprocesado (necesario con --benchmark)'
+    )
+    parser.add_argument(
+        '--benchmark',
+        action='store_true',
+        help='Probar varias combinaciones y guardar la mejor para esta máquina'
+    )
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=1,
+        help='Procesos data-parallel con los que se entrenará (por defecto: 1)'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=8,
+        help='Batch size por proceso para el benchmark (por defecto: 8)'
+    )
+    parser.add_argument(
+        '--steps',
+        type=int,
+        default=DEFAULT_BENCHMARK_STEPS,
+        help=f'Pasos por prueba del benchmark (por defecto: {DEFAULT_BENCHMARK_STEPS})'
+    )
+
+    args = parser.parse_args()
+
+    topology = cpu_topology()
+    print(f"Núcleos lógicos: {len(topology['logical'])}  físicos: {len(topology['physical'])}  "
+          f"nodos NUMA: {len(topology['numa_nodes'])} (fuente: {topology['source']})")
+    if len(topology['numa_nodes']) > 1 and args.processes == 1:
+        print(f"  Con varios nodos NUMA suele rendir más un proceso por nodo: "
+              f"--cpu-processes {len(topology['numa_nodes'])}")
+
+    if args.benchmark:
+        if not args.dataset_dir or not (Path(args.dataset_dir) / "dataset.jsonl").exists():
+            print("--benchmark necesita un dataset preprocesado (con dataset.jsonl)")
+            sys.exit(1)
+        tuning, _ = benchmark_tuning(args.dataset_dir, args.processes, args.batch_size, args.steps)
+        print(f"Mejor ajuste guardado en {CACHE_PATH}")
+    else:
+        tuning = load_cached_tuning(topology, args.processes)
+        if tuning:
+            print(f"Ajuste medido (de {CACHE_PATH}):")
+        else:
+            tuning = recommend_tuning(topology, args.processes)
+            print("Ajuste heurístico (ejecuta --benchmark para medirlo):")
+    print(f"  hilos por proceso: {tuning['threads']}")
+    print(f"  hilos inter-op: {tuning['interop_threads']}")
+    print(f"  workers del DataLoader: {tuning['dataloader_workers']}")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
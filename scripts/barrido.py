@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Barrido de hiperparámetros con varias ejecuciones de train.py en paralelo
+
+Lee una especificación (JSON, o YAML si PyYAML está instalado):
+
+    {
+      "dataset": "dataset_procesado",
+      "output": "barridos/lr_batch",
+      "mode": "grid",                      # o "random" con "samples": N
+      "base_args": {"max_epochs": 200, "quality": "medium"},
+      "params": {
+        "learning_rate": [1e-4, 2e-4, 5e-4],
+        "batch_size": [8, 16]
+      },
+      "early_stop": {"after_epochs": 20, "margin": 0.1}
+    }
+
+En modo random cada parámetro es una lista (se elige un valor) o una
+distribución: {"loguniform": [1e-5, 1e-3]}, {"uniform": [a, b]},
+{"int": [a, b]} o {"choice": [...]}. Las claves de params y base_args son
+opciones de train.py (learning_rate -> --learning-rate), salvo
+validation_split y num_test_examples: la división de dataset/splits/ es
+común a todo el barrido y se fija antes con split_dataset.py.
+
+Cada ejecución usa su propio directorio de checkpoints (output/run_NNN) y
+un hueco de hardware: una GPU (CUDA_VISIBLE_DEVICES) o, en CPU, un grupo de
+núcleos. Nunca corren más de --max-concurrent a la vez. Las métricas se leen
+del metrics.jsonl de cada ejecución. A partir de after_epochs, una ejecución
+cuya mejor val_loss supera en más de ``margin`` (10%) la del líder en la
+misma época se detiene para liberar su hueco.
+
+El estado se guarda en output/sweep.json mientras avanza el barrido.
+
+Uso:
+    python barrido.py barrido.json
+    python barrido.py barrido.yaml --gpus 0,1
+    python barrido.py barrido.json --cpu-slices 4 --max-concurrent 4
+    python barrido.py barrido.json --dry-run
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from metricas_entrenamiento import read_metrics
+from paralelo_cpu import available_cores, partition_cores, worker_env
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+TRAIN_PATH = Path(__file__).resolve().parent / "train.py"
+SWEEP_FILE = "sweep.json"
+DEFAULT_AFTER_EPOCHS = 20
+DEFAULT_MARGIN = 0.1
+POLL_INTERVAL = 2.0
+# Cambiarlas hace que train.py regenere dataset/splits/, que comparten todas
+# las ejecuciones del barrido (y sus val_loss dejarían de ser comparables)
+SPLIT_OPTIONS = ('validation_split', 'num_test_examples')
+
+
+def load_spec(path):
+    """
+    Lee la especificación del barrido
+
+    Raises:
+        ValueError: Si el archivo no se puede leer o le faltan claves
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except OSError as e:
+        raise ValueError(f"No se pudo leer {path}: {e}")
+    if str(path).endswith(('.yaml', '.yml')):
+        if yaml is None:
+            raise ValueError("Para especificaciones YAML instala PyYAML: pip install pyyaml")
+        spec = yaml.safe_load(text) or {}
+    else:
+        try:
+            spec = json.loads(text)
+        except ValueError as e:
+            raise ValueError(f"JSON inválido en {path}: {e}")
+    if not isinstance(spec, dict) or not spec.get('dataset') or not isinstance(spec.get('params'), dict):
+        raise ValueError(f"{path} debe indicar 'dataset' y un diccionario 'params'")
+    if spec.get('mode', 'grid') not in ('grid', 'random'):
+        raise ValueError(f"mode inválido: {spec['mode']} (grid o random)")
+    for section in ('params', 'base_args'):
+        fixed = [name for name in SPLIT_OPTIONS if name in (spec.get(section) or {})]
+        if fixed:
+            raise ValueError(f"{section} no puede incluir {', '.join(fixed)}: todas las ejecuciones "
+                             f"comparten la división del dataset; genérala antes con "
+                             f"split_dataset.py")
+    return spec
+
+
+def _sample_value(name, value, rng):
+    if isinstance(value, list):
+        return rng.choice(value)
+    if not isinstance(value, dict) or len(value) != 1:
+        raise ValueError(f"Parámetro {name}: se esperaba una lista o una distribución")
+    kind, bounds = next(iter(value.items()))
+    if kind == 'choice':
+        return rng.choice(bounds)
+    low, high = bounds
+    if kind == 'uniform':
+        return rng.uniform(low, high)
+    if kind == 'loguniform':
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    if kind == 'int':
+        return rng.randint(low, high)
+    raise ValueError(f"Parámetro {name}: distribución desconocida '{kind}'")
+
+
+def expand_spec(spec):
+    """
+    Combinaciones de parámetros del barrido
+
+    Returns:
+        list: Un dict {parámetro: valor} por ejecución
+    """
+    params = spec['params']
+    if spec.get('mode', 'grid') == 'random':
+        rng = random.Random(spec.get('seed', 0))
+        return [{name: _sample_value(name, value, rng) for name, value in params.items()}
+                for _ in range(int(spec.get('samples', 10)))]
+
+    names = list(params)
+    values = []
+    for name in names:
+        value = params[name]
+        if isinstance(value, dict) and list(value) == ['choice']:
+            value = value['choice']
+        if not isinstance(value, list):
+            raise ValueError(f"Parámetro {name}: en modo grid debe ser una lista de valores")
+        values.append(value)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def train_args(options):
+    """Convierte {learning_rate: 1e-4, supervise: True} en opciones de train.py"""
+    args = []
+    for name, value in options.items():
+        flag = '--' + name.replace('_', '-')
+        if value is True:
+            args.append(flag)
+        elif value is not False and value is not None:
+            args.extend([flag, str(value)])
+    return args
+
+
+def hardware_slots(gpus=None, cpu_slices=None):
+    """
+    Huecos de hardware en los que se reparten las ejecuciones
+
+    Returns:
+        list: Un dict por hueco con 'name', 'env' y 'args' para train.py
+    """
+    if gpus is None and not cpu_slices:
+        try:
+            import torch
+            if torch.cuda.is_available():
+                gpus = list(range(torch.cuda.device_count()))
+        except ImportError:
+            pass
+    if gpus:
+        return [{'name': f"gpu{gpu}",
+                 'env': {'CUDA_VISIBLE_DEVICES': str(gpu), 'HIP_VISIBLE_DEVICES': str(gpu)},
+                 'args': ['--accelerator', 'gpu', '--devices', '1']}
+                for gpu in gpus]
+
+    slots = []
+    for number, cores in enumerate(partition_cores(cpu_slices or 1, available_cores())):
+        # piper_launcher.py respeta la afinidad e hilos del entorno
+        slots.append({'name': f"cpu{number}[{cores[0]}-{cores[-1]}]",
+                      'env': worker_env(cores, len(cores)),
+                      'args': ['--accelerator', 'cpu', '--cpu-tuning', 'off']})
+    return slots
+
+
+def best_by_epoch(metrics_path):
+    """
+    Mejor val_loss acumulada al final de cada época validada
+
+    Returns:
+        dict: {época: mejor val_loss hasta esa época}
+    """
+    best = {}
+    current = math.inf
+    for record in read_metrics(metrics_path, event='val'):
+        value = record.get('val_loss')
+        if value is None or record.get('epoch') is None:
+            continue
+        current = min(current, value)
+        best[record['epoch']] = current
+    return best
+
+
+def is_losing(history, others, after_epochs, margin):
+    """
+    True si la ejecución va claramente por detrás del líder
+
+    Se compara la mejor val_loss en la última época validada con la mejor
+    del resto de ejecuciones en esa misma época (o antes).
+    """
+    if not history:
+        return False
+    epoch = max(history)
+    if epoch + 1 < after_epochs:
+        return False
+    leader = math.inf
+    for other in others:
+        reached = [e for e in other if e <= epoch]
+        if reached:
+            leader = min(leader, other[max(reached)])
+    return math.isfinite(leader) and history[epoch] > leader * (1 + margin)
+
+
+class Sweep:
+    """
+    Planificador del barrido: lanza, vigila y detiene ejecuciones de train.py
+
+    Args:
+        spec: Especificación (ver load_spec)
+        slots: Huecos de hardware (ver hardware_slots)
+        max_concurrent: Ejecuciones simultáneas como máximo
+    """
+
+    def __init__(self, spec, slots, max_concurrent=None):
+        self.spec = spec
+        self.slots = slots
+        self.max_concurrent = min(max_concurrent or len(slots), len(slots))
+        self.output = Path(spec.get('output', 'barridos/barrido'))
+        early_stop = spec.get('early_stop') or {}
+        self.after_epochs = early_stop.get('after_epochs', DEFAULT_AFTER_EPOCHS)
+        self.margin = early_stop.get('margin', DEFAULT_MARGIN)
+        self.early_stop = early_stop.get('enabled', True)
+        self.runs = []
+        for number, params in enumerate(expand_spec(spec)):
+            self.runs.append({
+                'id': f"run_{number:03d}",
+                'params': params,
+                'status': 'pending',
+                'checkpoint_dir': str(self.output / f"run_{number:03d}"),
+            })
+        self._processes = {}
+
+    def command(self, run, slot):
+        """Comando de train.py de una ejecución en un hueco"""
+        options = dict(self.spec.get('base_args') or {})
+        options.update(run['params'])
+        return ([sys.executable, str(TRAIN_PATH), str(self.spec['dataset'])]
+                + ([str(self.spec['base_checkpoint'])] if self.spec.get('base_checkpoint') else [])
+                + ['--checkpoint-dir', run['checkpoint_dir']]
+                + slot['args'] + train_args(options))
+
+    def _start(self, run, slot):
+        run_dir = Path(run['checkpoint_dir'])
+        run_dir.mkdir(parents=True, exist_ok=True)
+        cmd = self.command(run, slot)
+        log = open(run_dir / 'sweep_console.log', 'w', encoding='utf-8')
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                   env=dict(os.environ, **slot['env']),
+                                   start_new_session=(sys.platform != 'win32'))
+        self._processes[run['id']] = (process, log, slot)
+        run.update(status='running', slot=slot['name'], started_at=time.time(), command=cmd)
+        print(f"[{run['id']}] {slot['name']}: {json.dumps(run['params'])}")
+
+    def _stop(self, run, reason):
+        process = self._processes[run['id']][0]
+        if sys.platform != 'win32':
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except OSError:
+                pass
+        else:
+            process.terminate()
+        run['stop_reason'] = reason
+        run['status'] = 'stopping'
+
+    def _update_metrics(self):
+        histories = {}
+        for run in self.runs:
+            if run['status'] == 'pending':
+                continue
+            history = best_by_epoch(Path(run['checkpoint_dir']) / 'metrics.jsonl')
+            histories[run['id']] = history
+            if history:
+                run['epochs'] = max(history) + 1
+                run['best_val_loss'] = history[max(history)]
+        return histories
+
+    def _check_losers(self, histories):
+        if not self.early_stop:
+            return
+        for run in self.runs:
+            if run['status'] != 'running':
+                continue
+            others = [h for run_id, h in histories.items() if run_id != run['id']]
+            if is_losing(histories.get(run['id']), others, self.after_epochs, self.margin):
+                print(f"[{run['id']}] detenido: val_loss {run['best_val_loss']:.4f} más de "
+                      f"{self.margin:.0%} peor que el líder en la época {run['epochs'] - 1}")
+                self._stop(run, 'losing')
+
+    def _reap(self):
+        for run in self.runs:
+            if run['id'] not in self._processes:
+                continue
+            process, log, _ = self._processes[run['id']]
+            code = process.poll()
+            if code is None:
+                continue
+            log.close()
+            del self._processes[run['id']]
+            run['exit_code'] = code
+            run['wall_s'] = round(time.time() - run['started_at'], 1)
+            if run['status'] == 'stopping':
+                run['status'] = 'stopped'
+            else:
+                run['status'] = 'done' if code == 0 else 'failed'
+            print(f"[{run['id']}] {run['status']} (código {code}, {run['wall_s']:.0f}s)")
+
+    def _free_slots(self):
+        busy = {slot['name'] for _, _, slot in self._processes.values()}
+        return [slot for slot in self.slots if slot['name'] not in busy]
+
+    def write_state(self):
+        self.output.mkdir(parents=True, exist_ok=True)
+        state = {'spec': self.spec, 'max_concurrent': self.max_concurrent, 'runs': self.runs}
+        tmp_path = self.output / (SWEEP_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, default=str)
+        os.replace(tmp_path, self.output / SWEEP_FILE)
+
+    def run(self):
+        """Ejecuta el barrido completo; devuelve las ejecuciones ordenadas por val_loss"""
+        try:
+            while True:
+                self._reap()
+                histories = self._update_metrics()
+                self._check_losers(histories)
+                pending = [run for run in self.runs if run['status'] == 'pending']
+                for slot in self._free_slots():
+                    if not pending or len(self._processes) >= self.max_concurrent:
+                        break
+                    self._start(pending.pop(0), slot)
+                self.write_state()
+                if not pending and not self._processes:
+                    break
+                time.sleep(POLL_INTERVAL)
+        except KeyboardInterrupt:
+            print("\nDeteniendo las ejecuciones en curso...")
+            for run in self.runs:
+                if run['id'] in self._processes:
+                    self._stop(run, 'interrupted')
+            for process, _, _ in list(self._processes.values()):
+                process.wait()
+            self._reap()
+            self.write_state()
+            raise
+        self._update_metrics()
+        self.write_state()
+        return ranking(self.runs)
+
+
+def ranking(runs):
+    """Ejecuciones con val_loss ordenadas de mejor a peor, y después el resto"""
+    return sorted(runs, key=lambda run: run.get('best_val_loss', math.inf))
+
+
+def format_run(run):
+    params = '  '.join(f"{k}={v:.3g}" if isinstance(v, float) else f"{k}={v}"
+                       for k, v in run['params'].items())
+    loss = run.get('best_val_loss')
+    loss_str = f"{loss:.4f}" if loss is not None else '-'
+    return f"{run['id']:<9}  {run['status']:<8}  {loss_str:>9}  {run.get('epochs', 0):>6}  {params}"
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Barrido de hiperparámetros: varias ejecuciones de train.py en paralelo'
+    )
+    parser.add_argument(
+        'spec',
+        help='Especificación del barrido (JSON o YAML)'
+    )
+    parser.add_argument(
+        '--gpus',
+        help='GPUs a usar, separadas por comas (por defecto: todas las visibles)'
+    )
+    parser.add_argument(
+        '--cpu-slices',
+        type=int,
+        help='Sin GPU: grupos de núcleos en que repartir las ejecuciones (por defecto: 1)'
+    )
+    parser.add_argument(
+        '--max-concurrent',
+        type=int,
+        help='Ejecuciones simultáneas como máximo (por defecto: una por GPU o grupo de núcleos)'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Mostrar las ejecuciones y sus comandos sin lanzarlas'
+    )
+
+    args = parser.parse_args()
+
+    try:
+        spec = load_spec(args.spec)
+        gpus = [int(g) for g in args.gpus.split(',') if g.strip()] if args.gpus else None
+        slots = hardware_slots(gpus, args.cpu_slices)
+        sweep = Sweep(spec, slots, args.max_concurrent)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Barrido: {len(sweep.runs)} ejecuciones, hasta {sweep.max_concurrent} a la vez en "
+          f"{', '.join(slot['name'] for slot in slots)}")
+    if args.dry_run:
+        for number, run in enumerate(sweep.runs):
+            slot = slots[number % len(slots)]
+            print(f"  {run['id']}: {' '.join(sweep.command(run, slot)[1:])}")
+        sys.exit(0)
+
+    try:
+        results = sweep.run()
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    print()
+    print(f"{'ejecución':<9}  {'estado':<8}  {'val_loss':>9}  {'épocas':>6}  parámetros")
+    for run in results:
+        print(format_run(run))
+    print(f"\nEstado completo en {sweep.output / SWEEP_FILE}")
+    best = results[0] if results and results[0].get('best_val_loss') is not None else None
+    if best:
+        print(f"Mejor: {best['id']} ({best['checkpoint_dir']})")
+    sys.exit(0 if any(run['status'] == 'done' for run in results) else 1)
+
+
+if __name__ == '__main__':
+    main()
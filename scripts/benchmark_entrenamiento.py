@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Benchmark de rendimiento del entrenamiento con un número fijo de pasos
+
+train.py --benchmark-steps N entrena N pasos (más los de calentamiento, que
+no se cuentan) sobre un subconjunto fijo de dataset.jsonl con la misma
+configuración que un entrenamiento normal (batch, precisión, calidad, hilos,
+workers, procesos...), y añade el resultado a un historial JSONL:
+
+    pasos/s, muestras/s, segundos de audio/s, memoria pico,
+    configuración, commit de git y datos de la máquina
+
+El subconjunto se elige con una semilla fija sobre el orden de
+dataset.jsonl, así que el mismo dataset da las mismas frases en cualquier
+máquina.
+
+Uso (comparar resultados del historial):
+    python benchmark_entrenamiento.py
+    python benchmark_entrenamiento.py historial_benchmark.jsonl --last 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from instrumentacion import format_bytes, run_monitored
+from split_dataset import entry_lengths
+
+HISTORY_FILE = "historial_benchmark.jsonl"
+DEFAULT_BENCHMARK_STEPS = 50
+DEFAULT_WARMUP_STEPS = 10
+SUBSET_SEED = 1234
+
+
+def benchmark_subset(dataset_dir, num_samples, seed=SUBSET_SEED):
+    """
+    Índices fijos de dataset.jsonl para el benchmark
+
+    Si el dataset tiene menos frases de las necesarias se repiten en el
+    mismo orden.
+
+    Returns:
+        tuple: (índices, duración media en segundos o None si no se conoce)
+    """
+    lengths, unit = entry_lengths(dataset_dir)
+    if not lengths:
+        return [], None
+    order = list(range(len(lengths)))
+    random.Random(seed).shuffle(order)
+    indices = [order[i % len(order)] for i in range(num_samples)]
+    mean_seconds = None
+    if unit == 'seconds':
+        mean_seconds = sum(lengths[i] for i in indices) / len(indices)
+    return indices, mean_seconds
+
+
+def summarize_step_times(batch_ends, warmup, samples_per_step, seconds_per_sample=None):
+    """
+    Velocidad a partir del instante de fin de cada paso, sin el calentamiento
+
+    Returns:
+        dict o None: steps, steps_per_sec, samples_per_sec y
+            audio_seconds_per_sec (None si no hay pasos medidos)
+    """
+    warmup = max(1, warmup)
+    if len(batch_ends) <= warmup:
+        return None
+    steps = len(batch_ends) - warmup
+    seconds = batch_ends[-1] - batch_ends[warmup - 1]
+    if seconds <= 0:
+        return None
+    steps_per_sec = steps / seconds
+    result = {
+        'steps': steps,
+        'seconds': round(seconds, 3),
+        'steps_per_sec': round(steps_per_sec, 4),
+        'samples_per_sec': round(steps_per_sec * samples_per_step, 3),
+    }
+    if seconds_per_sample:
+        result['audio_seconds_per_sec'] = round(steps_per_sec * samples_per_step * seconds_per_sample, 2)
+    return result
+
+
+def git_commit(path=None):
+    """Commit actual del repositorio (con '+' si hay cambios) o None"""
+    cwd = str(path or Path(__file__).resolve().parent)
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd,
+                               check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('+' if dirty else '')
+
+
+def machine_info():
+    """Datos de la máquina para comparar resultados entre equipos"""
+    info = {
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+    }
+    try:
+        import torch
+        info['torch'] = torch.__version__
+        if torch.cuda.is_available():
+            info['gpu'] = torch.cuda.get_device_name(0)
+    except ImportError:
+        pass
+    return info
+
+
+def run_benchmark(launcher_cmd, piper_args, dataset_dir, batch_size, steps=DEFAULT_BENCHMARK_STEPS,
+                  warmup=DEFAULT_WARMUP_STEPS, processes=1, accelerator='cpu', log_file=None):
+    """
+    Ejecuta el benchmark con piper_launcher.py
+
+    Args:
+        launcher_cmd: Comando del lanzador con sus opciones, sin '--'
+        piper_args: Argumentos de piper_train (dataset, acelerador, batch...)
+        dataset_dir: Dataset preprocesado
+        batch_size: Batch size por proceso
+        steps: Pasos medidos
+        warmup: Pasos iniciales que no se cuentan
+        processes: Procesos data-parallel (cada uno entrena su batch)
+        accelerator: 'gpu' usa la VRAM reservada como memoria pico
+        log_file: Archivo donde guardar la salida de piper_train
+
+    Returns:
+        dict: Resultado (ok, exit_code, steps_per_sec, samples_per_sec,
+            audio_seconds_per_sec, peak_bytes, ...)
+    """
+    samples_per_step = batch_size * processes
+    indices, seconds_per_sample = benchmark_subset(dataset_dir, (steps + warmup) * samples_per_step)
+
+    with tempfile.TemporaryDirectory(prefix='benchmark_') as work_dir:
+        work_path = Path(work_dir)
+        indices_file = work_path / "subset.idx"
+        indices_file.write_text(''.join(f"{i}\n" for i in indices), encoding='utf-8')
+        report_file = work_path / "probe.json"
+        times_file = work_path / "steps.json"
+        cmd = list(launcher_cmd) + [
+            '--train-indices', str(indices_file),
+            '--probe-report', str(report_file),
+            '--step-times', str(times_file),
+            '--',
+        ] + list(piper_args) + [
+            '--max_epochs', '1',
+            '--limit_val_batches', '0',
+            '--num_sanity_val_steps', '0',
+            '--default_root_dir', str(work_path / 'lightning'),
+        ]
+
+        log_path = Path(log_file) if log_file else work_path / "benchmark.log"
+        start = time.time()
+        with open(log_path, 'w', encoding='utf-8') as log:
+            exit_code, usage = run_monitored(cmd, rusage=False, stdout=log, stderr=subprocess.STDOUT)
+        wall = time.time() - start
+
+        report = _read_json(report_file)
+        batch_ends = _read_json(times_file).get('batch_ends', [])
+
+    result = {
+        'ok': exit_code == 0,
+        'exit_code': exit_code,
+        'wall_s': round(wall, 2),
+        'steps_run': len(batch_ends),
+        'warmup': warmup,
+    }
+    summary = summarize_step_times(batch_ends, warmup, samples_per_step, seconds_per_sample)
+    if summary:
+        result.update(summary)
+    if accelerator == 'gpu' and report.get('cuda_peak_bytes') is not None:
+        result['peak_bytes'] = report['cuda_peak_bytes']
+        result['peak_kind'] = 'vram'
+    else:
+        result['peak_bytes'] = max(usage['peak_rss_bytes'] or 0, report.get('rss_peak_bytes') or 0) or None
+        result['peak_kind'] = 'rss'
+    return result
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def append_history(path, record):
+    """Añade un resultado al historial JSONL"""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def read_history(path):
+    """Lee el historial (las líneas inválidas se ignoran)"""
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+def format_record(record):
+    """Una línea de tabla con la configuración y el resultado"""
+    config = record.get('config', {})
+    result = record.get('result', {})
+    when = time.strftime('%Y-%m-%d %H:%M', time.localtime(record.get('time', 0)))
+    setup = (f"bs {config.get('batch_size')}x{config.get('processes', 1)} "
+             f"{config.get('precision')} {config.get('quality')} {config.get('accelerator')}")
+    line = f"{when}  {record.get('commit') or '-':>9}  {record.get('machine', {}).get('host', '-'):<12}  {setup:<34}"
+    if result.get('steps_per_sec') is None:
+        return f"{line}  {'falla' if not result.get('ok') else 'sin datos'}"
+    audio = result.get('audio_seconds_per_sec')
+    return (f"{line}  {result['steps_per_sec']:>7.3f}  {result['samples_per_sec']:>9.2f}  "
+            f"{audio if audio is not None else '-':>8}  {format_bytes(result.get('peak_bytes')):>10}")
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Compara los resultados del historial de benchmarks de entrenamiento'
+    )
+    parser.add_argument(
+        'history',
+        nargs='?',
+        default=HISTORY_FILE,
+        help=f'Historial JSONL (por defecto: {HISTORY_FILE})'
+    )
+    parser.add_argument(
+        '--last',
+        type=int,
+        default=20,
+        help='Mostrar solo los últimos N resultados (por defecto: 20)'
+    )
+    parser.add_argument(
+        '--host',
+        help='Mostrar solo los resultados de esta máquina'
+    )
+
+    args = parser.parse_args()
+
+    records = read_history(args.history)
+    if args.host:
+        records = [r for r in records if r.get('machine', {}).get('host') == args.host]
+    if not records:
+        print(f"No hay resultados en {args.history}")
+        print("  Genera uno con: python scripts/train.py dataset_procesado --benchmark-steps 50")
+        sys.exit(1)
+
+    print(f"{'fecha':<16}  {'commit':>9}  {'máquina':<12}  {'configuración':<34}  "
+          f"{'pasos/s':>7}  {'muestras/s':>9}  {'audio/s':>8}  {'pico':>10}")
+    for record in records[-args.last:]:
+        print(format_record(record))
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Búsqueda del batch size máximo dentro de un presupuesto de memoria
+
+Lanza piper_train unos pocos pasos (forward/backward) solo con las frases más
+largas de dataset.jsonl, que son las que marcan el pico de memoria, y ajusta
+el batch size por búsqueda binaria: primero lo duplica hasta que falla o
+supera el presupuesto, y después busca entre el último valor válido y el
+primero inválido.
+
+El pico medido es la VRAM reservada por PyTorch en GPU y el RSS del árbol de
+procesos (incluidos los workers del DataLoader) en CPU. Por defecto el
+presupuesto es el 90% de la VRAM o el 80% de la RAM disponible.
+
+train.py lo usa con --batch-size auto.
+
+Uso:
+    python buscar_batch.py dataset_procesado
+    python buscar_batch.py dataset_procesado --accelerator cpu --budget-gb 12
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from instrumentacion import format_bytes, run_monitored
+from perfiles_calidad import DEFAULT_QUALITY
+from split_dataset import entry_lengths
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+LAUNCHER_PATH = Path(__file__).resolve().parent / "piper_launcher.py"
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_PROBE_STEPS = 3
+# Margen sobre la memoria del sistema: el entrenamiento real añade validación
+# y fragmentación que el sondeo no reproduce
+GPU_BUDGET_FRACTION = 0.9
+CPU_BUDGET_FRACTION = 0.8
+
+
+def available_ram_bytes():
+    """RAM disponible (psutil o /proc/meminfo) o None"""
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def default_budget(accelerator):
+    """
+    Presupuesto de memoria por defecto para el acelerador
+
+    Returns:
+        int o None: Bytes (None si no se puede determinar)
+    """
+    if accelerator == 'gpu':
+        try:
+            import torch
+            if torch.cuda.is_available():
+                total = torch.cuda.get_device_properties(0).total_memory
+                return int(total * GPU_BUDGET_FRACTION)
+        except ImportError:
+            pass
+        return None
+    available = available_ram_bytes()
+    return int(available * CPU_BUDGET_FRACTION) if available else None
+
+
+def longest_indices(lengths, count):
+    """Índices de dataset.jsonl de las ``count`` frases más largas (lengths: entry_lengths)"""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    return order[:count]
+
+
+def probe_batch_size(dataset_dir, batch_size, accelerator='gpu', devices='1', steps=DEFAULT_PROBE_STEPS,
+                     precision='16-mixed', quality=DEFAULT_QUALITY, work_dir=None, lengths=None):
+    """
+    Ejecuta ``steps`` pasos de entrenamiento con las frases más largas
+
+    El sondeo entrena una sola época sobre batch_size * steps frases, así que
+    dura exactamente ``steps`` batches. No se usa --max_steps: el modelo VITS
+    tiene dos optimizadores y Lightning 1.x cuenta en global_step los pasos de
+    optimizador (dos por batch).
+
+    Args:
+        dataset_dir: Dataset preprocesado (con dataset.jsonl)
+        batch_size: Batch size a probar
+        accelerator: 'gpu', 'cpu' o 'dml'
+        devices: Dispositivos para Lightning
+        steps: Batches de forward/backward
+        precision: Precisión de entrenamiento
+        quality: Calidad del modelo
+        work_dir: Directorio para los archivos temporales del sondeo
+        lengths: Longitud de cada frase (entry_lengths); se calcula si no se pasa
+
+    Returns:
+        dict: batch_size, ok (terminó sin error), peak_bytes, exit_code y log
+    """
+    work_path = Path(work_dir or tempfile.mkdtemp(prefix='buscar_batch_'))
+    work_path.mkdir(parents=True, exist_ok=True)
+    indices_file = work_path / f"bs{batch_size}.idx"
+    report_file = work_path / f"bs{batch_size}.json"
+    log_file = work_path / f"bs{batch_size}.log"
+
+    if lengths is None:
+        lengths, _ = entry_lengths(dataset_dir)
+    indices = longest_indices(lengths, batch_size * steps)
+    indices_file.write_text(''.join(f"{i}\n" for i in indices), encoding='utf-8')
+
+    cmd = [
+        sys.executable, str(LAUNCHER_PATH),
+        '--train-indices', str(indices_file),
+        '--probe-report', str(report_file),
+        '--',
+        '--dataset-dir', str(dataset_dir),
+        '--accelerator', accelerator,
+        '--devices', devices,
+        '--batch-size', str(batch_size),
+        '--precision', precision,
+        '--quality', quality,
+        '--max_epochs', '1',
+        '--limit_val_batches', '0',
+        '--num_sanity_val_steps', '0',
+        '--checkpoint-epochs', '1000000',
+        '--default_root_dir', str(work_path / 'lightning'),
+    ]
+    with open(log_file, 'w', encoding='utf-8') as log:
+        # rusage=False: el máximo de RUSAGE_CHILDREN arrastraría el pico de
+        # sondeos anteriores
+        exit_code, usage = run_monitored(cmd, rusage=False, stdout=log, stderr=subprocess.STDOUT)
+
+    report = {}
+    try:
+        with open(report_file, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    if accelerator == 'gpu' and report.get('cuda_peak_bytes') is not None:
+        peak = report['cuda_peak_bytes']
+    else:
+        peak = max(usage['peak_rss_bytes'] or 0, report.get('rss_peak_bytes') or 0) or None
+
+    return {
+        'batch_size': batch_size,
+        'ok': exit_code == 0 and bool(report),
+        'peak_bytes': peak,
+        'exit_code': exit_code,
+        'log': str(log_file),
+    }
+
+
+def find_max_batch_size(dataset_dir, budget_bytes=None, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                        steps=DEFAULT_PROBE_STEPS, accelerator='gpu', devices='1',
+                        precision='16-mixed', quality=DEFAULT_QUALITY, verbose=True):
+    """
+    Busca el mayor batch size que entrena sin error dentro del presupuesto
+
+    Args:
+        dataset_dir: Dataset preprocesado (con dataset.jsonl)
+        budget_bytes: Memoria máxima (VRAM en GPU, RSS en CPU); None usa
+            default_budget(accelerator)
+        max_batch_size: Límite superior de la búsqueda
+        steps: Batches de entrenamiento por sondeo
+        accelerator, devices, precision, quality: Igual que en train.py
+        verbose: Imprimir cada sondeo
+
+    Returns:
+        tuple: (batch size máximo seguro o 0 si ni 1 cabe, lista de sondeos)
+    """
+    if budget_bytes is None:
+        budget_bytes = default_budget(accelerator)
+    # Las longitudes se leen una vez (cabeceras WAV) para todos los sondeos
+    lengths, _ = entry_lengths(dataset_dir)
+    max_batch_size = max(1, min(max_batch_size, len(lengths)))
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix='buscar_batch_') as work_dir:
+        def is_safe(batch_size):
+            result = probe_batch_size(dataset_dir, batch_size, accelerator, devices, steps,
+                                      precision, quality, work_dir, lengths)
+            result['within_budget'] = (budget_bytes is None or result['peak_bytes'] is None
+                                       or result['peak_bytes'] <= budget_bytes)
+            result['safe'] = result['ok'] and result['within_budget']
+            if not result['ok']:
+                result['log_tail'] = _log_tail(result['log'])
+            results.append(result)
+            if verbose:
+                status = 'ok' if result['safe'] else ('excede presupuesto' if result['ok'] else 'falla')
+                print(f"  batch {batch_size:>4}: pico {format_bytes(result['peak_bytes']):>10}  {status}")
+            return result['safe']
+
+        # Crecimiento exponencial hasta el primer fallo
+        good, bad = 0, None
+        candidate = 1
+        while candidate <= max_batch_size:
+            if not is_safe(candidate):
+                bad = candidate
+                break
+            good = candidate
+            if candidate == max_batch_size:
+                break
+            candidate = min(candidate * 2, max_batch_size)
+
+        # Búsqueda binaria entre el último válido y el primero inválido
+        if bad is not None and good > 0:
+            while bad - good > 1:
+                middle = (good + bad) // 2
+                if is_safe(middle):
+                    good = middle
+                else:
+                    bad = middle
+
+    return good, results
+
+
+def _log_tail(log_path, num_lines=5):
+    try:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            return [line.rstrip() for line in f.readlines()[-num_lines:]]
+    except OSError:
+        return []
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Busca el batch size máximo que cabe en un presupuesto de memoria'
+    )
+    parser.add_argument(
+        'dataset_dir',
+        help='Dataset preprocesado (con dataset.jsonl)'
+    )
+    parser.add_argument(
+        '--accelerator',
+        choices=['gpu', 'cpu', 'dml'],
+        help='Acelerador (por defecto: gpu si CUDA/ROCm está disponible, si no cpu)'
+    )
+    parser.add_argument(
+        '--devices',
+        default='1',
+        help='Dispositivos para Lightning (por defecto: 1)'
+    )
+    parser.add_argument(
+        '--budget-gb',
+        type=float,
+        help='Presupuesto de memoria en GB: VRAM en GPU, RSS en CPU '
+             f'(por defecto: {GPU_BUDGET_FRACTION:.0%} de la VRAM o {CPU_BUDGET_FRACTION:.0%} de la RAM disponible)'
+    )
+    parser.add_argument(
+        '--max-batch-size',
+        type=int,
+        default=DEFAULT_MAX_BATCH_SIZE,
+        help=f'Límite superior de la búsqueda (por defecto: {DEFAULT_MAX_BATCH_SIZE})'
+    )
+    parser.add_argument(
+        '--steps',
+        type=int,
+        default=DEFAULT_PROBE_STEPS,
+        help=f'Batches de entrenamiento por sondeo (por defecto: {DEFAULT_PROBE_STEPS})'
+    )
+    parser.add_argument(
+        '--precision',
+        default=os.environ.get('PRECISION', '16-mixed'),
+        help='Precisión de entrenamiento (por defecto: 16-mixed)'
+    )
+    parser.add_argument(
+        '--quality',
+        default=DEFAULT_QUALITY,
+        help=f'Calidad del modelo (por defecto: {DEFAULT_QUALITY})'
+    )
+
+    args = parser.parse_args()
+
+    if not (Path(args.dataset_dir) / "dataset.jsonl").exists():
+        print(f"No se encontró dataset.jsonl en {args.dataset_dir}")
+        sys.exit(1)
+
+    accelerator = args.accelerator
+    if accelerator is None:
+        try:
+            import torch
+            accelerator = 'gpu' if torch.cuda.is_available() else 'cpu'
+        except ImportError:
+            accelerator = 'cpu'
+
+    budget = int(args.budget_gb * 1024 ** 3) if args.budget_gb else default_budget(accelerator)
+    kind = 'VRAM' if accelerator == 'gpu' else 'RSS'
+    print(f"Presupuesto de memoria ({kind}): {format_bytes(budget)}")
+
+    best, results = find_max_batch_size(args.dataset_dir, budget, args.max_batch_size, args.steps,
+                                        accelerator, args.devices, args.precision, args.quality)
+
+    if best == 0:
+        print("Ni siquiera batch size 1 cabe en el presupuesto")
+        for result in results:
+            for line in result.get('log_tail', []):
+                print(f"    {line}")
+        sys.exit(1)
+    print(f"Batch size máximo seguro: {best}")
+    print(f"  python scripts/train.py {args.dataset_dir} --batch-size {best}")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Caché en memoria compartida de los tensores del dataset preprocesado
+
+piper_train lee en cada época, y en cada worker del DataLoader, el audio
+normalizado y el espectrograma de cada frase (.pt). Con datasets pequeños y
+discos lentos el entrenamiento queda limitado por la E/S.
+
+SharedTensorCache carga todos esos tensores una vez en un único búfer
+contiguo de memoria compartida, con un índice (desplazamiento, tipo, forma)
+por tensor. Los workers del DataLoader heredan el búfer (fork) o reciben su
+descriptor (spawn) y obtienen cada tensor como una vista, sin copiarlo.
+
+Antes de cargar nada se estima el tamaño a partir de los archivos; si supera
+el presupuesto de RAM no se crea la caché y se sigue leyendo del disco.
+
+piper_launcher.py la instala con --dataset-cache (train.py --dataset-cache).
+
+Uso (estimar el tamaño de la caché de un dataset):
+    python cache_memoria.py dataset_procesado
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from buscar_batch import available_ram_bytes
+from instrumentacion import format_bytes
+
+# Fracción de la RAM disponible que puede ocupar la caché por defecto
+DEFAULT_CACHE_FRACTION = 0.5
+# Alineación de cada tensor en el búfer (vistas con cualquier tipo de dato)
+ALIGNMENT = 64
+TENSOR_FIELDS = ('audio_norm_path', 'audio_spec_path')
+
+
+def _aligned(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def estimate_cache_bytes(paths):
+    """
+    Tamaño máximo del búfer para estos .pt
+
+    Un .pt ocupa el tamaño de sus datos más los metadatos de torch.save, así
+    que el tamaño del archivo más la alineación es una cota superior.
+
+    Returns:
+        int o None: Bytes (None si falta algún archivo)
+    """
+    total = 0
+    for path in paths:
+        try:
+            total += _aligned(Path(path).stat().st_size + ALIGNMENT)
+        except OSError:
+            return None
+    return total
+
+
+def default_cache_budget():
+    """Presupuesto por defecto: la mitad de la RAM disponible, o None"""
+    available = available_ram_bytes()
+    return int(available * DEFAULT_CACHE_FRACTION) if available else None
+
+
+class SharedTensorCache:
+    """
+    Tensores en un búfer de memoria compartida, accesibles por posición
+
+    Args:
+        paths: Archivos .pt, en el orden en que se consultarán con get()
+        capacity: Tamaño del búfer en bytes (estimate_cache_bytes(paths))
+
+    Raises:
+        ValueError: Si los tensores no caben en ``capacity``
+    """
+
+    def __init__(self, paths, capacity):
+        import torch
+
+        self.buffer = torch.empty(capacity, dtype=torch.uint8).share_memory_()
+        self.index = []
+        offset = 0
+        for path in paths:
+            tensor = _load_tensor(path).contiguous()
+            nbytes = tensor.numel() * tensor.element_size()
+            if offset + nbytes > capacity:
+                raise ValueError(f"{path} no cabe en la caché ({format_bytes(capacity)})")
+            if nbytes:
+                self.buffer[offset:offset + nbytes].copy_(tensor.reshape(-1).view(torch.uint8))
+            self.index.append((offset, nbytes, tensor.dtype, tuple(tensor.shape)))
+            offset = _aligned(offset + nbytes)
+        self.used_bytes = offset
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, position):
+        """Tensor en la posición ``position`` (vista del búfer, sin copia)"""
+        offset, nbytes, dtype, shape = self.index[position]
+        return self.buffer[offset:offset + nbytes].view(dtype).view(shape)
+
+
+class CachedDataset:
+    """
+    PiperDataset que sirve audio_norm y spectrogram desde una SharedTensorCache
+
+    La caché guarda, para cada frase i, el audio normalizado en la posición
+    2*i y el espectrograma en 2*i+1. Es una clase de módulo para que los
+    workers del DataLoader creados con spawn (Windows, macOS) puedan
+    recibirla; el resto de atributos se delegan en el dataset original.
+    """
+
+    def __init__(self, dataset, cache):
+        self.dataset = dataset
+        self.cache = cache
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        import torch
+        from piper_train.vits.dataset import UtteranceTensors
+
+        utt = self.dataset.utterances[idx]
+        return UtteranceTensors(
+            phoneme_ids=torch.LongTensor(utt.phoneme_ids),
+            audio_norm=self.cache.get(2 * idx),
+            spectrogram=self.cache.get(2 * idx + 1),
+            speaker_id=torch.LongTensor([utt.speaker_id]) if utt.speaker_id is not None else None,
+            text=utt.text,
+        )
+
+    def __getattr__(self, name):
+        if name == 'dataset':
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+
+def _load_tensor(path):
+    import torch
+    try:
+        return torch.load(path, map_location='cpu', weights_only=True)
+    except TypeError:
+        return torch.load(path, map_location='cpu')
+
+
+def dataset_tensor_paths(dataset_dir):
+    """Rutas de los .pt de dataset.jsonl (audio normalizado y espectrograma)"""
+    dataset_path = Path(dataset_dir)
+    paths = []
+    with open(dataset_path / "dataset.jsonl", 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            for field in TENSOR_FIELDS:
+                if entry.get(field):
+                    path = Path(entry[field])
+                    paths.append(path if path.is_absolute() else dataset_path / path)
+    return paths
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Estima la memoria que ocuparía la caché del dataset en RAM'
+    )
+    parser.add_argument(
+        'dataset_dir',
+        help='Dataset preprocesado (con dataset.jsonl)'
+    )
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=1,
+        help='Procesos de entrenamiento (cada uno tiene su propia caché; por defecto: 1)'
+    )
+
+    args = parser.parse_args()
+
+    if not (Path(args.dataset_dir) / "dataset.jsonl").exists():
+        print(f"No se encontró dataset.jsonl en {args.dataset_dir}")
+        sys.exit(1)
+
+    paths = dataset_tensor_paths(args.dataset_dir)
+    size = estimate_cache_bytes(paths)
+    if size is None:
+        print("Faltan archivos .pt del dataset; ejecuta primero preprocess.py")
+        sys.exit(1)
+    needed = size * args.processes
+    budget = default_cache_budget()
+    print(f"Tensores: {len(paths)}  caché estimada: {format_bytes(needed)}")
+    print(f"Presupuesto por defecto ({DEFAULT_CACHE_FRACTION:.0%} de la RAM disponible): "
+          f"{format_bytes(budget)}")
+    if budget is not None and needed > budget:
+        print("No cabe: el entrenamiento leerá del disco (o sube --cache-budget-gb)")
+    else:
+        print(f"Cabe: python scripts/train.py {args.dataset_dir} --dataset-cache")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+"""
+Cola persistente de trabajos de entrenamiento y exportación (SQLite)
+
+En una máquina compartida, los entrenamientos se encolan en lugar de ocupar
+un terminal cada uno. El servicio (serve) ejecuta los trabajos en orden de
+prioridad y llegada, con un límite de trabajos simultáneos y un hueco de
+hardware por trabajo: una GPU (CUDA_VISIBLE_DEVICES) o un grupo de núcleos
+de CPU, igual que barrido.py.
+
+La cola vive en un archivo SQLite, así que sobrevive a reinicios. Si el
+servicio se detiene (Ctrl+C, SIGTERM) o se cae con trabajos en marcha, al
+volver a arrancar los reencola; los entrenamientos continúan desde el
+checkpoint más reciente de su directorio.
+
+Cada trabajo guarda su salida en <directorio de la cola>/trabajos/NNNNN/
+(console.log y, si no se indica --checkpoint-dir, checkpoints/).
+
+Uso:
+    python cola_trabajos.py serve --max-concurrent 2 --gpus 0,1
+    python cola_trabajos.py add train dataset_procesado -- --batch-size 16 --quality high
+    python cola_trabajos.py add export mi_voz.onnx --after 3
+    python cola_trabajos.py list
+    python cola_trabajos.py show 3
+    python cola_trabajos.py log 3
+    python cola_trabajos.py cancel 3
+"""
+
+import argparse
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from barrido import hardware_slots
+from gestor_checkpoints import latest_checkpoint
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+DEFAULT_DB = Path.home() / ".local" / "share" / "piper-training" / "cola.sqlite3"
+JOB_KINDS = ('train', 'export')
+# Estados: queued -> running -> done / failed; cancelling -> cancelled
+FINAL_STATES = ('done', 'failed', 'cancelled')
+POLL_INTERVAL = 2.0
+# Segundos que se espera a un trabajo huérfano tras SIGTERM antes de SIGKILL
+STOP_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    target TEXT,
+    base TEXT,
+    output TEXT,
+    args TEXT NOT NULL DEFAULT '[]',
+    cwd TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    depends_on INTEGER,
+    status TEXT NOT NULL DEFAULT 'queued',
+    slot TEXT,
+    pid INTEGER,
+    pid_identity TEXT,
+    resumes INTEGER NOT NULL DEFAULT 0,
+    checkpoint_dir TEXT,
+    exit_code INTEGER,
+    note TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def process_identity(pid):
+    """
+    Identidad de un proceso vivo más allá de su PID
+
+    Los PID se reutilizan (sobre todo tras reiniciar la máquina), así que
+    junto al PID se guarda el instante de arranque del proceso y, en Linux,
+    el identificador del arranque del sistema.
+
+    Returns:
+        str o None: None si el proceso no existe o no se puede identificar
+    """
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat", 'r', encoding='utf-8') as f:
+            stat = f.read()
+        with open("/proc/sys/kernel/random/boot_id", 'r', encoding='utf-8') as f:
+            boot_id = f.read().strip()
+        # El nombre del comando va entre paréntesis y puede tener espacios;
+        # starttime es el campo 22 (el 20 tras el paréntesis)
+        return f"{boot_id}:{stat.rsplit(')', 1)[1].split()[19]}"
+    except (OSError, IndexError):
+        pass
+    if psutil is not None:
+        try:
+            return f"{psutil.Process(pid).create_time():.3f}"
+        except psutil.Error:
+            return None
+    return None
+
+
+def _same_process(pid, identity):
+    """Indica si ``pid`` sigue siendo el proceso que se registró con ``identity``"""
+    return identity is not None and process_identity(pid) == identity
+
+
+def _kill_job(pid, sig=signal.SIGTERM):
+    """Termina el grupo de procesos de un trabajo (train.py y sus hijos)"""
+    try:
+        if sys.platform != 'win32':
+            os.killpg(pid, sig)
+        else:
+            os.kill(pid, signal.SIGTERM)
+    except OSError:
+        pass
+
+
+def _job_alive(pid, identity):
+    """Indica si queda algún proceso del trabajo (su grupo, fuera de Windows)"""
+    if sys.platform == 'win32':
+        return _same_process(pid, identity)
+    try:
+        os.killpg(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _stop_orphan_job(pid, identity, timeout=STOP_TIMEOUT):
+    """
+    Detiene un trabajo que no es hijo de este proceso y espera a que salga
+
+    Envía SIGTERM al grupo y, si sigue vivo pasados ``timeout`` segundos,
+    SIGKILL. Así el trabajo no se relanza mientras el anterior aún escribe
+    en su directorio de checkpoints.
+
+    Returns:
+        bool: True si el trabajo terminó
+    """
+    _kill_job(pid)
+    deadline = time.monotonic() + timeout
+    killed = False
+    while _job_alive(pid, identity):
+        if time.monotonic() >= deadline:
+            if killed:
+                return False
+            _kill_job(pid, signal.SIGKILL)
+            killed = True
+            deadline = time.monotonic() + 5.0
+        time.sleep(0.2)
+    return True
+
+
+class JobQueue:
+    """
+    Acceso a la cola en SQLite (lo usan el servicio y el cliente)
+
+    Args:
+        db_path: Archivo de la base de datos (se crea si no existe)
+    """
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.jobs_dir = self.db_path.parent / "trabajos"
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, kind, target=None, base=None, output=None, args=(), priority=0,
+            depends_on=None, cwd=None):
+        """
+        Encola un trabajo
+
+        Returns:
+            int: Id del trabajo
+
+        Raises:
+            ValueError: Si el tipo o la dependencia no son válidos
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Tipo de trabajo inválido: {kind} ({', '.join(JOB_KINDS)})")
+        if depends_on is not None and self.get(depends_on) is None:
+            raise ValueError(f"No existe el trabajo {depends_on}")
+        if kind == 'export' and not target and depends_on is None:
+            raise ValueError("Un trabajo de exportación necesita un checkpoint o --after")
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (kind, target, base, output, args, cwd, priority, depends_on, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, target, base, output, json.dumps(list(args)), cwd or os.getcwd(),
+                 priority, depends_on, time.time()))
+        return cursor.lastrowid
+
+    def get(self, job_id):
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, statuses=None):
+        """Trabajos (opcionalmente solo con estos estados) en orden de ejecución"""
+        query = "SELECT * FROM jobs"
+        params = ()
+        if statuses:
+            query += f" WHERE status IN ({', '.join('?' for _ in statuses)})"
+            params = tuple(statuses)
+        query += " ORDER BY priority DESC, id"
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def update(self, job_id, **fields):
+        assignments = ', '.join(f"{key} = ?" for key in fields)
+        with self.conn:
+            self.conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?",
+                              tuple(fields.values()) + (job_id,))
+
+    def cancel(self, job_id):
+        """
+        Cancela un trabajo en cola, o pide al servicio que detenga uno en marcha
+
+        Returns:
+            str o None: Nuevo estado (None si ya había terminado)
+        """
+        job = self.get(job_id)
+        if job is None or job['status'] in FINAL_STATES:
+            return None
+        status = 'cancelling' if job['status'] == 'running' else 'cancelled'
+        self.update(job_id, status=status, finished_at=time.time() if status == 'cancelled' else None)
+        return status
+
+    def job_dir(self, job_id):
+        return self.jobs_dir / f"{job_id:05d}"
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def claim_daemon(self, pid):
+        """
+        Registra ``pid`` como servicio de la cola si no hay otro en marcha
+
+        La comprobación y el registro van en una transacción BEGIN IMMEDIATE:
+        de dos servicios arrancados a la vez, solo uno se registra.
+
+        Returns:
+            int o None: PID del servicio que ya estaba en marcha, o None si
+                ``pid`` quedó registrado
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            owner = daemon_pid(self)
+            if owner is None or owner == pid:
+                owner = None
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                  ('daemon', f"{pid} {process_identity(pid)}"))
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return owner
+
+
+def _option_value(args, option):
+    """Valor de ``option`` en una lista de argumentos (--opt valor o --opt=valor)"""
+    for i, arg in enumerate(args):
+        if arg == option and i + 1 < len(args):
+            return args[i + 1]
+        if arg.startswith(option + '='):
+            return arg.split('=', 1)[1]
+    return None
+
+
+def job_command(queue, job, slot):
+    """
+    Comando de un trabajo en un hueco de hardware
+
+    Returns:
+        tuple: (comando, directorio de checkpoints del trabajo o None)
+    """
+    args = json.loads(job['args'])
+    if job['kind'] == 'train':
+        checkpoint_dir = _option_value(args, '--checkpoint-dir')
+        if checkpoint_dir:
+            checkpoint_dir = str(Path(job['cwd']) / checkpoint_dir)
+        else:
+            checkpoint_dir = str(queue.job_dir(job['id']) / "checkpoints")
+            args = ['--checkpoint-dir', checkpoint_dir] + args
+        base = job['base']
+        if job['resumes']:
+            # Reanudar: el checkpoint más reciente sustituye al modelo base
+            base = latest_checkpoint(checkpoint_dir) or base
+        cmd = [sys.executable, str(SCRIPTS_DIR / "train.py"), job['target']]
+        if base:
+            cmd.append(str(base))
+        if _option_value(args, '--accelerator') is None:
+            args = slot['args'] + args
+        return cmd + args, checkpoint_dir
+
+    checkpoint = job['target']
+    if not checkpoint and job['depends_on'] is not None:
+        checkpoint = queue.get(job['depends_on'])['checkpoint_dir']
+    cmd = [sys.executable, str(SCRIPTS_DIR / "export.py"), checkpoint]
+    if job['output']:
+        cmd.append(job['output'])
+    return cmd + args, None
+
+
+class QueueDaemon:
+    """
+    Servicio que ejecuta los trabajos de la cola
+
+    Args:
+        queue: JobQueue
+        slots: Huecos de hardware (barrido.hardware_slots)
+        max_concurrent: Trabajos simultáneos como máximo
+    """
+
+    def __init__(self, queue, slots, max_concurrent=None):
+        self.queue = queue
+        self.slots = slots
+        self.max_concurrent = min(max_concurrent or len(slots), len(slots))
+        self._running = {}
+        self._stopping = False
+
+    def recover(self):
+        """Reencola los trabajos que quedaron en marcha en un arranque anterior"""
+        for job in self.queue.list(['running', 'cancelling']):
+            if _same_process(job['pid'], job['pid_identity']):
+                # El servicio anterior cayó sin detenerlos: sin él nadie
+                # recoge su salida, así que se relanzan desde su checkpoint.
+                # Un PID reutilizado por otro proceso no se toca.
+                print(f"[{job['id']}] deteniendo el proceso huérfano {job['pid']}...")
+                if not _stop_orphan_job(job['pid'], job['pid_identity']):
+                    # Relanzarlo pondría dos procesos en el mismo directorio
+                    self.queue.update(job['id'], status='failed', finished_at=time.time(),
+                                      note=f"el proceso {job['pid']} no terminó ni con SIGKILL")
+                    print(f"[{job['id']}] fallido: el proceso {job['pid']} no terminó")
+                    continue
+            if job['status'] == 'cancelling':
+                self.queue.update(job['id'], status='cancelled', pid=None, pid_identity=None,
+                                  finished_at=time.time())
+            else:
+                self.queue.update(job['id'], status='queued', pid=None, pid_identity=None, slot=None,
+                                  resumes=job['resumes'] + 1)
+                print(f"[{job['id']}] reencolado (interrumpido)")
+
+    def _ready_jobs(self):
+        ready = []
+        for job in self.queue.list(['queued']):
+            if job['depends_on'] is not None:
+                dependency = self.queue.get(job['depends_on'])
+                if dependency is None or dependency['status'] in ('failed', 'cancelled'):
+                    self.queue.update(job['id'], status='cancelled', finished_at=time.time(),
+                                      note=f"el trabajo {job['depends_on']} no terminó")
+                    continue
+                if dependency['status'] != 'done':
+                    continue
+            ready.append(job)
+        return ready
+
+    def _start(self, job, slot):
+        job_dir = self.queue.job_dir(job['id'])
+        job_dir.mkdir(parents=True, exist_ok=True)
+        cmd, checkpoint_dir = job_command(self.queue, job, slot)
+        log = open(job_dir / "console.log", 'a', encoding='utf-8')
+        log.write(f"\n=== {time.strftime('%Y-%m-%d %H:%M:%S')} {' '.join(cmd)}\n")
+        log.flush()
+        process = subprocess.Popen(cmd, cwd=job['cwd'], stdin=subprocess.DEVNULL, stdout=log,
+                                   stderr=subprocess.STDOUT, env=dict(os.environ, **slot['env']),
+                                   start_new_session=(sys.platform != 'win32'))
+        self._running[job['id']] = (process, log, slot)
+        self.queue.update(job['id'], status='running', slot=slot['name'], pid=process.pid,
+                          pid_identity=process_identity(process.pid),
+                          checkpoint_dir=checkpoint_dir, started_at=time.time())
+        print(f"[{job['id']}] {job['kind']} en {slot['name']}: {' '.join(cmd[1:])}")
+
+    def _reap(self):
+        for job_id, (process, log, _) in list(self._running.items()):
+            job = self.queue.get(job_id)
+            code = process.poll()
+            if code is None:
+                if job['status'] == 'cancelling':
+                    _kill_job(process.pid)
+                continue
+            log.close()
+            del self._running[job_id]
+            if job['status'] == 'cancelling':
+                status = 'cancelled'
+            else:
+                status = 'done' if code == 0 else 'failed'
+            self.queue.update(job_id, status=status, exit_code=code, pid=None, pid_identity=None,
+                              finished_at=time.time())
+            print(f"[{job_id}] {status} (código {code})")
+
+    def _schedule(self):
+        busy = {slot['name'] for _, _, slot in self._running.values()}
+        free = [slot for slot in self.slots if slot['name'] not in busy]
+        for job in self._ready_jobs():
+            if not free or len(self._running) >= self.max_concurrent:
+                break
+            self._start(job, free.pop(0))
+
+    def stop(self, *args):
+        self._stopping = True
+
+    def serve(self):
+        """Bucle principal hasta SIGINT/SIGTERM; los trabajos en marcha se reencolan"""
+        owner = self.queue.claim_daemon(os.getpid())
+        if owner:
+            raise RuntimeError(f"Ya hay un servicio usando {self.queue.db_path} (PID {owner})")
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.recover()
+        try:
+            while not self._stopping:
+                self._reap()
+                self._schedule()
+                time.sleep(POLL_INTERVAL)
+        finally:
+            for job_id, (process, log, _) in self._running.items():
+                _kill_job(process.pid)
+                process.wait()
+                log.close()
+                job = self.queue.get(job_id)
+                if job['status'] == 'cancelling':
+                    self.queue.update(job_id, status='cancelled', pid=None, pid_identity=None,
+                                      finished_at=time.time())
+                else:
+                    self.queue.update(job_id, status='queued', pid=None, pid_identity=None, slot=None,
+                                      resumes=job['resumes'] + 1)
+                    print(f"[{job_id}] detenido; se reanudará al volver a arrancar el servicio")
+            self.queue.set_meta('daemon', '')
+
+
+def daemon_pid(queue):
+    """PID del servicio de la cola si está en marcha, o None"""
+    pid, _, identity = (queue.get_meta('daemon') or '').partition(' ')
+    if pid and _same_process(int(pid), identity):
+        return int(pid)
+    return None
+
+
+def format_job(job):
+    when = time.strftime('%m-%d %H:%M', time.localtime(job['created_at']))
+    target = job['target'] or (f"<trabajo {job['depends_on']}>" if job['depends_on'] else '-')
+    extra = f" -> {job['output']}" if job['output'] else ''
+    resumes = f" (reanudado {job['resumes']}x)" if job['resumes'] else ''
+    return (f"{job['id']:>5}  {job['kind']:<6}  {job['status']:<10}  {job['slot'] or '-':<12}  "
+            f"{when}  {target}{extra}{resumes}")
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Cola persistente de trabajos de entrenamiento y exportación'
+    )
+    parser.add_argument(
+        '--db',
+        default=os.environ.get('PIPER_QUEUE_DB', str(DEFAULT_DB)),
+        help=f'Base de datos de la cola (por defecto: $PIPER_QUEUE_DB o {DEFAULT_DB})'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Ejecutar el servicio de la cola')
+    serve.add_argument('--max-concurrent', type=int,
+                       help='Trabajos simultáneos como máximo (por defecto: uno por hueco)')
+    serve.add_argument('--gpus', help='GPUs a usar, separadas por comas (por defecto: todas)')
+    serve.add_argument('--cpu-slices', type=int,
+                       help='Sin GPU: grupos de núcleos en que repartir los trabajos (por defecto: 1)')
+
+    add = commands.add_parser('add', help='Encolar un trabajo',
+                              usage='%(prog)s {train,export} [opciones] [-- opciones de train.py/export.py]')
+    add.add_argument('kind', choices=JOB_KINDS, help='Tipo de trabajo')
+    add.add_argument('target', nargs='?',
+                     help='train: dataset preprocesado; export: checkpoint o directorio de checkpoints')
+    add.add_argument('output', nargs='?', help='export: archivo .onnx de salida')
+    add.add_argument('--base', help='train: checkpoint base para transfer learning')
+    add.add_argument('--after', type=int, help='Esperar a que este trabajo termine bien '
+                                               '(export: usa sus checkpoints)')
+    add.add_argument('--priority', type=int, default=0, help='Mayor prioridad se ejecuta antes (por defecto: 0)')
+
+    listing = commands.add_parser('list', help='Listar los trabajos')
+    listing.add_argument('--all', action='store_true', help='Incluir los terminados')
+
+    for name, help_text in (('show', 'Detalles de un trabajo'), ('log', 'Salida de un trabajo'),
+                            ('cancel', 'Cancelar un trabajo')):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('job_id', type=int)
+
+    if '--' in sys.argv:
+        sep = sys.argv.index('--')
+        argv, job_args = sys.argv[1:sep], sys.argv[sep + 1:]
+    else:
+        argv, job_args = sys.argv[1:], []
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.db)
+
+    if args.command == 'serve':
+        try:
+            gpus = [int(g) for g in args.gpus.split(',') if g.strip()] if args.gpus else None
+        except ValueError:
+            print(f"--gpus inválido: {args.gpus}")
+            sys.exit(1)
+        slots = hardware_slots(gpus, args.cpu_slices)
+        daemon = QueueDaemon(queue, slots, args.max_concurrent)
+        print(f"Cola {queue.db_path}: hasta {daemon.max_concurrent} trabajos en "
+              f"{', '.join(slot['name'] for slot in slots)}")
+        try:
+            daemon.serve()
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        sys.exit(0)
+
+    if args.command == 'add':
+        if args.kind == 'train' and not args.target:
+            print("Un trabajo de entrenamiento necesita el dataset preprocesado")
+            sys.exit(1)
+        target = args.target
+        if args.kind == 'export' and args.after is not None and args.output is None:
+            # "add export mi_voz.onnx --after 3": el único posicional es la salida
+            target, output = None, args.target
+        else:
+            output = args.output
+        try:
+            job_id = queue.add(args.kind, str(Path(target).resolve()) if target else None,
+                               str(Path(args.base).resolve()) if args.base else None,
+                               str(Path(output).resolve()) if output else None,
+                               job_args, args.priority, args.after)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        print(f"Trabajo {job_id} encolado")
+        if not daemon_pid(queue):
+            print("  El servicio no está en marcha: python scripts/cola_trabajos.py serve")
+        sys.exit(0)
+
+    if args.command == 'list':
+        jobs = queue.list(None if args.all else ['queued', 'running', 'cancelling'])
+        if not jobs:
+            print("No hay trabajos" + ("" if args.all else " pendientes (--all muestra los terminados)"))
+            sys.exit(0)
+        print(f"{'id':>5}  {'tipo':<6}  {'estado':<10}  {'hueco':<12}  {'creado':<11}  objetivo")
+        for job in jobs:
+            print(format_job(job))
+        sys.exit(0)
+
+    job = queue.get(args.job_id)
+    if job is None:
+        print(f"No existe el trabajo {args.job_id}")
+        sys.exit(1)
+
+    if args.command == 'show':
+        for key, value in job.items():
+            if key.endswith('_at') and value:
+                value = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(value))
+            print(f"  {key:<15} {value if value is not None else '-'}")
+        print(f"  {'log':<15} {queue.job_dir(job['id']) / 'console.log'}")
+    elif args.command == 'log':
+        log_path = queue.job_dir(job['id']) / "console.log"
+        try:
+            with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+                sys.stdout.write(f.read())
+        except OSError:
+            print(f"El trabajo {job['id']} aún no tiene salida")
+    elif args.command == 'cancel':
+        status = queue.cancel(job['id'])
+        print(f"Trabajo {job['id']}: {status}" if status else f"El trabajo {job['id']} ya había terminado")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
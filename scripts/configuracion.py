@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Configuración compartida desde YAML y perfiles de rendimiento con nombre
+
+limpiar_audio.py, limpiar_dataset.py, preprocess.py, train.py y export.py
+aceptan:
+
+    --config archivo.yaml   Archivo con el formato de config.example.yaml
+    --profile NOMBRE        Perfil con nombre (ver PROFILES o la sección
+                            'profiles:' del YAML)
+
+Precedencia: argumentos de línea de comandos > perfil > secciones del YAML >
+variables de entorno > valores por defecto. Cada script solo toma las claves
+que entiende.
+
+Uso:
+    python configuracion.py --profile fast-cpu-smoke    # muestra los valores
+    python configuracion.py --config mi_config.yaml
+"""
+
+import argparse
+import os
+import sys
+
+from perfiles_calidad import sample_rate_for_quality
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# Perfiles incluidos: ajustan en un solo sitio tamaño de batch, precisión,
+# workers, sample rate y calidad para que todos los pasos sean coherentes
+PROFILES = {
+    'fast-cpu-smoke': {
+        'description': 'Prueba rápida de extremo a extremo en CPU (minutos, no produce una voz útil)',
+        'quality': 'x_low',
+        'sample_rate': sample_rate_for_quality('x_low'),
+        'batch_size': 2,
+        'max_epochs': 1,
+        'checkpoint_epochs': 1,
+        'validation_split': 0.1,
+        'num_test_examples': 1,
+        'precision': '32',
+        'accelerator': 'cpu',
+        'devices': '1',
+        'workers': 2,
+        'patience': 0,
+        'keep_checkpoints': 1,
+        'max_duration': 5.0,
+    },
+    'max-throughput-gpu': {
+        'description': 'Máximo rendimiento en una GPU con 12 GB o más',
+        'quality': 'medium',
+        'sample_rate': sample_rate_for_quality('medium'),
+        'batch_size': 32,
+        'precision': '16-mixed',
+        'accelerator': 'gpu',
+        'devices': '1',
+        'workers': os.cpu_count() or 1,
+        'checkpoint_epochs': 50,
+        'max_duration': 15.0,
+    },
+}
+
+# Sección del YAML -> {clave en el YAML: clave de configuración}
+SECTION_KEYS = {
+    'audio': {'sample_rate': 'sample_rate', 'top_db': 'top_db'},
+    'model': {'quality': 'quality'},
+    'training': {
+        'batch_size': 'batch_size',
+        'accumulate_grad_batches': 'accumulate_grad_batches',
+        'lr_scaling': 'lr_scaling',
+        'learning_rate': 'learning_rate',
+        'max_epochs': 'max_epochs',
+        'checkpoint_epochs': 'checkpoint_epochs',
+        'checkpoint_dir': 'checkpoint_dir',
+        'validation_split': 'validation_split',
+        'num_test_examples': 'num_test_examples',
+        'async_test_examples': 'async_test_examples',
+        'precision': 'precision',
+        'patience': 'patience',
+        'min_delta': 'min_delta',
+        'keep_checkpoints': 'keep_checkpoints',
+        'supervise': 'supervise',
+        'max_oom_retries': 'max_oom_retries',
+    },
+    'hardware': {
+        'accelerator': 'accelerator',
+        'devices': 'devices',
+        'cpu_processes': 'cpu_processes',
+        'threads_per_process': 'threads_per_process',
+        'dataloader_workers': 'dataloader_workers',
+        'cpu_tuning': 'cpu_tuning',
+        'workers': 'workers',
+        'memory_budget_gb': 'memory_budget_gb',
+        'dataset_cache': 'dataset_cache',
+        'cache_budget_gb': 'cache_budget_gb',
+    },
+    'dataset': {
+        'language': 'language',
+        'min_audio_length': 'min_duration',
+        'max_audio_length': 'max_duration',
+    },
+    'export': {'output_file': 'output_file', 'in_process': 'in_process'},
+}
+
+
+def _read_yaml(path):
+    if yaml is None:
+        raise ValueError("Para usar --config instala PyYAML: pip install pyyaml")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+    except OSError as e:
+        raise ValueError(f"No se pudo leer {path}: {e}")
+    except yaml.YAMLError as e:
+        raise ValueError(f"YAML inválido en {path}: {e}")
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} debe contener un diccionario de secciones")
+    return data
+
+
+def _flatten_sections(data):
+    values = {}
+    for section, keys in SECTION_KEYS.items():
+        content = data.get(section) or {}
+        for yaml_key, key in keys.items():
+            if content.get(yaml_key) is not None:
+                values[key] = content[yaml_key]
+    transfer = data.get('transfer_learning') or {}
+    if transfer.get('enabled') and transfer.get('base_model'):
+        values['checkpoint_base'] = transfer['base_model']
+    return values
+
+
+def load_config(path=None, profile=None):
+    """
+    Lee un YAML y/o un perfil y devuelve la configuración plana
+
+    Args:
+        path: Archivo YAML (opcional)
+        profile: Nombre del perfil; si no se indica se usa la clave 'profile'
+            del YAML, si existe
+
+    Returns:
+        dict: Claves de configuración (sample_rate, batch_size, quality, ...)
+
+    Raises:
+        ValueError: Si el YAML no es válido o el perfil no existe
+    """
+    data = _read_yaml(path) if path else {}
+    layers = [_flatten_sections(data)]
+
+    profile = profile or data.get('profile')
+    if profile:
+        profiles = dict(PROFILES)
+        profiles.update(data.get('profiles') or {})
+        if profile not in profiles:
+            raise ValueError(f"Perfil desconocido: {profile}. Disponibles: {', '.join(sorted(profiles))}")
+        layers.append({k: v for k, v in profiles[profile].items() if k != 'description'})
+
+    values = {}
+    for layer in layers:
+        # La frecuencia de muestreo acompaña a la calidad de la misma capa
+        # salvo que esa capa la fije explícitamente
+        if 'quality' in layer and 'sample_rate' not in layer:
+            layer = dict(layer, sample_rate=sample_rate_for_quality(layer['quality']))
+        values.update(layer)
+    if profile:
+        values['profile'] = profile
+    if 'devices' in values:
+        values['devices'] = str(values['devices'])
+    if 'precision' in values:
+        values['precision'] = str(values['precision'])
+    return values
+
+
+def add_config_arguments(parser):
+    """Añade --config y --profile a un parser de argparse"""
+    parser.add_argument(
+        '--config',
+        help='Archivo YAML de configuración (formato de config.example.yaml)'
+    )
+    parser.add_argument(
+        '--profile',
+        help=f"Perfil de rendimiento ({', '.join(PROFILES)} o definido en el YAML)"
+    )
+
+
+def apply_config(args, keys):
+    """
+    Completa los argumentos no indicados (None) con la configuración
+
+    Args:
+        args: Namespace de argparse con los atributos config y profile
+        keys: Claves de configuración que entiende el script (nombres de
+            atributo de args)
+
+    Returns:
+        dict: Configuración completa cargada (vacía sin --config ni --profile)
+    """
+    if not args.config and not args.profile:
+        return {}
+    config = load_config(args.config, args.profile)
+    for key in keys:
+        if getattr(args, key, None) is None and key in config:
+            setattr(args, key, config[key])
+    return config
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Muestra la configuración resultante de un YAML y/o perfil'
+    )
+    add_config_arguments(parser)
+    parser.add_argument(
+        '--list',
+        action='store_true',
+        help='Listar los perfiles incluidos'
+    )
+
+    args = parser.parse_args()
+
+    if args.list or not (args.config or args.profile):
+        for name, values in PROFILES.items():
+            print(f"{name}: {values['description']}")
+        sys.exit(0)
+
+    try:
+        config = load_config(args.config, args.profile)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    for key in sorted(config):
+        print(f"  {key}: {config[key]}")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Ejemplos de prueba sintetizados fuera del bucle de entrenamiento
+
+piper_train genera el audio de los ejemplos de test (--num-test-examples)
+dentro del proceso de entrenamiento, en cada validación, y el entrenamiento
+se detiene mientras tanto. Con train.py --async-test-examples ese audio se
+desactiva en piper_train y este script lo produce en un proceso aparte:
+
+- train.py le envía la ruta de cada checkpoint nuevo (eventos 'checkpoint'
+  del flujo de métricas) por su entrada estándar.
+- El proceso baja su prioridad (nice 19) y se fija a núcleos de CPU que el
+  entrenamiento no usa, así que nunca le quita tiempo.
+- Por cada checkpoint exporta el modelo a ONNX, sintetiza las frases de
+  test con onnxruntime y deja junto al checkpoint un directorio
+  <checkpoint>.ejemplos/ con un .wav por frase y ejemplos.json con la
+  latencia de síntesis (segundos y factor de tiempo real).
+
+Las frases de test son las de splits/test.idx (split_dataset.py), que no se
+usan para entrenar.
+
+Uso (sintetizar a mano los ejemplos de checkpoints ya guardados):
+    python ejemplos_prueba.py dataset_procesado checkpoints/epoch=99-step=5000.ckpt
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import wave
+from pathlib import Path
+
+from gestor_checkpoints import examples_dir
+from paralelo_cpu import available_cores
+from perfiles_calidad import read_dataset_audio_config
+from piper_api import run_piper_module
+from split_dataset import SPLIT_DIR, read_split_indices
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+REPORT_FILE = "ejemplos.json"
+LOG_FILE = "ejemplos_prueba.log"
+DEFAULT_NUM_EXAMPLES = 5
+DEFAULT_EXAMPLE_CORES = 2
+# noise_scale, length_scale, noise_w (los de piper_train si config.json no los trae)
+DEFAULT_SCALES = (0.667, 1.0, 0.8)
+
+
+def onnxruntime_available():
+    return importlib.util.find_spec('onnxruntime') is not None
+
+
+def spare_cores(count=DEFAULT_EXAMPLE_CORES, busy=None):
+    """
+    Núcleos para el proceso de ejemplos: los últimos que no usa el
+    entrenamiento (o los últimos de la máquina si los usa todos)
+    """
+    cores = available_cores()
+    free = [c for c in cores if c not in set(busy or ())]
+    return (free or cores)[-count:]
+
+
+def lower_priority():
+    """Baja la prioridad del proceso actual al mínimo"""
+    try:
+        if hasattr(os, 'nice'):
+            os.nice(19)
+        elif psutil is not None:
+            psutil.Process().nice(psutil.IDLE_PRIORITY_CLASS)
+    except (OSError, AttributeError):
+        pass
+
+
+def pin_to_cores(cores):
+    """Afinidad e hilos del proceso actual (antes de importar torch u onnxruntime)"""
+    os.environ.update(OMP_NUM_THREADS=str(len(cores)), MKL_NUM_THREADS=str(len(cores)))
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cores)
+        elif psutil is not None:
+            psutil.Process().cpu_affinity(cores)
+    except (OSError, AttributeError, ValueError) as e:
+        print(f"[ADVERTENCIA] No se pudo fijar la afinidad de CPU: {e}", file=sys.stderr)
+
+
+def test_utterances(dataset_dir, limit=DEFAULT_NUM_EXAMPLES):
+    """
+    Frases de test del dataset (phoneme_ids, speaker_id y texto)
+
+    Usa splits/test.idx si existe; si no, las primeras ``limit`` frases de
+    dataset.jsonl (que piper_train puede haber usado para entrenar).
+    """
+    dataset_path = Path(dataset_dir)
+    try:
+        wanted = set(read_split_indices(dataset_path / SPLIT_DIR, 'test'))
+    except OSError:
+        wanted = None
+    utterances = []
+    with open(dataset_path / "dataset.jsonl", 'r', encoding='utf-8') as f:
+        for index, line in enumerate(f):
+            if len(utterances) >= limit:
+                break
+            if wanted is not None and index not in wanted:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('phoneme_ids'):
+                utterances.append({
+                    'index': index,
+                    'phoneme_ids': entry['phoneme_ids'],
+                    'speaker_id': entry.get('speaker_id'),
+                    'text': entry.get('text', ''),
+                })
+    return utterances
+
+
+def write_wav(path, audio, sample_rate):
+    """Guarda audio float como WAV PCM de 16 bits (normalizado como piper)"""
+    import numpy as np
+
+    peak = max(0.01, float(np.abs(audio).max())) if audio.size else 1.0
+    samples = np.clip(audio * (32767.0 / peak), -32767, 32767).astype('<i2')
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+
+
+def synthesize_examples(onnx_path, utterances, output_dir, sample_rate, scales=DEFAULT_SCALES,
+                        threads=1):
+    """
+    Sintetiza las frases con onnxruntime en CPU
+
+    Returns:
+        list: Un dict por frase con el archivo, la duración y la latencia
+    """
+    import numpy as np
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    session = onnxruntime.InferenceSession(str(onnx_path), options,
+                                           providers=['CPUExecutionProvider'])
+    input_names = {i.name for i in session.get_inputs()}
+
+    results = []
+    for number, utt in enumerate(utterances):
+        inputs = {
+            'input': np.array([utt['phoneme_ids']], dtype=np.int64),
+            'input_lengths': np.array([len(utt['phoneme_ids'])], dtype=np.int64),
+            'scales': np.array(scales, dtype=np.float32),
+        }
+        if 'sid' in input_names:
+            inputs['sid'] = np.array([utt['speaker_id'] or 0], dtype=np.int64)
+        start = time.perf_counter()
+        audio = session.run(None, inputs)[0].squeeze()
+        synth_s = time.perf_counter() - start
+        wav_name = f"test_{number:02d}.wav"
+        write_wav(Path(output_dir) / wav_name, audio, sample_rate)
+        audio_s = audio.size / sample_rate
+        results.append({
+            'file': wav_name,
+            'index': utt['index'],
+            'text': utt['text'],
+            'audio_s': round(audio_s, 3),
+            'synth_s': round(synth_s, 4),
+            'rtf': round(synth_s / audio_s, 4) if audio_s else None,
+        })
+    return results
+
+
+def process_checkpoint(checkpoint, utterances, sample_rate, scales=DEFAULT_SCALES, threads=1,
+                       keep_onnx=False):
+    """
+    Exporta un checkpoint y sintetiza sus ejemplos en <checkpoint>.ejemplos/
+
+    La retención de checkpoints puede borrar el checkpoint (y su directorio
+    de ejemplos) mientras se procesa; entonces se omite.
+
+    Returns:
+        dict o str: Contenido de ejemplos.json, 'skipped' si el checkpoint
+            desapareció o 'failed' si falló la exportación
+    """
+    output_dir = examples_dir(checkpoint)
+    onnx_path = output_dir / "model.onnx"
+
+    def pruned():
+        if Path(checkpoint).exists():
+            return False
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return True
+
+    try:
+        output_dir.mkdir(exist_ok=True)
+        start = time.perf_counter()
+        # Proceso de larga duración: la exportación en proceso importa torch una sola vez
+        exit_code, _, _ = run_piper_module('piper_train.export_onnx',
+                                           ['--checkpoint', str(checkpoint), '--output', str(onnx_path)],
+                                           in_process=True)
+        export_s = time.perf_counter() - start
+        if exit_code != 0 or not onnx_path.exists():
+            if pruned():
+                return 'skipped'
+            print(f"[ERROR] No se pudo exportar {checkpoint} (código {exit_code})", flush=True)
+            shutil.rmtree(output_dir, ignore_errors=True)
+            return 'failed'
+        examples = synthesize_examples(onnx_path, utterances, output_dir, sample_rate, scales, threads)
+    except OSError:
+        if pruned():
+            return 'skipped'
+        raise
+    rtfs = [e['rtf'] for e in examples if e['rtf'] is not None]
+    report = {
+        'checkpoint': Path(checkpoint).name,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'export_s': round(export_s, 2),
+        'threads': threads,
+        'mean_synth_s': round(sum(e['synth_s'] for e in examples) / len(examples), 4) if examples else None,
+        'mean_rtf': round(sum(rtfs) / len(rtfs), 4) if rtfs else None,
+        'examples': examples,
+    }
+    if not keep_onnx:
+        onnx_path.unlink(missing_ok=True)
+    if pruned():
+        return 'skipped'
+    with open(output_dir / REPORT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+class AsyncTestExamples:
+    """
+    Proceso de baja prioridad que sintetiza los ejemplos de cada checkpoint
+
+    on_metrics es un listener para MetricsStream: solo escribe la ruta del
+    checkpoint en la entrada del proceso, así que no bloquea el entrenamiento.
+
+    Args:
+        dataset_dir: Dataset preprocesado (frases de test y sample rate)
+        num_examples: Frases de test a sintetizar
+        log_path: Archivo donde va la salida del proceso
+        cores: Núcleos del proceso (por defecto: spare_cores())
+    """
+
+    def __init__(self, dataset_dir, num_examples, log_path, cores=None):
+        self.cores = cores or spare_cores()
+        self._log = open(log_path, 'a', encoding='utf-8')
+        cmd = [sys.executable, str(Path(__file__).resolve()), str(dataset_dir), '--stdin',
+               '--num-examples', str(num_examples), '--cores', ','.join(str(c) for c in self.cores)]
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=self._log,
+                                        stderr=subprocess.STDOUT, text=True)
+        self.sent = 0
+
+    def on_metrics(self, record):
+        if record.get('event') != 'checkpoint' or not record.get('path') or self.process.stdin is None:
+            return
+        try:
+            self.process.stdin.write(str(Path(record['path']).resolve()) + '\n')
+            self.process.stdin.flush()
+            self.sent += 1
+        except (BrokenPipeError, OSError, ValueError):
+            # El proceso terminó (p. ej. sin onnxruntime): no se envían más
+            self.process.stdin = None
+
+    def close(self):
+        """Cierra la entrada y espera a que termine el checkpoint en curso"""
+        if self.process.stdin is not None:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+        self.process.wait()
+        self._log.close()
+        return self.process.returncode
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Exporta checkpoints y sintetiza sus frases de test con onnxruntime'
+    )
+    parser.add_argument(
+        'dataset_dir',
+        help='Dataset preprocesado (con dataset.jsonl y config.json)'
+    )
+    parser.add_argument(
+        'checkpoints',
+        nargs='*',
+        help='Checkpoints (.ckpt) a procesar'
+    )
+    parser.add_argument(
+        '--stdin',
+        action='store_true',
+        help='Leer además rutas de checkpoints de la entrada estándar, una por línea'
+    )
+    parser.add_argument(
+        '--num-examples',
+        type=int,
+        default=DEFAULT_NUM_EXAMPLES,
+        help=f'Frases de test a sintetizar (por defecto: {DEFAULT_NUM_EXAMPLES})'
+    )
+    parser.add_argument(
+        '--cores',
+        help=f'Núcleos de CPU separados por comas (por defecto: los {DEFAULT_EXAMPLE_CORES} últimos)'
+    )
+    parser.add_argument(
+        '--keep-onnx',
+        action='store_true',
+        help='Conservar el modelo ONNX exportado junto a los ejemplos'
+    )
+
+    args = parser.parse_args()
+
+    if not onnxruntime_available():
+        print("[ERROR] onnxruntime no está instalado: pip install onnxruntime", flush=True)
+        sys.exit(1)
+
+    utterances = test_utterances(args.dataset_dir, args.num_examples)
+    if not utterances:
+        print(f"[ERROR] No hay frases de test en {args.dataset_dir}", flush=True)
+        sys.exit(1)
+    try:
+        with open(Path(args.dataset_dir) / "config.json", 'r', encoding='utf-8') as f:
+            inference = json.load(f).get('inference', {}) or {}
+    except (OSError, ValueError):
+        inference = {}
+    sample_rate = read_dataset_audio_config(args.dataset_dir).get('sample_rate', 22050)
+    scales = (inference.get('noise_scale', DEFAULT_SCALES[0]),
+              inference.get('length_scale', DEFAULT_SCALES[1]),
+              inference.get('noise_w', DEFAULT_SCALES[2]))
+
+    cores = [int(c) for c in args.cores.split(',')] if args.cores else spare_cores()
+    lower_priority()
+    pin_to_cores(cores)
+    print(f"[INFO] {len(utterances)} frases de test, núcleos {cores}, prioridad mínima", flush=True)
+
+    def pending():
+        yield from args.checkpoints
+        if args.stdin:
+            for line in sys.stdin:
+                if line.strip():
+                    yield line.strip()
+
+    failures = 0
+    for checkpoint in pending():
+        report = 'skipped'
+        if Path(checkpoint).exists():
+            report = process_checkpoint(checkpoint, utterances, sample_rate, scales, len(cores),
+                                        args.keep_onnx)
+        if report == 'skipped':
+            # La retención de checkpoints lo borró mientras esperaba o se procesaba
+            print(f"[INFO] {checkpoint} ya no existe; se omite", flush=True)
+            continue
+        if report == 'failed':
+            failures += 1
+            continue
+        print(f"[INFO] {report['checkpoint']}: {len(report['examples'])} ejemplos en "
+              f"{examples_dir(checkpoint)} (exportación {report['export_s']:.1f} s, "
+              f"síntesis media {report['mean_synth_s']} s, RTF {report['mean_rtf']})", flush=True)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,11 @@ import subprocess
 import sys
 from pathlib import Path
 
+from ajuste_cpu import thread_env
+from configuracion import add_config_arguments, apply_config
+from gestor_checkpoints import best_checkpoint
+from piper_api import piper_module_available, run_in_process
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -177,13 +182,16 @@ if __name__ == '__main__':
     return test_script_path
 
 
-def export_model(checkpoint, output_file):
+def export_model(checkpoint, output_file, in_process=False):
     """
     Exporta un modelo Piper entrenado a formato ONNX
     
     Args:
-        checkpoint: Archivo .ckpt del modelo entrenado
+        checkpoint: Archivo .ckpt del modelo entrenado, o directorio de
+            checkpoints (se usa el de menor val_loss según checkpoints.json)
         output_file: Nombre del archivo ONNX de salida
+        in_process: Ejecutar piper_train en este intérprete en lugar de un
+            subproceso (evita reimportar torch desde un driver de larga duración)
         
     Returns:
         bool: True si fue exitoso, False si falló
@@ -191,6 +199,16 @@ def export_model(checkpoint, output_file):
     checkpoint_path = Path(checkpoint)
     output_path = Path(output_file)
     
+    # Directorio de checkpoints: elegir el mejor por val_loss
+    if checkpoint_path.is_dir():
+        best = best_checkpoint(checkpoint_path)
+        if best is None:
+            print_error(f"No hay checkpoints en: {checkpoint}")
+            return False
+        print_info(f"Mejor checkpoint de {checkpoint}: {best}")
+        checkpoint_path = best
+        checkpoint = str(best)
+    
     # Verificar que el checkpoint existe
     if not checkpoint_path.exists():
         print_error(f"Checkpoint no encontrado: {checkpoint}")
@@ -211,21 +229,27 @@ def export_model(checkpoint, output_file):
     print()
     
     # Exportar modelo
-    cmd = [
-        sys.executable, '-m', 'piper_train.export_onnx',
+    piper_args = [
         '--checkpoint', str(checkpoint_path),
         '--output', str(output_path)
     ]
     
     try:
-        result = subprocess.run(cmd, check=False, capture_output=True, text=True)
-        exit_code = result.returncode
-        
-        # Mostrar output si hay
-        if result.stdout:
-            print(result.stdout)
-        if result.stderr:
-            print(result.stderr, file=sys.stderr)
+        if in_process and piper_module_available('piper_train.export_onnx'):
+            # La salida se muestra directamente en la consola del proceso actual
+            exit_code = run_in_process('piper_train.export_onnx', piper_args)
+        else:
+            cmd = [sys.executable, '-m', 'piper_train.export_onnx'] + piper_args
+            # La exportación corre en CPU: un hilo por núcleo físico
+            result = subprocess.run(cmd, check=False, capture_output=True, text=True,
+                                    env=dict(os.environ, **thread_env()))
+            exit_code = result.returncode
+            
+            # Mostrar output si hay
+            if result.stdout:
+                print(result.stdout)
+            if result.stderr:
+                print(result.stderr, file=sys.stderr)
     
     except FileNotFoundError:
         print_error("No se pudo ejecutar piper_train.export_onnx")
@@ -312,22 +336,47 @@ def main():
 Ejemplos:
   python export.py checkpoints/modelo-epoch-8000.ckpt mi_voz_es.onnx
   python export.py checkpoints/best.ckpt output/mi_modelo.onnx
+  python export.py checkpoints/ mi_voz_es.onnx   # mejor checkpoint por val_loss
+  python export.py --config mi_config.yaml      # training.checkpoint_dir y export.output_file
         """
     )
     
     parser.add_argument(
         'checkpoint',
-        help='Archivo .ckpt del modelo entrenado'
+        nargs='?',
+        help='Archivo .ckpt del modelo entrenado o directorio de checkpoints (usa el mejor); '
+             'por defecto: training.checkpoint_dir de --config'
     )
     
     parser.add_argument(
         'output_file',
-        help='Nombre del archivo ONNX de salida'
+        nargs='?',
+        help='Nombre del archivo ONNX de salida (por defecto: export.output_file de --config)'
     )
     
+    parser.add_argument(
+        '--in-process',
+        action='store_true',
+        default=None,
+        help='Ejecutar piper_train en este proceso en lugar de un subproceso'
+    )
+    
+    add_config_arguments(parser)
+    
     args = parser.parse_args()
     
-    success = export_model(args.checkpoint, args.output_file)
+    try:
+        config = apply_config(args, ['output_file', 'in_process'])
+    except ValueError as e:
+        print_error(str(e))
+        sys.exit(1)
+    
+    checkpoint = args.checkpoint or config.get('checkpoint_dir')
+    if not checkpoint or not args.output_file:
+        parser.error("indica el checkpoint y el archivo de salida (o training.checkpoint_dir "
+                     "y export.output_file en --config)")
+    
+    success = export_model(checkpoint, args.output_file, in_process=bool(args.in_process))
     sys.exit(0 if success else 1)
 
 
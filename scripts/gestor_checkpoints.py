@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Retención de checkpoints por pérdida de validación
+
+piper_launcher.py guarda un checkpoint cuando la val_loss mejora (o cada
+checkpoint_epochs épocas) y lo anuncia en el flujo de métricas con un evento
+'checkpoint'. CheckpointManager escucha ese flujo, indexa cada checkpoint con
+su val_loss en checkpoints.json y conserva los ``keep_top_k`` mejores más el
+último; el resto se borra en segundo plano.
+
+Uso:
+    python gestor_checkpoints.py checkpoints/            # lista el índice
+    python gestor_checkpoints.py checkpoints/ --best     # imprime el mejor
+    python gestor_checkpoints.py checkpoints/ --prune 3  # aplica la retención
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+INDEX_FILE = "checkpoints.json"
+DEFAULT_KEEP_TOP_K = 3
+# Directorio de ejemplos de prueba junto a cada checkpoint (ejemplos_prueba.py)
+EXAMPLES_SUFFIX = ".ejemplos"
+
+
+def examples_dir(checkpoint):
+    """Directorio <checkpoint>.ejemplos/ con el audio de prueba de un checkpoint"""
+    checkpoint = Path(checkpoint)
+    return checkpoint.with_name(checkpoint.stem + EXAMPLES_SUFFIX)
+
+
+def _sort_key(entry):
+    """Orden por val_loss (sin val_loss al final)"""
+    val_loss = entry.get('val_loss')
+    if val_loss is None or not math.isfinite(val_loss):
+        return (1, 0.0, -entry.get('global_step', 0))
+    return (0, val_loss, -entry.get('global_step', 0))
+
+
+def _latest_key(entry):
+    return (entry.get('global_step', 0), entry.get('epoch', 0))
+
+
+def load_index(checkpoint_dir):
+    """Lee checkpoints.json descartando entradas cuyo archivo ya no existe"""
+    checkpoint_path = Path(checkpoint_dir)
+    try:
+        with open(checkpoint_path / INDEX_FILE, 'r', encoding='utf-8') as f:
+            entries = json.load(f).get('checkpoints', [])
+    except (OSError, ValueError):
+        return []
+    return [e for e in entries if (checkpoint_path / e['path']).exists()]
+
+
+def select_retained(entries, keep_top_k):
+    """Entradas que se conservan: las ``keep_top_k`` mejores más la última"""
+    if not entries:
+        return []
+    retained = sorted(entries, key=_sort_key)[:max(0, keep_top_k)]
+    latest = max(entries, key=_latest_key)
+    if latest not in retained:
+        retained.append(latest)
+    return retained
+
+
+def best_checkpoint(checkpoint_dir):
+    """
+    Devuelve el checkpoint con menor val_loss del índice
+
+    Si no hay índice (entrenamientos anteriores) se usa el .ckpt más reciente
+    bajo checkpoint_dir.
+
+    Returns:
+        Path o None
+    """
+    checkpoint_path = Path(checkpoint_dir)
+    entries = load_index(checkpoint_path)
+    if entries:
+        return checkpoint_path / sorted(entries, key=_sort_key)[0]['path']
+    candidates = sorted(checkpoint_path.rglob("*.ckpt"), key=lambda p: p.stat().st_mtime,
+                        reverse=True)
+    return candidates[0] if candidates else None
+
+
+def latest_checkpoint(checkpoint_dir):
+    """
+    Devuelve el checkpoint más reciente del índice (o el .ckpt más nuevo
+    bajo checkpoint_dir si no hay índice)
+
+    Returns:
+        Path o None
+    """
+    checkpoint_path = Path(checkpoint_dir)
+    entries = load_index(checkpoint_path)
+    if entries:
+        return checkpoint_path / max(entries, key=_latest_key)['path']
+    candidates = sorted(checkpoint_path.rglob("*.ckpt"), key=lambda p: p.stat().st_mtime,
+                        reverse=True)
+    return candidates[0] if candidates else None
+
+
+class CheckpointManager:
+    """
+    Índice de checkpoints alimentado por el flujo de métricas
+
+    Args:
+        checkpoint_dir: Directorio donde piper_launcher.py guarda los checkpoints
+        keep_top_k: Número de mejores checkpoints (por val_loss) que se conservan
+    """
+
+    def __init__(self, checkpoint_dir, keep_top_k=DEFAULT_KEEP_TOP_K):
+        self.checkpoint_path = Path(checkpoint_dir)
+        self.keep_top_k = keep_top_k
+        self.entries = load_index(self.checkpoint_path)
+        self.deleted = []
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def on_metrics(self, record):
+        """Listener para MetricsStream: indexa los eventos 'checkpoint'"""
+        if record.get('event') != 'checkpoint' or not record.get('path'):
+            return
+        path = Path(record['path'])
+        try:
+            relative = path.resolve().relative_to(self.checkpoint_path.resolve())
+        except ValueError:
+            relative = path
+        self.add(relative.as_posix(), record.get('epoch', 0), record.get('global_step', 0),
+                 record.get('val_loss'))
+
+    def add(self, path, epoch, global_step, val_loss):
+        """Añade un checkpoint al índice y aplica la retención en segundo plano"""
+        with self._lock:
+            self.entries = [e for e in self.entries if e['path'] != path]
+            self.entries.append({
+                'path': path,
+                'epoch': epoch,
+                'global_step': global_step,
+                'val_loss': val_loss,
+            })
+            retained = select_retained(self.entries, self.keep_top_k)
+            to_delete = [e for e in self.entries if e not in retained]
+            self.entries = retained
+            self._write_index()
+        if to_delete:
+            thread = threading.Thread(target=self._delete, args=(to_delete,),
+                                      name='ckpt-prune', daemon=True)
+            thread.start()
+            self._threads = [t for t in self._threads if t.is_alive()] + [thread]
+
+    def prune(self):
+        """Aplica la retención al índice actual y espera a que termine el borrado"""
+        with self._lock:
+            retained = select_retained(self.entries, self.keep_top_k)
+            to_delete = [e for e in self.entries if e not in retained]
+            self.entries = retained
+            self._write_index()
+        self._delete(to_delete)
+        return to_delete
+
+    def _delete(self, entries):
+        for entry in entries:
+            path = self.checkpoint_path / entry['path']
+            try:
+                path.unlink()
+                self.deleted.append(entry['path'])
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[ADVERTENCIA] No se pudo borrar {entry['path']}: {e}", file=sys.stderr)
+                continue
+            shutil.rmtree(examples_dir(path), ignore_errors=True)
+
+    def _write_index(self):
+        data = {
+            'keep_top_k': self.keep_top_k,
+            'checkpoints': sorted(self.entries, key=_sort_key),
+        }
+        tmp_path = self.checkpoint_path / (INDEX_FILE + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path / INDEX_FILE)
+
+    def best(self):
+        """Mejor checkpoint (Path) o None"""
+        with self._lock:
+            if not self.entries:
+                return None
+            return self.checkpoint_path / sorted(self.entries, key=_sort_key)[0]['path']
+
+    def latest(self):
+        """Último checkpoint guardado (Path) o None"""
+        with self._lock:
+            if not self.entries:
+                return None
+            return self.checkpoint_path / max(self.entries, key=_latest_key)['path']
+
+    def close(self):
+        """Espera a que terminen los borrados en curso"""
+        for thread in self._threads:
+            thread.join()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Lista o poda los checkpoints indexados por pérdida de validación'
+    )
+    parser.add_argument(
+        'checkpoint_dir',
+        help='Directorio de checkpoints (con checkpoints.json)'
+    )
+    parser.add_argument(
+        '--best',
+        action='store_true',
+        help='Imprimir solo la ruta del mejor checkpoint'
+    )
+    parser.add_argument(
+        '--prune',
+        type=int,
+        metavar='K',
+        help='Conservar los K mejores más el último y borrar el resto'
+    )
+
+    args = parser.parse_args()
+
+    if args.best:
+        best = best_checkpoint(args.checkpoint_dir)
+        if best is None:
+            print(f"No hay checkpoints en {args.checkpoint_dir}", file=sys.stderr)
+            sys.exit(1)
+        print(best)
+        sys.exit(0)
+
+    manager = CheckpointManager(args.checkpoint_dir,
+                                args.prune if args.prune is not None else DEFAULT_KEEP_TOP_K)
+    if args.prune is not None:
+        for path in manager.prune():
+            print(f"Borrado: {path['path']}")
+
+    if not manager.entries:
+        print(f"No hay checkpoints indexados en {args.checkpoint_dir}")
+        sys.exit(0)
+    best = manager.best()
+    latest = manager.latest()
+    for entry in sorted(manager.entries, key=_sort_key):
+        path = manager.checkpoint_path / entry['path']
+        marks = ' '.join(m for m, p in (('[mejor]', best), ('[último]', latest)) if p == path)
+        val_loss = entry['val_loss']
+        val_str = f"{val_loss:.4f}" if val_loss is not None else "-"
+        print(f"  época {entry['epoch']:>6}  paso {entry['global_step']:>8}  "
+              f"val_loss {val_str:>10}  {entry['path']} {marks}".rstrip())
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
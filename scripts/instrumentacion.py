@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Instrumentación de rendimiento para los scripts de Piper
+Mide tiempo por etapa, memoria pico y E/S de disco de procesos hijos
+
+Usa psutil si está instalado; si no, lee /proc en Linux y recurre a
+resource.getrusage en sistemas POSIX. En Windows sin psutil solo se
+registran los tiempos.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def format_bytes(num_bytes):
+    """Formatea un número de bytes de forma legible"""
+    if num_bytes is None:
+        return 'N/A'
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f} {unit}" if unit != 'B' else f"{num_bytes} B"
+        num_bytes /= 1024
+    return f"{num_bytes:.2f} TB"
+
+
+def _proc_children(pid):
+    """Devuelve los PIDs hijos (recursivos) de un proceso leyendo /proc"""
+    children = []
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        task_dir = Path(f"/proc/{current}/task")
+        try:
+            for task in task_dir.iterdir():
+                content = (task / "children").read_text().split()
+                for child in content:
+                    children.append(int(child))
+                    pending.append(int(child))
+        except OSError:
+            continue
+    return children
+
+
+def _proc_sample(pid):
+    """Lee RSS y contadores de E/S de un PID desde /proc (solo Linux)"""
+    rss = 0
+    read_bytes = write_bytes = 0
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        return None
+    try:
+        with open(f"/proc/{pid}/io", 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key == 'rchar':
+                    read_bytes = int(value)
+                elif key == 'wchar':
+                    write_bytes = int(value)
+    except OSError:
+        pass
+    return rss, read_bytes, write_bytes
+
+
+def sample_process_tree(pid):
+    """
+    Toma una muestra de memoria y E/S de un proceso y todos sus hijos
+
+    Args:
+        pid: PID del proceso raíz
+
+    Returns:
+        dict: {pid: (rss, bytes_leidos, bytes_escritos)} o {} si no hay soporte
+    """
+    samples = {}
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return samples
+        for proc in procs:
+            try:
+                rss = proc.memory_info().rss
+                try:
+                    io = proc.io_counters()
+                    read_bytes = getattr(io, 'read_chars', io.read_bytes)
+                    write_bytes = getattr(io, 'write_chars', io.write_bytes)
+                except (psutil.Error, AttributeError):
+                    read_bytes = write_bytes = 0
+                samples[proc.pid] = (rss, read_bytes, write_bytes)
+            except psutil.Error:
+                continue
+        return samples
+
+    if sys.platform.startswith('linux'):
+        for child_pid in [pid] + _proc_children(pid):
+            sample = _proc_sample(child_pid)
+            if sample is not None:
+                samples[child_pid] = sample
+    return samples
+
+
+class ProcessTreeMonitor:
+    """Acumula memoria pico y bytes de E/S de un árbol de procesos por muestreo"""
+
+    def __init__(self):
+        self.peak_rss = 0
+        self._io = {}
+
+    def update(self, pid):
+        """Registra una muestra del árbol de procesos de ``pid``"""
+        samples = sample_process_tree(pid)
+        if not samples:
+            return
+        self.peak_rss = max(self.peak_rss, sum(s[0] for s in samples.values()))
+        # Los contadores de E/S son acumulativos por proceso: guardar el último valor
+        # visto de cada PID conserva lo leído por workers que ya terminaron
+        for child_pid, (_, read_bytes, write_bytes) in samples.items():
+            self._io[child_pid] = (read_bytes, write_bytes)
+
+    @property
+    def read_bytes(self):
+        return sum(r for r, _ in self._io.values())
+
+    @property
+    def write_bytes(self):
+        return sum(w for _, w in self._io.values())
+
+    @property
+    def supported(self):
+        return bool(self._io)
+
+
+def _children_rusage():
+    """Devuelve el rusage acumulado de los procesos hijos (POSIX) o None"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+def run_monitored(cmd, interval=0.5, rusage=True, **popen_kwargs):
+    """
+    Ejecuta un comando muestreando memoria y E/S de su árbol de procesos
+
+    Args:
+        cmd: Comando a ejecutar (lista)
+        interval: Segundos entre muestras
+        rusage: Completar con getrusage(RUSAGE_CHILDREN); su máximo de RSS es
+            el de todos los hijos del proceso, así que se desactiva cuando se
+            comparan varias ejecuciones seguidas
+        **popen_kwargs: Argumentos adicionales para subprocess.Popen
+
+    Returns:
+        tuple: (código de salida, dict con peak_rss_bytes, read_bytes, write_bytes)
+    """
+    usage_before = _children_rusage() if rusage else None
+    monitor = ProcessTreeMonitor()
+
+    process = subprocess.Popen(cmd, **popen_kwargs)
+    while True:
+        monitor.update(process.pid)
+        try:
+            process.wait(timeout=interval)
+            break
+        except subprocess.TimeoutExpired:
+            continue
+
+    usage_after = _children_rusage() if rusage else None
+    peak_rss = monitor.peak_rss or None
+    read_bytes = monitor.read_bytes if monitor.supported else None
+    write_bytes = monitor.write_bytes if monitor.supported else None
+
+    if usage_after is not None:
+        # ru_maxrss está en KB en Linux y en bytes en macOS
+        maxrss = usage_after.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+        peak_rss = max(peak_rss or 0, maxrss)
+        if read_bytes is None:
+            # Bloques de 512 bytes leídos/escritos en disco (no incluye page cache)
+            read_bytes = (usage_after.ru_inblock - usage_before.ru_inblock) * 512
+            write_bytes = (usage_after.ru_oublock - usage_before.ru_oublock) * 512
+
+    return process.returncode, {
+        'peak_rss_bytes': peak_rss,
+        'read_bytes': read_bytes,
+        'write_bytes': write_bytes,
+    }
+
+
+class RunStats:
+    """
+    Registro de estadísticas de una ejecución: tiempos por etapa y recursos
+
+    Ejemplo:
+        stats = RunStats('preprocess')
+        with stats.stage('verificacion'):
+            ...
+        stats.write_json(output_dir / 'preprocess_stats.json')
+        print(stats.format_table())
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.stages = {}
+        self.metrics = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager que mide el tiempo de pared de una etapa"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_stage(self, name, seconds):
+        """Suma tiempo medido externamente a una etapa"""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def set(self, key, value):
+        """Registra una métrica arbitraria"""
+        self.metrics[key] = value
+
+    @property
+    def total_seconds(self):
+        return sum(self.stages.values())
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'started_at': self.started_at,
+            'total_seconds': round(self.total_seconds, 3),
+            'stages': {k: round(v, 3) for k, v in self.stages.items()},
+            'metrics': self.metrics,
+            'platform': sys.platform,
+            'pid': os.getpid(),
+        }
+
+    def write_json(self, path):
+        """Guarda el resumen en formato JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    def format_table(self):
+        """Devuelve una tabla compacta con las etapas y métricas"""
+        total = self.total_seconds or 1e-9
+        rows = [f"  {'Etapa':<28}{'Tiempo':>10}{'%':>7}"]
+        for name, seconds in self.stages.items():
+            rows.append(f"  {name:<28}{seconds:>9.2f}s{seconds / total * 100:>6.1f}%")
+        rows.append(f"  {'total':<28}{self.total_seconds:>9.2f}s")
+        for key, value in self.metrics.items():
+            if key.endswith('_bytes'):
+                value = format_bytes(value)
+            elif isinstance(value, float):
+                value = f"{value:.2f}"
+            rows.append(f"  {key:<28}{value!s:>10}")
+        return '\n'.join(rows)
@@ -6,12 +6,16 @@ Procesa archivos WAV para asegurar calidad consistente.
 
 import argparse
 import logging
+import sys
 from pathlib import Path
 import librosa
 import soundfile as sf
 import numpy as np
 from tqdm import tqdm
 
+from configuracion import add_config_arguments, apply_config
+from perfiles_calidad import DEFAULT_QUALITY, QUALITIES, sample_rate_for_quality
+
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -23,7 +27,7 @@ def limpiar_audio(input_path, output_path, target_sr=22050, top_db=20):
     Args:
         input_path: Ruta al archivo de entrada
         output_path: Ruta al archivo de salida
-        target_sr: Frecuencia de muestreo objetivo (22050 para modelos medium)
+        target_sr: Frecuencia de muestreo objetivo (16000 para x_low/low, 22050 para medium/high)
         top_db: Umbral en dB para recortar silencios
     """
     try:
@@ -116,26 +120,40 @@ def main():
         "output_dir",
         help="Directorio para archivos de audio procesados"
     )
+    parser.add_argument(
+        "--quality",
+        choices=QUALITIES,
+        help="Calidad del modelo; fija la frecuencia de muestreo (default: medium)"
+    )
     parser.add_argument(
         "--sample-rate",
         type=int,
-        default=22050,
-        help="Frecuencia de muestreo objetivo (default: 22050)"
+        default=None,
+        help="Frecuencia de muestreo objetivo (default: según --quality, 22050 para medium)"
     )
     parser.add_argument(
         "--top-db",
         type=int,
-        default=20,
         help="Umbral en dB para recortar silencios (default: 20)"
     )
+    add_config_arguments(parser)
     
     args = parser.parse_args()
     
+    try:
+        apply_config(args, ['quality', 'sample_rate', 'top_db'])
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    
+    quality = args.quality or DEFAULT_QUALITY
+    sample_rate = args.sample_rate or sample_rate_for_quality(quality)
+    
     procesar_directorio(
         args.input_dir,
         args.output_dir,
-        args.sample_rate,
-        args.top_db
+        sample_rate,
+        args.top_db if args.top_db is not None else 20
     )
 
 
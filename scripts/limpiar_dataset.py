@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Filtra dataset.jsonl por duración y otros criterios antes del entrenamiento
+
+Lee solo la cabecera de cada WAV (módulo wave; soundfile como respaldo para
+formatos que wave no entiende) en un pool de hilos, escribe las líneas
+válidas en un archivo temporal a medida que avanza y reemplaza dataset.jsonl
+de forma atómica, guardando la versión anterior en dataset_backup.jsonl.
+
+Uso:
+    python limpiar_dataset.py ~/piper-training/datasets/mi_voz --min-duration 1.0 --max-duration 15
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from configuracion import add_config_arguments, apply_config
+from manifest import MANIFEST_DIR, build_manifest, load_manifest
+from split_dataset import SPLIT_DIR, create_split
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+CHUNK_SIZE = 1024
+
+
+def probe_wav(path):
+    """
+    Lee duración y frecuencia de muestreo de un WAV sin decodificar el audio
+
+    Returns:
+        tuple: (duración en segundos, sample rate) o (None, mensaje de error)
+    """
+    try:
+        with wave.open(str(path), 'rb') as w:
+            return w.getnframes() / float(w.getframerate()), w.getframerate()
+    except (wave.Error, EOFError) as e:
+        # wave no soporta WAV en coma flotante ni extensible; soundfile sí
+        if soundfile is None:
+            return None, str(e)
+    except OSError as e:
+        return None, str(e)
+
+    try:
+        info = soundfile.info(str(path))
+        return info.frames / float(info.samplerate), info.samplerate
+    except Exception as e:
+        return None, str(e)
+
+
+def _resolve_wav(dataset_path, audio_rel, audio_id):
+    if audio_rel:
+        return dataset_path / audio_rel
+    if audio_id:
+        return dataset_path / "wavs" / f"{audio_id}.wav"
+    return None
+
+
+def iter_entries(dataset_path, jsonl_path):
+    """
+    Recorre dataset.jsonl devolviendo (línea, audio_file, id, número de fonemas)
+
+    Usa el manifiesto columnar si está disponible para no parsear JSON.
+    """
+    manifest = load_manifest(dataset_path)
+    if manifest is not None:
+        n = len(manifest)
+
+        def strings(key):
+            return manifest.strings(key) if manifest.columns.get(key) == 'str' else [None] * n
+
+        audio_files = strings('audio_file')
+        ids = [a or b for a, b in zip(strings('id'), strings('audio_norm_file'))]
+        lengths = (manifest.phoneme_lengths().tolist()
+                   if 'phoneme_ids' in manifest.columns else [None] * n)
+        lines = manifest.line_bytes(jsonl_path, range(n))
+        for raw, audio_rel, audio_id, num_phonemes in zip(lines, audio_files, ids, lengths):
+            yield raw.decode('utf-8'), audio_rel, audio_id, num_phonemes
+        return
+
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                yield line, None, None, None
+                continue
+            phoneme_ids = item.get('phoneme_ids')
+            yield (line, item.get('audio_file'),
+                   item.get('id', item.get('audio_norm_file', '')),
+                   len(phoneme_ids) if phoneme_ids is not None else None)
+
+
+def check_entry(dataset_path, entry, filters):
+    """
+    Aplica los filtros a una entrada
+
+    Returns:
+        tuple: (línea, motivo de rechazo o None, mensaje)
+    """
+    line, audio_rel, audio_id, num_phonemes = entry
+    wav_path = _resolve_wav(dataset_path, audio_rel, audio_id)
+    if wav_path is None:
+        return line, 'sin_id', f"Línea sin ID: {line[:50]}..."
+
+    if num_phonemes is not None:
+        if num_phonemes == 0:
+            return line, 'sin_fonemas', f"Sin fonemas: {wav_path.name}"
+        if filters['max_phonemes'] and num_phonemes > filters['max_phonemes']:
+            return line, 'demasiados_fonemas', f"Demasiados fonemas: {wav_path.name} ({num_phonemes})"
+
+    if not wav_path.exists():
+        return line, 'no_encontrado', f"No encontrado: {wav_path}"
+
+    duration, sample_rate = probe_wav(wav_path)
+    if duration is None:
+        return line, 'corrupto', f"Corrupto/error: {wav_path.name} - {sample_rate}"
+    if duration < filters['min_duration']:
+        return line, 'muy_corto', f"Muy corto: {wav_path.name} ({duration:.2f}s)"
+    if filters['max_duration'] and duration > filters['max_duration']:
+        return line, 'muy_largo', f"Muy largo: {wav_path.name} ({duration:.2f}s)"
+    if filters['sample_rate'] and sample_rate != filters['sample_rate']:
+        return line, 'sample_rate', f"Sample rate {sample_rate} Hz: {wav_path.name}"
+    return line, None, None
+
+
+def clean_dataset(dataset_dir, min_duration=1.0, max_duration=None, sample_rate=None,
+                  max_phonemes=None, workers=None, verbose=True):
+    """
+    Filtra dataset.jsonl y lo reemplaza de forma atómica si hubo rechazos
+
+    Args:
+        dataset_dir: Dataset con dataset.jsonl y wavs/
+        min_duration: Duración mínima en segundos
+        max_duration: Duración máxima en segundos (None = sin límite)
+        sample_rate: Sample rate exigido (None = cualquiera)
+        max_phonemes: Máximo de phoneme_ids por frase (None = sin límite)
+        workers: Hilos para leer cabeceras (None = automático)
+        verbose: Mostrar cada entrada rechazada
+
+    Returns:
+        dict: Conteos {'validas', 'rechazadas', 'motivos'}; None si no hay dataset.jsonl
+    """
+    dataset_path = Path(dataset_dir)
+    jsonl_path = dataset_path / "dataset.jsonl"
+    if not jsonl_path.exists():
+        return None
+
+    filters = {
+        'min_duration': min_duration,
+        'max_duration': max_duration,
+        'sample_rate': sample_rate,
+        'max_phonemes': max_phonemes,
+    }
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+
+    valid = 0
+    reasons = {}
+    fd, tmp_name = tempfile.mkstemp(prefix=".dataset_", suffix=".jsonl.tmp", dir=dataset_path)
+    tmp_path = Path(tmp_name)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            entries = iter_entries(dataset_path, jsonl_path)
+            # Por bloques: memoria acotada y orden de líneas conservado
+            while True:
+                chunk = list(islice(entries, CHUNK_SIZE))
+                if not chunk:
+                    break
+                for line, reason, message in pool.map(
+                        lambda e: check_entry(dataset_path, e, filters), chunk):
+                    if reason is None:
+                        out.write(line if line.endswith('\n') else line + '\n')
+                        valid += 1
+                    else:
+                        reasons[reason] = reasons.get(reason, 0) + 1
+                        if verbose:
+                            print(f"⚠️ Ignorando ({message})")
+            out.flush()
+            os.fsync(out.fileno())
+
+        rejected = sum(reasons.values())
+        if rejected == 0 or valid == 0:
+            tmp_path.unlink()
+        else:
+            backup_path = dataset_path / "dataset_backup.jsonl"
+            if backup_path.exists():
+                backup_path.unlink()
+            try:
+                os.link(jsonl_path, backup_path)
+            except OSError:
+                shutil.copy2(jsonl_path, backup_path)
+            # Reemplazo atómico: dataset.jsonl nunca queda a medio escribir
+            os.chmod(tmp_path, jsonl_path.stat().st_mode & 0o777)
+            os.replace(tmp_path, jsonl_path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+    return {'validas': valid, 'rechazadas': rejected, 'motivos': reasons}
+
+
+def refresh_derived(dataset_dir):
+    """Regenera manifiesto y división si existían (dependen de dataset.jsonl)"""
+    dataset_path = Path(dataset_dir)
+    refreshed = []
+    if (dataset_path / MANIFEST_DIR).exists():
+        build_manifest(dataset_path)
+        refreshed.append('manifiesto columnar')
+    split_json = dataset_path / SPLIT_DIR / "split.json"
+    if split_json.exists():
+        with open(split_json, 'r', encoding='utf-8') as f:
+            old_split = json.load(f)
+        create_split(dataset_path, old_split['validation_split'], old_split['num_test_examples'],
+                     old_split['seed'], old_split['num_buckets'])
+        refreshed.append('división train/validación')
+    return refreshed
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Filtra dataset.jsonl por duración, sample rate y número de fonemas'
+    )
+    parser.add_argument(
+        'dataset_dir',
+        help='Dataset con dataset.jsonl y wavs/'
+    )
+    parser.add_argument(
+        '--min-duration',
+        type=float,
+        help='Duración mínima en segundos (por defecto: 1.0)'
+    )
+    parser.add_argument(
+        '--max-duration',
+        type=float,
+        help='Duración máxima en segundos (por defecto: sin límite)'
+    )
+    parser.add_argument(
+        '--sample-rate',
+        type=int,
+        help='Rechazar audios con otro sample rate (por defecto: no se comprueba)'
+    )
+    parser.add_argument(
+        '--max-phonemes',
+        type=int,
+        help='Rechazar frases con más phoneme_ids (por defecto: sin límite)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Hilos para leer cabeceras WAV (por defecto: automático)'
+    )
+    parser.add_argument(
+        '--quiet',
+        action='store_true',
+        help='No mostrar cada entrada rechazada'
+    )
+    add_config_arguments(parser)
+
+    args = parser.parse_args()
+
+    try:
+        apply_config(args, ['min_duration', 'max_duration', 'sample_rate', 'workers'])
+    except ValueError as e:
+        print(f"❌ ERROR: {e}")
+        sys.exit(1)
+    if args.min_duration is None:
+        args.min_duration = 1.0
+
+    jsonl_path = Path(args.dataset_dir) / "dataset.jsonl"
+    print(f"🔍 Analizando {jsonl_path}...")
+
+    result = clean_dataset(args.dataset_dir, args.min_duration, args.max_duration,
+                           args.sample_rate, args.max_phonemes, args.workers,
+                           verbose=not args.quiet)
+    if result is None:
+        print("❌ ERROR: No se encuentra dataset.jsonl")
+        sys.exit(1)
+
+    print(f"\n✅ Muestras válidas: {result['validas']}")
+    print(f"🗑️ Rechazadas: {result['rechazadas']}")
+    for reason, count in sorted(result['motivos'].items()):
+        print(f"   {reason}: {count}")
+
+    if result['validas'] == 0:
+        print("❌ ERROR: dataset vacío después del filtrado (dataset.jsonl no se ha modificado)")
+        sys.exit(1)
+
+    if result['rechazadas'] > 0:
+        print("\n🔄 dataset.jsonl reemplazado (backup en dataset_backup.jsonl)")
+        for name in refresh_derived(args.dataset_dir):
+            print(f"✅ Regenerado: {name}")
+    else:
+        print("\n✅ Dataset ya estaba limpio, no se requieren cambios")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
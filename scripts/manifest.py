@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Manifiesto columnar binario para dataset.jsonl
+
+Convierte dataset.jsonl a un directorio de arrays NumPy (.npy) que se abren
+con mmap sin parsear JSON: los phoneme_ids se guardan como un único array
+plano más offsets, y los textos como bytes UTF-8 concatenados más offsets.
+También guarda la posición de cada línea en dataset.jsonl para copiar líneas
+originales sin decodificarlas.
+
+Los scripts que recorren el dataset usan el manifiesto si está presente y
+actualizado (mismo tamaño y fecha que dataset.jsonl); si no, leen el JSONL.
+
+Uso:
+    python manifest.py dataset_procesado
+"""
+
+import argparse
+import itertools
+import json
+import sys
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MANIFEST_DIR = "manifest"
+MANIFEST_VERSION = 1
+
+# Tipos de columna
+_INTS = 'ints'      # lista de enteros (ragged): valores planos + offsets
+_STR = 'str'        # texto UTF-8: bytes planos + offsets
+_INT = 'int'        # entero escalar
+_FLOAT = 'float'    # real escalar
+_JSON = 'json'      # cualquier otro valor, serializado como JSON en una columna de texto
+
+
+def _column_type(column):
+    """
+    Tipo de una columna a partir de todos sus valores (None se ignora)
+
+    Se usa type() y no isinstance() porque bool es subclase de int; map y set
+    recorren los valores sin un bucle en Python.
+
+    Returns:
+        str o None: Tipo de columna, o None si todos los valores faltan
+    """
+    kinds = set(map(type, column))
+    kinds.discard(type(None))
+    if not kinds:
+        return None
+    if kinds == {int}:
+        return _INT
+    if kinds <= {int, float}:
+        return _FLOAT
+    if kinds == {str}:
+        return _STR
+    if kinds == {list}:
+        elements = itertools.chain.from_iterable(v for v in column if v is not None)
+        if set(map(type, elements)) <= {int}:
+            return _INTS
+    return _JSON
+
+
+def _ragged(chunks, dtype):
+    """Concatena una lista de secuencias en (valores, offsets)"""
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(c) for c in chunks])
+    values = np.array(list(itertools.chain.from_iterable(chunks)), dtype=dtype)
+    return values, offsets
+
+
+def build_manifest(dataset_dir, jsonl_name="dataset.jsonl"):
+    """
+    Genera el manifiesto columnar de un dataset preprocesado
+
+    Args:
+        dataset_dir: Directorio con dataset.jsonl
+        jsonl_name: Nombre del archivo JSONL
+
+    Returns:
+        Path: Directorio del manifiesto
+
+    Raises:
+        RuntimeError: Si NumPy no está instalado
+        ValueError: Si una línea no es JSON válido
+    """
+    if np is None:
+        raise RuntimeError("NumPy no está instalado: pip install numpy")
+
+    dataset_path = Path(dataset_dir)
+    jsonl_path = dataset_path / jsonl_name
+    manifest_path = dataset_path / MANIFEST_DIR
+
+    spans = []
+    rows = []
+    keys = {}
+    position = 0
+    with open(jsonl_path, 'rb') as f:
+        for line_number, raw in enumerate(f, 1):
+            start = position
+            position += len(raw)
+            if not raw.strip():
+                continue
+            try:
+                entry = json.loads(raw)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Línea {line_number}: JSON inválido - {e}") from e
+            rows.append(entry)
+            spans.append((start, position))
+            keys.update(dict.fromkeys(entry))
+
+    # Una lista por columna; el tipo se decide con todos sus valores
+    # (int y float mezclados se guardan como float, el resto mezclado como JSON)
+    columns = {}
+    types = {}
+    for key in keys:
+        column = [row.get(key) for row in rows]
+        kind = _column_type(column)
+        if kind is not None:
+            columns[key] = column
+            types[key] = kind
+
+    tmp_path = dataset_path / (MANIFEST_DIR + ".tmp")
+    tmp_path.mkdir(exist_ok=True)
+    for old in tmp_path.glob("*"):
+        old.unlink()
+
+    n = len(rows)
+    np.save(tmp_path / "lines.npy", np.asarray(spans, dtype=np.int64).reshape(n, 2))
+
+    for key, kind in types.items():
+        column = columns[key]
+        present = np.fromiter((value is not None for value in column), dtype=bool, count=n)
+        np.save(tmp_path / f"{key}.present.npy", present)
+        if kind == _INTS:
+            values, offsets = _ragged([value or [] for value in column], np.int32)
+        elif kind in (_STR, _JSON):
+            encoded = []
+            for value in column:
+                if value is None:
+                    encoded.append(b'')
+                elif kind == _STR:
+                    encoded.append(value.encode('utf-8'))
+                else:
+                    encoded.append(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(b) for b in encoded])
+            values = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        else:
+            dtype = np.int64 if kind == _INT else np.float64
+            values = np.array([value or 0 for value in column], dtype=dtype)
+            offsets = None
+        np.save(tmp_path / f"{key}.values.npy", values)
+        if offsets is not None:
+            np.save(tmp_path / f"{key}.offsets.npy", offsets)
+
+    stat = jsonl_path.stat()
+    meta = {
+        'version': MANIFEST_VERSION,
+        'source': jsonl_name,
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'num_entries': n,
+        'columns': types,
+    }
+    with open(tmp_path / "meta.json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    # Reemplazo del directorio anterior
+    if manifest_path.exists():
+        for old in manifest_path.glob("*"):
+            old.unlink()
+        manifest_path.rmdir()
+    tmp_path.rename(manifest_path)
+    return manifest_path
+
+
+class Manifest:
+    """Acceso de solo lectura a un manifiesto columnar (arrays con mmap)"""
+
+    def __init__(self, manifest_path):
+        self.path = Path(manifest_path)
+        with open(self.path / "meta.json", 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.columns = self.meta['columns']
+        self._arrays = {}
+
+    def _array(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(self.path / f"{name}.npy", mmap_mode='r')
+        return self._arrays[name]
+
+    def __len__(self):
+        return self.meta['num_entries']
+
+    def column(self, key):
+        """Devuelve (valores, offsets, presentes) de una columna"""
+        kind = self.columns[key]
+        offsets = self._array(f"{key}.offsets") if kind in (_INTS, _STR, _JSON) else None
+        return self._array(f"{key}.values"), offsets, self._array(f"{key}.present")
+
+    def values(self, key):
+        """
+        Decodifica una columna completa de una vez (None donde falta)
+
+        Cada array se lee entero y se convierte a lista una sola vez, en
+        lugar de indexar el mmap entrada por entrada.
+        """
+        kind = self.columns.get(key)
+        if kind is None:
+            return [None] * len(self)
+        if kind == _STR:
+            return self.strings(key)
+        if kind == _JSON:
+            return [json.loads(raw) if raw is not None else None for raw in self.strings(key)]
+        values, offsets, present = self.column(key)
+        if kind == _INTS:
+            flat = values.tolist()
+            bounds = offsets.tolist()
+            items = [flat[start:end] for start, end in zip(bounds, bounds[1:])]
+        else:
+            items = values.tolist()
+        return [item if ok else None for item, ok in zip(items, present.tolist())]
+
+    def phoneme_lengths(self):
+        """Longitud de phoneme_ids de cada entrada (sin decodificar nada)"""
+        _, offsets, _ = self.column('phoneme_ids')
+        return np.diff(offsets)
+
+    def entries(self):
+        """Itera los diccionarios de todas las entradas, decodificando por columnas"""
+        keys = list(self.columns)
+        for row in zip(*(self.values(key) for key in keys)):
+            yield {key: value for key, value in zip(keys, row) if value is not None}
+
+    def strings(self, key):
+        """Decodifica una columna de texto completa (None donde falta)"""
+        values, offsets, present = self.column(key)
+        data = values.tobytes()
+        bounds = offsets.tolist()
+        return [
+            data[bounds[i]:bounds[i + 1]].decode('utf-8') if ok else None
+            for i, ok in enumerate(present.tolist())
+        ]
+
+    def line_bytes(self, jsonl_path, indices):
+        """Itera las líneas originales (bytes) de las entradas indicadas"""
+        spans = self._array("lines")
+        with open(jsonl_path, 'rb') as f:
+            for index in indices:
+                start, end = spans[index]
+                f.seek(int(start))
+                yield f.read(int(end - start))
+
+
+def load_manifest(dataset_dir, jsonl_name="dataset.jsonl"):
+    """
+    Abre el manifiesto si existe y corresponde al dataset.jsonl actual
+
+    Returns:
+        Manifest o None si no hay NumPy, no existe o está desactualizado
+    """
+    if np is None:
+        return None
+    dataset_path = Path(dataset_dir)
+    manifest_path = dataset_path / MANIFEST_DIR
+    jsonl_path = dataset_path / jsonl_name
+    if not (manifest_path / "meta.json").exists() or not jsonl_path.exists():
+        return None
+    try:
+        manifest = Manifest(manifest_path)
+    except (OSError, ValueError, KeyError):
+        return None
+    stat = jsonl_path.stat()
+    meta = manifest.meta
+    if (meta.get('version') != MANIFEST_VERSION
+            or meta.get('source') != jsonl_name
+            or meta.get('source_size') != stat.st_size
+            or meta.get('source_mtime_ns') != stat.st_mtime_ns):
+        return None
+    return manifest
+
+
+def iter_dataset_entries(dataset_dir, jsonl_name="dataset.jsonl"):
+    """
+    Recorre las entradas del dataset usando el manifiesto si está disponible
+
+    Yields:
+        tuple: (número de línea desde 1, dict de la entrada o None si el JSON es inválido)
+    """
+    manifest = load_manifest(dataset_dir, jsonl_name)
+    if manifest is not None:
+        for index, entry in enumerate(manifest.entries(), 1):
+            yield index, entry
+        return
+
+    with open(Path(dataset_dir) / jsonl_name, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError:
+                yield line_number, None
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Genera el manifiesto columnar (NumPy) de dataset.jsonl'
+    )
+    parser.add_argument(
+        'dataset_dir',
+        help='Dataset preprocesado con dataset.jsonl'
+    )
+    parser.add_argument(
+        '--jsonl',
+        default='dataset.jsonl',
+        help='Nombre del archivo JSONL (por defecto: dataset.jsonl)'
+    )
+
+    args = parser.parse_args()
+
+    try:
+        manifest_path = build_manifest(args.dataset_dir, args.jsonl)
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"Error generando el manifiesto: {e}")
+        sys.exit(1)
+
+    manifest = Manifest(manifest_path)
+    print(f"Manifiesto generado: {manifest_path} ({len(manifest)} entradas)")
+    print(f"Columnas: {', '.join(f'{k} ({v})' for k, v in manifest.columns.items())}")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Flujo de métricas estructurado a partir de la salida de piper_train
+
+Analiza las líneas que train.py recibe del proceso de entrenamiento y escribe
+metrics.jsonl en el directorio de checkpoints, con un registro por evento:
+
+  - 'step':  progreso de la barra de Lightning (época, lote, it/s, pérdidas del
+             postfix), como mucho uno cada ``min_interval`` segundos
+  - 'epoch': fin de época con segundos por época, muestras/s y ETA
+  - 'val' / 'train_epoch': métricas exactas que emite piper_launcher.py en
+             líneas "[METRICS] {...}" (pérdidas, val_loss, learning rate)
+
+Uso sobre un log existente:
+    python metricas_entrenamiento.py checkpoints/training.log --batch-size 8
+"""
+
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from pathlib import Path
+
+METRICS_PREFIX = "[METRICS] "
+
+# Epoch 12:  45%|████▌     | 50/111 [00:32<00:39,  1.55it/s, loss=25.3, v_num=0]
+_PROGRESS_RE = re.compile(
+    r"Epoch (?P<epoch>\d+):\s*(?P<pct>\d+)%\|[^|]*\|\s*(?P<batch>\d+)/(?P<batches>\d+)\s*"
+    r"\[(?P<elapsed>[\d:]+)<(?P<remaining>[\d:?]+),\s*(?P<rate>[\d.]+|\?)\s*(?P<unit>it/s|s/it)"
+    r"(?:,\s*(?P<postfix>[^\]]*))?\]"
+)
+_POSTFIX_RE = re.compile(r"(?P<key>[A-Za-z_][\w/.-]*)=(?P<value>[-+\d.eE]+|nan|inf)")
+
+
+def parse_progress_line(line):
+    """
+    Extrae los datos de una línea de la barra de progreso de Lightning
+
+    Returns:
+        dict o None si la línea no es de progreso
+    """
+    match = _PROGRESS_RE.search(line)
+    if not match:
+        return None
+    record = {
+        'epoch': int(match.group('epoch')),
+        'batch': int(match.group('batch')),
+        'batches': int(match.group('batches')),
+    }
+    rate = match.group('rate')
+    if rate != '?':
+        rate = float(rate)
+        if rate > 0:
+            step_time = rate if match.group('unit') == 's/it' else 1.0 / rate
+            record['step_time_s'] = step_time
+            record['it_per_sec'] = 1.0 / step_time
+    for item in _POSTFIX_RE.finditer(match.group('postfix') or ''):
+        key = item.group('key')
+        if key == 'v_num':
+            continue
+        try:
+            value = float(item.group('value'))
+        except ValueError:
+            continue
+        # nan/inf no son JSON válido; una pérdida nan ya se ve en training.log
+        if math.isfinite(value):
+            record[key] = value
+    return record
+
+
+def parse_metrics_line(line):
+    """Decodifica una línea "[METRICS] {...}" emitida por piper_launcher.py"""
+    index = line.find(METRICS_PREFIX)
+    if index < 0:
+        return None
+    try:
+        return json.loads(line[index + len(METRICS_PREFIX):])
+    except ValueError:
+        return None
+
+
+class MetricsStream:
+    """
+    Convierte la salida de piper_train en registros JSONL
+
+    Args:
+        output_path: Ruta de metrics.jsonl (None = no escribir, solo analizar)
+        batch_size: Tamaño de batch para calcular muestras/s
+        accumulate_grad_batches: Micro-batches por paso del optimizador (para
+            registrar el batch efectivo)
+        max_epochs: Épocas máximas para calcular la ETA (opcional)
+        min_interval: Segundos mínimos entre registros 'step'
+    """
+
+    def __init__(self, output_path=None, batch_size=None, max_epochs=None, min_interval=10.0,
+                 append=False, accumulate_grad_batches=1):
+        self.output_path = Path(output_path) if output_path else None
+        self.batch_size = batch_size
+        self.accumulate_grad_batches = accumulate_grad_batches
+        self.max_epochs = max_epochs
+        self.min_interval = min_interval
+        self.start_time = time.time()
+        self.listeners = []
+        self.last = {}
+        self._file = None
+        if self.output_path:
+            self._file = open(self.output_path, 'a' if append else 'w', encoding='utf-8')
+        self._epoch = None
+        self._epoch_start = None
+        self._epoch_times = []
+        self._last_step_write = 0.0
+        self._last_progress = None
+        self._global_step = 0
+        self._steps_before_epoch = 0
+
+    def add_listener(self, callback):
+        """Registra una función que recibe cada registro escrito"""
+        self.listeners.append(callback)
+
+    def _emit(self, record):
+        now = time.time()
+        record = dict(record, time=round(now, 3), elapsed_s=round(now - self.start_time, 3))
+        self.last[record['event']] = record
+        if self._file:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+        for callback in self.listeners:
+            callback(record)
+        return record
+
+    def _close_epoch(self, now):
+        if self._epoch is None or self._epoch_start is None:
+            return None
+        seconds = now - self._epoch_start
+        self._epoch_times.append(seconds)
+        record = {'event': 'epoch', 'epoch': self._epoch, 'seconds_per_epoch': round(seconds, 3)}
+        progress = self._last_progress or {}
+        steps = progress.get('batch', 0)
+        if steps and seconds > 0:
+            record['steps'] = steps
+            record['it_per_sec'] = round(steps / seconds, 4)
+            if self.batch_size:
+                record['samples_per_sec'] = round(steps * self.batch_size / seconds, 3)
+                record['effective_batch_size'] = self.batch_size * self.accumulate_grad_batches
+        for key, value in progress.items():
+            if 'loss' in key:
+                record[key] = value
+        if self.max_epochs:
+            recent = self._epoch_times[-10:]
+            remaining = max(0, self.max_epochs - (self._epoch + 1))
+            record['eta_s'] = round(remaining * sum(recent) / len(recent), 1)
+        return self._emit(record)
+
+    def position(self):
+        """Época y paso global actuales (para alinear otras series con esta)"""
+        return {'epoch': self._epoch, 'step': self._global_step}
+
+    def feed(self, line):
+        """
+        Procesa una línea de salida
+
+        Returns:
+            list: Registros emitidos por esta línea
+        """
+        emitted = []
+        metrics = parse_metrics_line(line)
+        if metrics is not None:
+            metrics.setdefault('event', 'metrics')
+            emitted.append(self._emit(metrics))
+            return emitted
+
+        progress = parse_progress_line(line)
+        if progress is None:
+            return emitted
+
+        now = time.time()
+        if progress['epoch'] != self._epoch:
+            closed = self._close_epoch(now)
+            if closed:
+                emitted.append(closed)
+            if self._last_progress:
+                self._steps_before_epoch += self._last_progress.get('batch', 0)
+            self._epoch = progress['epoch']
+            self._epoch_start = now
+            self._last_progress = None
+
+        self._last_progress = progress
+        self._global_step = self._steps_before_epoch + progress['batch']
+
+        if now - self._last_step_write >= self.min_interval:
+            record = dict(progress, event='step', step=self._global_step)
+            if self.batch_size and 'it_per_sec' in progress:
+                record['samples_per_sec'] = round(progress['it_per_sec'] * self.batch_size, 3)
+            if self.batch_size:
+                record['effective_batch_size'] = self.batch_size * self.accumulate_grad_batches
+            emitted.append(self._emit(record))
+            self._last_step_write = now
+        return emitted
+
+    def close(self):
+        """Cierra la época en curso y el archivo"""
+        if self._last_progress and self._last_progress.get('batch') == self._last_progress.get('batches'):
+            self._close_epoch(time.time())
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def read_metrics(path, event=None):
+    """Lee metrics.jsonl (opcionalmente filtrando por tipo de evento)"""
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if event is None or record.get('event') == event:
+                    records.append(record)
+    except OSError:
+        pass
+    return records
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Genera metrics.jsonl a partir de un training.log de piper_train'
+    )
+    parser.add_argument(
+        'log_file',
+        help='Log de entrenamiento (training.log)'
+    )
+    parser.add_argument(
+        '--output',
+        help='Archivo de salida (por defecto: metrics.jsonl junto al log)'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        help='Tamaño de batch usado (para muestras/s)'
+    )
+    parser.add_argument(
+        '--max-epochs',
+        type=int,
+        help='Épocas máximas (para la ETA)'
+    )
+
+    args = parser.parse_args()
+
+    log_path = Path(args.log_file)
+    output = args.output or log_path.with_name('metrics.jsonl')
+    stream = MetricsStream(output, args.batch_size, args.max_epochs, min_interval=0.0)
+    count = 0
+    with open(log_path, 'r', encoding='utf-8', errors='ignore', newline=None) as f:
+        for line in f:
+            count += len(stream.feed(line))
+    stream.close()
+    print(f"{count} registros escritos en {output}")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
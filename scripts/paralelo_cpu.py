@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Entrenamiento data-parallel en CPU con varios procesos (backend gloo)
+
+Un solo proceso de PyTorch aprovecha mal las máquinas con muchos núcleos:
+el paralelismo intra-operación deja de escalar a partir de unos 8-16 hilos.
+Con N procesos, cada uno entrena con su parte del batch en un grupo propio
+de núcleos y DDP promedia los gradientes con gloo.
+
+piper_launcher.py con --cpu-workers N lanza los N procesos con las variables
+de entorno de Lightning (LOCAL_RANK, WORLD_SIZE, MASTER_ADDR/PORT), de modo
+que Lightning no crea procesos propios; cada proceso fija su afinidad de CPU
+y su número de hilos antes de importar piper_train.
+
+Uso (informe de escalado de muestras/s según el número de procesos):
+    python paralelo_cpu.py dataset_procesado --processes 1,2,4,8
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from metricas_entrenamiento import parse_progress_line
+from perfiles_calidad import DEFAULT_QUALITY
+
+LAUNCHER_PATH = Path(__file__).resolve().parent / "piper_launcher.py"
+# Variable con los núcleos asignados a cada proceso ("0,1,2,3")
+CORES_ENV = 'PIPER_CPU_CORES'
+THREADS_ENV = 'PIPER_CPU_THREADS'
+INTEROP_ENV = 'PIPER_CPU_INTEROP_THREADS'
+DEFAULT_SCALING_STEPS = 20
+# VITS tiene dos optimizadores (generador y discriminador): con Lightning 1.x
+# global_step, y por tanto --max_steps, cuenta dos pasos por batch
+OPTIMIZER_STEPS_PER_BATCH = 2
+
+
+def available_cores():
+    """Núcleos lógicos que puede usar este proceso"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def slot_cores():
+    """
+    Núcleos asignados a este proceso: los de PIPER_CPU_CORES (el hueco de
+    barrido.py o de la cola de trabajos) si está definido; si no, todos los
+    de available_cores()
+    """
+    cores = available_cores()
+    if os.environ.get(CORES_ENV):
+        allowed = set(cores)
+        assigned = [int(c) for c in os.environ[CORES_ENV].split(',')]
+        return [c for c in assigned if c in allowed] or cores
+    return cores
+
+
+def partition_cores(num_workers, cores=None):
+    """
+    Reparte los núcleos en grupos contiguos, uno por proceso
+
+    Los grupos contiguos mantienen juntos los hilos hermanos y los núcleos de
+    un mismo nodo NUMA en la numeración habitual de Linux. Con más procesos
+    que núcleos, los procesos comparten núcleo.
+
+    Returns:
+        list: Una lista de núcleos por proceso
+    """
+    cores = list(cores) if cores is not None else available_cores()
+    num_workers = max(1, num_workers)
+    if num_workers > len(cores):
+        return [[cores[rank % len(cores)]] for rank in range(num_workers)]
+    size, extra = divmod(len(cores), num_workers)
+    groups = []
+    start = 0
+    for rank in range(num_workers):
+        end = start + size + (1 if rank < extra else 0)
+        groups.append(cores[start:end])
+        start = end
+    return groups
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def worker_env(cores=None, threads=None, interop_threads=None):
+    """Variables de entorno que fijan núcleos e hilos de un proceso"""
+    env = {}
+    if threads:
+        env.update(OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads))
+        env[THREADS_ENV] = str(threads)
+    if cores:
+        env[CORES_ENV] = ','.join(str(c) for c in cores)
+    if interop_threads:
+        env[INTEROP_ENV] = str(interop_threads)
+    return env
+
+
+def pin_current_worker():
+    """
+    Aplica la afinidad y los hilos de worker_env (launch_workers los pasa a
+    cada proceso)
+
+    Se llama en cada proceso antes de importar piper_train. OMP_NUM_THREADS
+    y MKL_NUM_THREADS ya vienen en el entorno, porque solo tienen efecto si
+    se fijan antes de cargar OpenMP.
+    """
+    cores = os.environ.get(CORES_ENV)
+    if cores and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, [int(c) for c in cores.split(',')])
+        except OSError as e:
+            print(f"[ADVERTENCIA] No se pudo fijar la afinidad de CPU: {e}", file=sys.stderr)
+    threads = os.environ.get(THREADS_ENV)
+    interop = os.environ.get(INTEROP_ENV)
+    if threads or interop:
+        import torch
+        if threads:
+            torch.set_num_threads(int(threads))
+        if interop:
+            try:
+                torch.set_num_interop_threads(int(interop))
+            except RuntimeError:
+                # Solo se puede fijar antes del primer uso del paralelismo inter-op
+                pass
+
+
+def launch_workers(cmd, num_workers, threads_per_worker=None, cores=None, interop_threads=None):
+    """
+    Lanza ``num_workers`` copias de cmd como un grupo DDP de Lightning
+
+    Args:
+        cmd: Comando de cada proceso (el mismo para todos)
+        num_workers: Número de procesos
+        threads_per_worker: Hilos por proceso (por defecto: núcleos / procesos)
+        cores: Núcleos a repartir, en orden (por defecto: slot_cores())
+        interop_threads: Hilos inter-operación de PyTorch por proceso
+
+    Returns:
+        int: Código de salida (el primero distinto de 0, si alguno falla; un
+            proceso matado por la señal N da 128 + N)
+    """
+    cores = list(cores) if cores else slot_cores()
+    groups = partition_cores(num_workers, cores)
+    if num_workers > len(cores):
+        print(f"[ADVERTENCIA] Más procesos ({num_workers}) que núcleos ({len(cores)}): "
+              f"los procesos compartirán núcleo", file=sys.stderr)
+    port = str(_free_port())
+
+    processes = []
+    for rank, cores in enumerate(groups):
+        env = dict(os.environ,
+                   MASTER_ADDR='127.0.0.1', MASTER_PORT=port,
+                   WORLD_SIZE=str(num_workers), NODE_RANK='0',
+                   LOCAL_RANK=str(rank), RANK=str(rank))
+        env.update(worker_env(cores, threads_per_worker or len(cores), interop_threads))
+        processes.append(subprocess.Popen(cmd, env=env))
+
+    exit_code = 0
+    terminated = set()
+    try:
+        pending = list(processes)
+        while pending:
+            for process in list(pending):
+                code = process.poll()
+                if code is None:
+                    continue
+                pending.remove(process)
+                if code == 0 or process in terminated:
+                    continue
+                # Un proceso matado por una señal (p. ej. SIGKILL del OOM killer)
+                # es la causa aunque otro rango haya fallado antes al perderlo
+                if exit_code == 0 or (code < 0 and exit_code > 0):
+                    exit_code = code
+                # Un proceso caído deja a los demás bloqueados en el all-reduce
+                for other in pending:
+                    if other not in terminated and other.poll() is None:
+                        other.terminate()
+                        terminated.add(other)
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+        for process in processes:
+            process.wait()
+        raise
+    # Igual que el shell: 128 + señal (sys.exit(-9) saldría con 247, no con 137)
+    return 128 - exit_code if exit_code < 0 else exit_code
+
+
+def measure_throughput(dataset_dir, num_processes, batch_size=8, steps=DEFAULT_SCALING_STEPS,
+                       quality=DEFAULT_QUALITY, precision='32', work_dir=None, launcher_args=None):
+    """
+    Entrena ``steps`` batches con ``num_processes`` procesos y mide muestras/s
+
+    La velocidad se toma entre la primera y la última actualización de la
+    barra de progreso del proceso 0, sin contar el arranque. launcher_args
+    son opciones adicionales de piper_launcher.py (hilos, workers, ...).
+
+    Returns:
+        dict: processes, ok, samples_per_sec, it_per_sec y wall_s
+    """
+    work_path = Path(work_dir or tempfile.mkdtemp(prefix='paralelo_cpu_'))
+    cmd = [sys.executable, str(LAUNCHER_PATH)] + list(launcher_args or [])
+    if num_processes > 1:
+        cmd.extend(['--cpu-workers', str(num_processes)])
+    cmd.extend([
+        '--',
+        '--dataset-dir', str(dataset_dir),
+        '--accelerator', 'cpu',
+        '--devices', str(num_processes),
+        '--batch-size', str(batch_size),
+        '--precision', precision,
+        '--quality', quality,
+        '--max_epochs', '1',
+        '--max_steps', str(steps * OPTIMIZER_STEPS_PER_BATCH),
+        '--limit_val_batches', '0',
+        '--num_sanity_val_steps', '0',
+        '--checkpoint-epochs', '1000000',
+        '--default_root_dir', str(work_path / f"p{num_processes}"),
+    ])
+    if num_processes > 1:
+        cmd.extend(['--strategy', 'ddp'])
+
+    first = last = None
+    start = time.time()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               universal_newlines=True, encoding='utf-8', errors='replace')
+    for line in process.stdout:
+        for part in line.split('\r'):
+            progress = parse_progress_line(part)
+            if progress is None:
+                continue
+            if first is None:
+                first = (time.time(), progress['batch'])
+            last = (time.time(), progress['batch'])
+    process.wait()
+    wall = time.time() - start
+
+    result = {'processes': num_processes, 'ok': process.returncode == 0, 'wall_s': round(wall, 2)}
+    if first and last and last[0] > first[0] and last[1] > first[1]:
+        it_per_sec = (last[1] - first[1]) / (last[0] - first[0])
+        result['it_per_sec'] = round(it_per_sec, 4)
+        # Cada proceso entrena su propio batch en cada paso
+        result['samples_per_sec'] = round(it_per_sec * batch_size * num_processes, 3)
+    return result
+
+
+def scaling_report(dataset_dir, process_counts, batch_size=8, steps=DEFAULT_SCALING_STEPS,
+                   quality=DEFAULT_QUALITY, precision='32'):
+    """
+    Mide muestras/s para cada número de procesos
+
+    Returns:
+        list: Resultados de measure_throughput con speedup y eficiencia
+            respecto al primero
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix='paralelo_cpu_') as work_dir:
+        for count in process_counts:
+            results.append(measure_throughput(dataset_dir, count, batch_size, steps, quality,
+                                              precision, work_dir))
+    baseline = next((r for r in results if r.get('samples_per_sec')), None)
+    for result in results:
+        if baseline and result.get('samples_per_sec'):
+            speedup = result['samples_per_sec'] / baseline['samples_per_sec']
+            result['speedup'] = round(speedup, 2)
+            result['efficiency'] = round(speedup * baseline['processes'] / result['processes'], 2)
+    return results
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Informe de escalado del entrenamiento data-parallel en CPU'
+    )
+    parser.add_argument(
+        'dataset_dir',
+        help='Dataset preprocesado (con dataset.jsonl)'
+    )
+    parser.add_argument(
+        '--processes',
+        default='1,2,4',
+        help='Números de procesos a probar, separados por comas (por defecto: 1,2,4)'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=8,
+        help='Batch size por proceso (por defecto: 8)'
+    )
+    parser.add_argument(
+        '--steps',
+        type=int,
+        default=DEFAULT_SCALING_STEPS,
+        help=f'Batches de entrenamiento por prueba (por defecto: {DEFAULT_SCALING_STEPS})'
+    )
+    parser.add_argument(
+        '--quality',
+        default=DEFAULT_QUALITY,
+        help=f'Calidad del modelo (por defecto: {DEFAULT_QUALITY})'
+    )
+    parser.add_argument(
+        '--precision',
+        default='32',
+        help='Precisión de entrenamiento (por defecto: 32)'
+    )
+    parser.add_argument(
+        '--output',
+        help='Guardar el informe como JSON en este archivo'
+    )
+
+    args = parser.parse_args()
+
+    if not (Path(args.dataset_dir) / "dataset.jsonl").exists():
+        print(f"No se encontró dataset.jsonl en {args.dataset_dir}")
+        sys.exit(1)
+    try:
+        counts = [int(c) for c in args.processes.split(',') if c.strip()]
+    except ValueError:
+        print(f"--processes inválido: {args.processes}")
+        sys.exit(1)
+
+    print(f"Núcleos disponibles: {len(available_cores())}")
+    results = scaling_report(args.dataset_dir, counts, args.batch_size, args.steps,
+                             args.quality, args.precision)
+
+    print(f"{'procesos':>8}  {'muestras/s':>10}  {'speedup':>7}  {'eficiencia':>10}")
+    for result in results:
+        if result.get('samples_per_sec') is None:
+            status = 'falla' if not result['ok'] else 'sin datos'
+            print(f"{result['processes']:>8}  {status:>10}")
+            continue
+        print(f"{result['processes']:>8}  {result['samples_per_sec']:>10.2f}  "
+              f"{result['speedup']:>6.2f}x  {result['efficiency']:>9.0%}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'batch_size': args.batch_size, 'steps': args.steps,
+                       'cores': len(available_cores()), 'results': results}, f, indent=2)
+        print(f"Informe guardado en {args.output}")
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
+
+
+if __name__ == '__main__':
+    main()
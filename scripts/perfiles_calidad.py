@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Perfiles de calidad de Piper: frecuencia de muestreo y parámetros de espectrograma
+
+Las voces oficiales de Piper usan 16 kHz para las calidades x_low y low, y
+22.05 kHz para medium y high. Usar el mismo perfil en limpieza,
+preprocesamiento y entrenamiento evita procesar a 22050 Hz un modelo que
+se va a entrenar a 16 kHz (~27% menos muestras de principio a fin).
+"""
+
+import json
+from pathlib import Path
+
+QUALITIES = ['x_low', 'low', 'medium', 'high']
+DEFAULT_QUALITY = 'medium'
+
+_STFT = {
+    'filter_length': 1024,
+    'hop_length': 256,
+    'win_length': 1024,
+    'mel_channels': 80,
+}
+
+QUALITY_PROFILES = {
+    'x_low': dict(_STFT, sample_rate=16000),
+    'low': dict(_STFT, sample_rate=16000),
+    'medium': dict(_STFT, sample_rate=22050),
+    'high': dict(_STFT, sample_rate=22050),
+}
+
+
+def get_quality_profile(quality=None):
+    """
+    Devuelve el perfil de audio de una calidad
+
+    Args:
+        quality: x_low, low, medium o high (None = medium)
+
+    Returns:
+        dict: sample_rate, filter_length, hop_length, win_length, mel_channels
+
+    Raises:
+        ValueError: Si la calidad no existe
+    """
+    quality = quality or DEFAULT_QUALITY
+    if quality not in QUALITY_PROFILES:
+        raise ValueError(f"Calidad desconocida: {quality} (opciones: {', '.join(QUALITIES)})")
+    return dict(QUALITY_PROFILES[quality], quality=quality)
+
+
+def sample_rate_for_quality(quality=None):
+    """Frecuencia de muestreo que corresponde a una calidad"""
+    return get_quality_profile(quality)['sample_rate']
+
+
+def read_dataset_audio_config(dataset_dir):
+    """
+    Lee la sección 'audio' del config.json de un dataset preprocesado
+
+    Returns:
+        dict: Sección de audio o {} si no existe o no se puede leer
+    """
+    config_path = Path(dataset_dir) / "config.json"
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('audio', {}) or {}
+    except (OSError, ValueError):
+        return {}
+
+
+def write_dataset_quality(dataset_dir, quality):
+    """
+    Registra la calidad y los parámetros del perfil en config.json
+
+    Solo añade las claves que falten; los valores escritos por Piper se respetan.
+
+    Returns:
+        bool: True si se actualizó el archivo
+    """
+    config_path = Path(dataset_dir) / "config.json"
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    audio = config.setdefault('audio', {})
+    changed = False
+    for key, value in get_quality_profile(quality).items():
+        if key not in audio:
+            audio[key] = value
+            changed = True
+
+    if changed:
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=4, ensure_ascii=False)
+    return changed
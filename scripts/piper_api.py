@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+API en proceso para los módulos de piper_train
+
+Los scripts lanzan `python -m piper_train...` en un subproceso, lo que repite
+el arranque de Python, la importación de torch y la detección de CUDA/ROCm en
+cada invocación. Desde un proceso de larga duración (un notebook, un driver
+que encadena preprocesamiento y exportación) se puede llamar al módulo en el
+mismo intérprete y pagar ese coste una sola vez:
+
+    from preprocess import preprocess_dataset
+    from export import export_model
+
+    preprocess_dataset('mi_dataset', 'dataset_procesado', in_process=True)
+    export_model('checkpoints/best.ckpt', 'mi_voz.onnx', in_process=True)
+
+Si piper_train no se puede importar se usa el subproceso como respaldo.
+
+Uso como script (mide el ahorro de arranque):
+    python piper_api.py --benchmark
+"""
+
+import argparse
+import importlib
+import importlib.util
+import os
+import runpy
+import subprocess
+import sys
+import threading
+import time
+
+from instrumentacion import run_monitored, sample_process_tree
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# sys.argv es global: solo una llamada en proceso a la vez
+_ARGV_LOCK = threading.Lock()
+
+
+def piper_module_available(module):
+    """Indica si un módulo de piper_train se puede importar en este intérprete"""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _self_usage():
+    """Devuelve (rss pico, bytes leídos, bytes escritos) del proceso actual"""
+    sample = sample_process_tree(os.getpid()).get(os.getpid())
+    read_bytes = write_bytes = None
+    if sample is not None:
+        _, read_bytes, write_bytes = sample
+    peak_rss = None
+    if resource is not None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss *= 1 if sys.platform == 'darwin' else 1024
+    return peak_rss, read_bytes, write_bytes
+
+
+def run_in_process(module, args):
+    """
+    Ejecuta ``python -m module args...`` dentro del intérprete actual
+
+    Args:
+        module: Nombre del módulo (p. ej. 'piper_train.preprocess')
+        args: Lista de argumentos de línea de comandos
+
+    Returns:
+        int: Código de salida equivalente al del subproceso
+    """
+    with _ARGV_LOCK:
+        saved_argv = sys.argv
+        sys.argv = [module] + [str(a) for a in args]
+        try:
+            mod = importlib.import_module(module)
+            main = getattr(mod, 'main', None)
+            if callable(main):
+                result = main()
+            else:
+                runpy.run_module(module, run_name='__main__', alter_sys=False)
+                result = 0
+            return result if isinstance(result, int) else 0
+        except SystemExit as e:
+            if e.code is None:
+                return 0
+            return e.code if isinstance(e.code, int) else 1
+        finally:
+            sys.argv = saved_argv
+
+
+def run_piper_module(module, args, in_process=False, **popen_kwargs):
+    """
+    Ejecuta un módulo de piper_train en proceso o como subproceso
+
+    Args:
+        module: Nombre del módulo (p. ej. 'piper_train.export_onnx')
+        args: Lista de argumentos de línea de comandos
+        in_process: Ejecutar en el intérprete actual si el módulo es importable
+        **popen_kwargs: Argumentos para subprocess.Popen (solo subproceso)
+
+    Returns:
+        tuple: (código de salida, dict de uso de recursos, bool en_proceso)
+    """
+    if in_process and piper_module_available(module):
+        _, read_before, write_before = _self_usage()
+        exit_code = run_in_process(module, args)
+        peak_rss, read_after, write_after = _self_usage()
+        usage = {
+            'peak_rss_bytes': peak_rss,
+            'read_bytes': None if read_after is None else read_after - read_before,
+            'write_bytes': None if write_after is None else write_after - write_before,
+        }
+        return exit_code, usage, True
+
+    cmd = [sys.executable, '-m', module] + [str(a) for a in args]
+    exit_code, usage = run_monitored(cmd, **popen_kwargs)
+    return exit_code, usage, False
+
+
+def benchmark_startup(module='piper_train.preprocess', repeats=3):
+    """
+    Compara el coste de arranque de un subproceso frente a la llamada en proceso
+
+    Mide cuánto tarda un intérprete nuevo en importar el módulo (y torch, y
+    consultar el acelerador) frente a reutilizar el intérprete actual.
+
+    Returns:
+        dict: Tiempos medios en segundos y ahorro por invocación
+    """
+    probe = (
+        f"import {module}\n"
+        "try:\n"
+        "    import torch; torch.cuda.is_available()\n"
+        "except ImportError:\n"
+        "    pass\n"
+    )
+
+    subprocess_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', probe], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess_times.append(time.perf_counter() - start)
+
+    # Primera importación: coste que se paga una sola vez en el driver
+    start = time.perf_counter()
+    exec(probe, {})
+    first_import = time.perf_counter() - start
+
+    in_process_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        exec(probe, {})
+        in_process_times.append(time.perf_counter() - start)
+
+    subprocess_mean = sum(subprocess_times) / repeats
+    in_process_mean = sum(in_process_times) / repeats
+    return {
+        'module': module,
+        'repeats': repeats,
+        'subprocess_startup_s': subprocess_mean,
+        'in_process_first_import_s': first_import,
+        'in_process_call_s': in_process_mean,
+        'saving_per_call_s': subprocess_mean - in_process_mean,
+    }
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Ejecuta módulos de piper_train en proceso o mide el ahorro de arranque'
+    )
+    parser.add_argument(
+        '--benchmark',
+        action='store_true',
+        help='Mide el arranque de subproceso frente a la llamada en proceso'
+    )
+    parser.add_argument(
+        '--module',
+        default='piper_train.preprocess',
+        help='Módulo a medir (por defecto: piper_train.preprocess)'
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=3,
+        help='Repeticiones de la medición (por defecto: 3)'
+    )
+
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        sys.exit(0)
+
+    if not piper_module_available(args.module):
+        print(f"No se puede importar {args.module}. Instala Piper: cd piper/src/python && pip install -e .")
+        sys.exit(1)
+
+    result = benchmark_startup(args.module, args.repeats)
+    print(f"Módulo: {result['module']} ({result['repeats']} repeticiones)")
+    print(f"  Arranque en subproceso:      {result['subprocess_startup_s']:.2f}s")
+    print(f"  Primera importación (única): {result['in_process_first_import_s']:.2f}s")
+    print(f"  Llamada en proceso:          {result['in_process_call_s']:.4f}s")
+    print(f"  Ahorro por invocación:       {result['saving_per_call_s']:.2f}s")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
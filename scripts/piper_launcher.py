@@ -0,0 +1,759 @@
+#!/usr/bin/env python3
+"""
+Lanzador de piper_train con ajustes aplicados dentro del proceso hijo
+
+train.py ejecuta este script en lugar de `python -m piper_train` para
+modificar el comportamiento de piper_train sin tocar su código:
+
+    python piper_launcher.py [opciones del lanzador] -- [argumentos de piper_train]
+
+Opciones:
+    --split-dir DIR   Usa la división precalculada por split_dataset.py en lugar
+                      del random_split que piper_train hace en cada lanzamiento
+    --emit-metrics    Imprime al final de cada época y validación una línea
+                      "[METRICS] {...}" con las métricas exactas de Lightning
+                      (ver metricas_entrenamiento.py)
+    --checkpoint-dir DIR
+                      Guarda en DIR un checkpoint cuando la val_loss entra entre
+                      las --keep-top-k mejores o cada --checkpoint-epochs épocas,
+                      y lo anuncia con un evento 'checkpoint' (ver
+                      gestor_checkpoints.py, que indexa y poda). Sustituye al
+                      ModelCheckpoint de piper_train, que guardaría sin podar
+                      en lightning_logs/
+    --patience N      Early stopping: detiene el entrenamiento al terminar la
+                      época si la val_loss no mejora en N validaciones
+                      (--min-delta fija la mejora mínima)
+    --train-indices FILE
+                      Entrena solo con las líneas de dataset.jsonl de FILE
+                      (sondeo de memoria de buscar_batch.py)
+    --probe-report FILE
+                      Escribe al terminar el pico de memoria del proceso
+                      (VRAM reservada y RSS) en FILE como JSON
+    --cpu-workers N   Entrenamiento data-parallel en CPU: lanza N procesos con
+                      backend gloo, cada uno con su grupo de núcleos y
+                      --threads-per-worker hilos (ver paralelo_cpu.py; los
+                      argumentos de piper_train deben incluir --strategy ddp)
+    --threads-per-worker N, --interop-threads N, --cpu-cores LISTA
+                      Hilos de PyTorch y núcleos del proceso (o de cada proceso
+                      con --cpu-workers; ver ajuste_cpu.py)
+    --dataloader-workers N, --pin-memory
+                      Workers y memoria fijada de los DataLoader de piper_train
+    --step-times FILE
+                      Escribe al terminar el instante de fin de cada paso de
+                      entrenamiento en FILE como JSON (benchmark_entrenamiento.py)
+    --profile-steps A:B, --profile-dir DIR
+                      Perfila con torch.profiler los pasos A a B-1 (contados
+                      desde 0 en este lanzamiento) y escribe en DIR una traza
+                      de Chrome y una tabla de operadores
+    --dataset-cache, --cache-budget-gb GB
+                      Carga los tensores del dataset una vez en memoria
+                      compartida para todos los workers del DataLoader, si
+                      caben en el presupuesto (ver cache_memoria.py)
+    --live-stats FILE Mantiene en FILE el tiempo de espera de lotes y la
+                      memoria CUDA, como mucho una vez por segundo
+                      (telemetria.py)
+    --no-test-audio   No genera en cada validación el audio de los ejemplos de
+                      test; las frases siguen fuera del entrenamiento
+                      (ejemplos_prueba.py los sintetiza en otro proceso)
+"""
+
+import argparse
+import bisect
+import json
+import math
+import os
+import runpy
+import sys
+import time
+from pathlib import Path
+
+from cache_memoria import CachedDataset, SharedTensorCache, default_cache_budget, estimate_cache_bytes
+from gestor_checkpoints import DEFAULT_KEEP_TOP_K, load_index
+from instrumentacion import format_bytes
+from metricas_entrenamiento import METRICS_PREFIX
+from paralelo_cpu import CORES_ENV, launch_workers, pin_current_worker, worker_env
+from split_dataset import read_split_indices
+
+
+def install_split(split_dir):
+    """
+    Sustituye random_split de piper_train por los índices de split_dir
+
+    piper_train divide el dataset con random_split(dataset, [train, test, val]).
+    Si el dataset cargado o los tamaños pedidos no coinciden con los archivos
+    de índices (p. ej. piper descartó frases por longitud), se avisa y se usa
+    el random_split original.
+    """
+    from torch.utils.data import Subset
+    import piper_train.vits.lightning as lightning
+
+    original_random_split = lightning.random_split
+    train_idx = read_split_indices(split_dir, 'train')
+    val_idx = read_split_indices(split_dir, 'val')
+    test_idx = read_split_indices(split_dir, 'test')
+    expected = [len(train_idx), len(test_idx), len(val_idx)]
+
+    def split_from_files(dataset, lengths, *args, **kwargs):
+        if len(dataset) != sum(expected) or list(lengths) != expected:
+            print(f"[ADVERTENCIA] La división de {split_dir} no coincide con el dataset cargado "
+                  f"({len(dataset)} frases, tamaños {list(lengths)}); se usa random_split")
+            return original_random_split(dataset, lengths, *args, **kwargs)
+        print(f"[INFO] Usando división precalculada: {split_dir} "
+              f"(train={expected[0]}, test={expected[1]}, val={expected[2]})")
+        return [Subset(dataset, train_idx), Subset(dataset, test_idx), Subset(dataset, val_idx)]
+
+    lightning.random_split = split_from_files
+
+
+def install_train_subset(indices_file):
+    """
+    Sustituye random_split para entrenar solo con los índices de indices_file
+
+    Validación y test reciben una sola frase; el sondeo de memoria no valida.
+    """
+    from torch.utils.data import Subset
+    import piper_train.vits.lightning as lightning
+
+    with open(indices_file, 'r', encoding='utf-8') as f:
+        indices = [int(line) for line in f if line.strip()]
+
+    def subset_split(dataset, lengths, *args, **kwargs):
+        valid = [i for i in indices if i < len(dataset)] or [0]
+        return [Subset(dataset, valid), Subset(dataset, valid[:1]), Subset(dataset, valid[:1])]
+
+    lightning.random_split = subset_split
+
+
+def _peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def make_probe_report_callback(report_file):
+    """Callback que guarda el pico de memoria del proceso al terminar"""
+    import pytorch_lightning as pl
+
+    class ProbeReport(pl.Callback):
+        def on_train_end(self, trainer, pl_module):
+            if not trainer.is_global_zero:
+                return
+            report = {'global_step': trainer.global_step, 'rss_peak_bytes': _peak_rss_bytes()}
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    report['cuda_peak_bytes'] = torch.cuda.max_memory_reserved()
+            except ImportError:
+                pass
+            with open(report_file, 'w', encoding='utf-8') as f:
+                json.dump(report, f)
+
+    return ProbeReport()
+
+
+def install_dataloader(num_workers=None, pin_memory=False):
+    """
+    Fija workers y memoria fijada en los DataLoader que crea piper_train
+
+    Con workers persistentes no se relanzan los procesos en cada época.
+    """
+    import piper_train.vits.lightning as lightning
+
+    base_loader = lightning.DataLoader
+
+    class TunedDataLoader(base_loader):
+        def __init__(self, *args, **kwargs):
+            if num_workers is not None:
+                kwargs['num_workers'] = num_workers
+                kwargs['persistent_workers'] = num_workers > 0
+            if pin_memory:
+                kwargs['pin_memory'] = True
+            super().__init__(*args, **kwargs)
+
+    lightning.DataLoader = TunedDataLoader
+
+
+def install_dataset_cache(budget_bytes=None):
+    """
+    Sirve el audio y los espectrogramas de PiperDataset desde memoria
+    compartida (SharedTensorCache) en lugar de leerlos del disco
+
+    Cada proceso de entrenamiento tiene su propia caché, así que con varios
+    procesos data-parallel el presupuesto se reparte entre ellos. Si no cabe
+    o algo falla al cargarla, se avisa y se lee del disco como siempre.
+    """
+    import piper_train.vits.lightning as lightning
+
+    base_dataset = lightning.PiperDataset
+    processes = int(os.environ.get('WORLD_SIZE', 1))
+    budget = budget_bytes if budget_bytes is not None else default_cache_budget()
+
+    def cached_dataset(*args, **kwargs):
+        dataset = base_dataset(*args, **kwargs)
+        paths = [path for utt in dataset.utterances for path in (utt.audio_norm_path, utt.audio_spec_path)]
+        size = estimate_cache_bytes(paths)
+        if size is None:
+            print("[ADVERTENCIA] Faltan archivos del dataset; no se usa la caché en memoria")
+            return dataset
+        if budget is not None and size * processes > budget:
+            print(f"[ADVERTENCIA] La caché del dataset ({format_bytes(size * processes)}) supera el "
+                  f"presupuesto de RAM ({format_bytes(budget)}); se lee del disco")
+            return dataset
+        start = time.perf_counter()
+        try:
+            cache = SharedTensorCache(paths, size)
+        except (ValueError, RuntimeError, OSError) as e:
+            print(f"[ADVERTENCIA] No se pudo crear la caché del dataset: {e}; se lee del disco")
+            return dataset
+        print(f"[INFO] Caché del dataset en memoria compartida: {len(dataset)} frases, "
+              f"{format_bytes(cache.used_bytes)} en {time.perf_counter() - start:.1f}s")
+        return CachedDataset(dataset, cache)
+
+    lightning.PiperDataset = cached_dataset
+
+
+def make_step_times_callback(times_file):
+    """Callback que guarda el instante (perf_counter) de fin de cada paso"""
+    import pytorch_lightning as pl
+
+    class StepTimes(pl.Callback):
+        def __init__(self):
+            self.batch_ends = []
+
+        def on_train_batch_end(self, trainer, pl_module, *args):
+            self.batch_ends.append(time.perf_counter())
+
+        def on_train_end(self, trainer, pl_module):
+            if not trainer.is_global_zero:
+                return
+            with open(times_file, 'w', encoding='utf-8') as f:
+                json.dump({'batch_ends': self.batch_ends}, f)
+
+    return StepTimes()
+
+
+def make_no_test_audio_callback():
+    """
+    Callback que vacía el dataset de test del modelo antes de entrenar
+
+    VitsModel sintetiza en cada validation_step las frases de _test_dataset
+    para TensorBoard. Sin ellas la validación solo calcula la pérdida; la
+    división no cambia, así que esas frases siguen sin usarse para entrenar.
+    """
+    import pytorch_lightning as pl
+
+    class NoTestAudio(pl.Callback):
+        def on_fit_start(self, trainer, pl_module):
+            if getattr(pl_module, '_test_dataset', None) is not None:
+                pl_module._test_dataset = []
+
+    return NoTestAudio()
+
+
+def make_live_stats_callback(stats_file, min_interval=1.0):
+    """
+    Callback que publica en un archivo JSON el tiempo que el bucle de
+    entrenamiento espera cada lote y la memoria CUDA
+
+    data_wait_s acumula el tiempo entre el fin de un paso y el inicio del
+    siguiente (carga del lote) y train_s el tiempo total del bucle, sin la
+    validación. El archivo se reemplaza de forma atómica.
+    """
+    import pytorch_lightning as pl
+
+    class LiveStats(pl.Callback):
+        def __init__(self):
+            self.data_wait_s = 0.0
+            self.train_s = 0.0
+            self.batches = 0
+            self.last_end = None
+            self.last_write = 0.0
+
+        def on_train_epoch_start(self, trainer, pl_module):
+            self.last_end = time.perf_counter()
+
+        def on_train_batch_start(self, trainer, pl_module, *args):
+            if self.last_end is not None:
+                self.data_wait_s += time.perf_counter() - self.last_end
+
+        def on_train_batch_end(self, trainer, pl_module, *args):
+            now = time.perf_counter()
+            if self.last_end is not None:
+                self.train_s += now - self.last_end
+            self.last_end = now
+            self.batches += 1
+            if trainer.is_global_zero and now - self.last_write >= min_interval:
+                self.last_write = now
+                self._write()
+
+        def _write(self):
+            stats = {'batches': self.batches, 'data_wait_s': round(self.data_wait_s, 4),
+                     'train_s': round(self.train_s, 4)}
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    stats['gpu_alloc'] = torch.cuda.memory_allocated()
+                    stats['gpu_reserved'] = torch.cuda.memory_reserved()
+            except ImportError:
+                pass
+            tmp_file = f"{stats_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(stats, f)
+            os.replace(tmp_file, stats_file)
+
+    return LiveStats()
+
+
+def parse_step_window(text):
+    """Convierte "A:B" en (A, B) con 0 <= A < B; ValueError si no es válido"""
+    try:
+        start, end = (int(part) for part in text.split(':'))
+    except ValueError:
+        raise ValueError(f"se esperaba A:B (por ejemplo 10:20): {text}")
+    if start < 0 or end <= start:
+        raise ValueError(f"se esperaba 0 <= A < B: {text}")
+    return start, end
+
+
+def _label_submodules(pl_module, record_function):
+    """
+    Envuelve el forward de los submódulos de primer y segundo nivel
+    (model_g, model_g.dec, model_d...) en un record_function con su nombre
+
+    Returns:
+        list: Módulos envueltos, para restaurarlos al terminar
+    """
+    wrapped = []
+    for name, module in pl_module.named_modules():
+        if not name or name.count('.') > 1:
+            continue
+
+        def forward(*args, _forward=module.forward, _label=f"piper::{name}", **kwargs):
+            with record_function(_label):
+                return _forward(*args, **kwargs)
+
+        module.forward = forward
+        wrapped.append(module)
+    return wrapped
+
+
+def make_profiler_callback(start, end, output_dir):
+    """
+    Callback que perfila los pasos de entrenamiento start..end-1
+
+    El perfil empieza al terminar el paso anterior a la ventana, para incluir
+    la carga del primer lote, y se guarda en output_dir como
+    profile_steps_A-B.trace.json (chrome://tracing o ui.perfetto.dev) y
+    profile_steps_A-B.txt. El forward de cada submódulo aparece como
+    piper::<nombre> y la carga de lotes como enumerate(DataLoader).
+    """
+    import pytorch_lightning as pl
+
+    class StepProfiler(pl.Callback):
+        def __init__(self):
+            self.step = 0
+            self.profiler = None
+            self.wrapped = []
+            self.use_cuda = False
+
+        def _start(self, pl_module):
+            import torch
+            from torch.profiler import ProfilerActivity, profile, record_function
+
+            activities = [ProfilerActivity.CPU]
+            self.use_cuda = torch.cuda.is_available()
+            if self.use_cuda:
+                activities.append(ProfilerActivity.CUDA)
+            self.wrapped = _label_submodules(pl_module, record_function)
+            self.profiler = profile(activities=activities, profile_memory=True)
+            self.profiler.__enter__()
+
+        def _stop(self):
+            if self.profiler is None:
+                return
+            profiler, self.profiler = self.profiler, None
+            profiler.__exit__(None, None, None)
+            for module in self.wrapped:
+                del module.forward
+            self.wrapped = []
+
+            output = Path(output_dir)
+            output.mkdir(parents=True, exist_ok=True)
+            stem = f"profile_steps_{start}-{end}"
+            profiler.export_chrome_trace(str(output / f"{stem}.trace.json"))
+
+            sort_by = 'self_cuda_time_total' if self.use_cuda else 'self_cpu_time_total'
+            averages = profiler.key_averages()
+            components = [event for event in averages if event.key.startswith('piper::')
+                          or event.key.startswith('enumerate(DataLoader)')]
+            components.sort(key=lambda event: event.cpu_time_total, reverse=True)
+            with open(output / f"{stem}.txt", 'w', encoding='utf-8') as f:
+                f.write(f"Pasos {start} a {end - 1} ({self.step - start} perfilados)\n\n")
+                f.write("Tiempo por componente (forward y carga de lotes; CPU total, ms):\n")
+                for event in components:
+                    line = f"  {event.key:<50} {event.cpu_time_total / 1000:>12.1f}"
+                    if self.use_cuda:
+                        line += f"  CUDA {event.cuda_time_total / 1000:>12.1f}"
+                    f.write(f"{line}  x{event.count}\n")
+                f.write(f"\nOperadores ordenados por {sort_by}:\n")
+                f.write(averages.table(sort_by=sort_by, row_limit=40))
+                f.write("\n")
+            print(f"[PERFIL] Pasos {start}-{end - 1} guardados en {output / stem}.*", flush=True)
+
+        def on_train_start(self, trainer, pl_module):
+            if trainer.is_global_zero and start == 0:
+                self._start(pl_module)
+
+        def on_train_batch_end(self, trainer, pl_module, *args):
+            if not trainer.is_global_zero:
+                return
+            self.step += 1
+            if self.profiler is not None:
+                self.profiler.step()
+                if self.step >= end:
+                    self._stop()
+            elif self.step == start:
+                self._start(pl_module)
+
+        def on_train_end(self, trainer, pl_module):
+            # El entrenamiento terminó antes del final de la ventana
+            self._stop()
+
+    return StepProfiler()
+
+
+def install_callbacks(callbacks, replace_checkpointing=False):
+    """
+    Añade callbacks de Lightning al Trainer que crea piper_train
+
+    piper_train reemplaza trainer.callbacks después de crear el Trainer, así
+    que los callbacks se añaden justo antes de Trainer.fit. Con
+    ``replace_checkpointing`` se quitan además los ModelCheckpoint (el de
+    --checkpoint-epochs de piper_train o el de Lightning por defecto), que
+    guardarían en lightning_logs/ checkpoints que la retención no ve.
+    """
+    import pytorch_lightning as pl
+    from pytorch_lightning.callbacks import ModelCheckpoint
+
+    original_fit = pl.Trainer.fit
+
+    def fit_with_callbacks(trainer, *args, **kwargs):
+        if replace_checkpointing:
+            trainer.callbacks[:] = [c for c in trainer.callbacks
+                                    if not isinstance(c, ModelCheckpoint)]
+        trainer.callbacks.extend(callbacks)
+        return original_fit(trainer, *args, **kwargs)
+
+    pl.Trainer.fit = fit_with_callbacks
+
+
+def _scalar_metrics(metrics):
+    values = {}
+    for key, value in metrics.items():
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            continue
+        if math.isfinite(value):
+            values[key] = value
+    return values
+
+
+def make_metrics_callback():
+    """Callback que imprime las métricas de Lightning como líneas [METRICS]"""
+    import pytorch_lightning as pl
+
+    class MetricsPrinter(pl.Callback):
+        def _print(self, trainer, event):
+            if not trainer.is_global_zero:
+                return
+            record = {
+                'event': event,
+                'epoch': trainer.current_epoch,
+                'global_step': trainer.global_step,
+            }
+            lrs = [group['lr'] for optimizer in trainer.optimizers
+                   for group in optimizer.param_groups]
+            if lrs:
+                record['lr'] = lrs[0]
+            record.update(_scalar_metrics(trainer.callback_metrics))
+            print(METRICS_PREFIX + json.dumps(record), flush=True)
+
+        def on_train_epoch_end(self, trainer, pl_module):
+            self._print(trainer, 'train_epoch')
+
+        def on_validation_end(self, trainer, pl_module):
+            if not trainer.sanity_checking:
+                self._print(trainer, 'val')
+
+    return MetricsPrinter()
+
+
+def make_checkpoint_callback(checkpoint_dir, keep_top_k=DEFAULT_KEEP_TOP_K, every_n_epochs=None):
+    """
+    Callback que guarda checkpoints candidatos a la retención por val_loss
+
+    Se guarda cuando la val_loss mejora la k-ésima mejor conocida (las del
+    índice existente cuentan), en las épocas periódicas y al terminar el
+    entrenamiento; la poda la hace CheckpointManager en el proceso padre.
+
+    Con varios procesos (DDP) decide el rango 0 y lo difunde a los demás:
+    save_checkpoint contiene una barrera, así que todos los rangos deben
+    guardar en las mismas épocas.
+    """
+    import pytorch_lightning as pl
+
+    checkpoint_path = Path(checkpoint_dir)
+    checkpoint_path.mkdir(parents=True, exist_ok=True)
+    best_losses = sorted(e['val_loss'] for e in load_index(checkpoint_path)
+                         if e.get('val_loss') is not None)
+
+    class TopKCheckpoint(pl.Callback):
+        def __init__(self):
+            self.last_step = None
+
+        def on_validation_end(self, trainer, pl_module):
+            if trainer.sanity_checking:
+                return
+            epoch = trainer.current_epoch
+            val_loss = _scalar_metrics(trainer.callback_metrics).get('val_loss')
+            improves = (val_loss is not None and keep_top_k > 0 and
+                        (len(best_losses) < keep_top_k or val_loss < best_losses[keep_top_k - 1]))
+            periodic = bool(every_n_epochs) and (epoch + 1) % every_n_epochs == 0
+            save, val_loss = trainer.strategy.broadcast((improves or periodic, val_loss), src=0)
+            if save:
+                self._save(trainer, val_loss)
+
+        def on_train_end(self, trainer, pl_module):
+            # Checkpoint final (el "último" que siempre se conserva)
+            if self.last_step != trainer.global_step:
+                val_loss = _scalar_metrics(trainer.callback_metrics).get('val_loss')
+                self._save(trainer, trainer.strategy.broadcast(val_loss, src=0))
+
+        def _save(self, trainer, val_loss):
+            epoch = trainer.current_epoch
+            path = checkpoint_path / f"epoch={epoch}-step={trainer.global_step}.ckpt"
+            trainer.save_checkpoint(path)
+            self.last_step = trainer.global_step
+            # Todos los rangos llevan la misma lista (val_loss del rango 0)
+            if val_loss is not None:
+                bisect.insort(best_losses, val_loss)
+            if not trainer.is_global_zero:
+                return
+            print(METRICS_PREFIX + json.dumps({
+                'event': 'checkpoint',
+                'path': str(path),
+                'epoch': epoch,
+                'global_step': trainer.global_step,
+                'val_loss': val_loss,
+            }), flush=True)
+
+    return TopKCheckpoint()
+
+
+def make_early_stopping_callback(patience, min_delta=0.0):
+    """
+    EarlyStopping de Lightning sobre val_loss que anuncia la parada
+
+    Lightning termina la época en curso y llama a on_train_end, así que el
+    callback de checkpoints deja un checkpoint final.
+    """
+    from pytorch_lightning.callbacks import EarlyStopping
+
+    class AnnouncedEarlyStopping(EarlyStopping):
+        def on_train_end(self, trainer, pl_module):
+            if self.stopped_epoch and trainer.is_global_zero:
+                print(METRICS_PREFIX + json.dumps({
+                    'event': 'early_stop',
+                    'epoch': self.stopped_epoch,
+                    'global_step': trainer.global_step,
+                    'best_val_loss': float(self.best_score),
+                    'patience': self.patience,
+                }), flush=True)
+
+    return AnnouncedEarlyStopping(monitor='val_loss', patience=patience, min_delta=min_delta,
+                                  mode='min', strict=False, check_on_train_epoch_end=False)
+
+
+def run_piper_train(piper_args):
+    """Ejecuta piper_train como `python -m piper_train` en este proceso"""
+    sys.argv = ['piper_train'] + list(piper_args)
+    runpy.run_module('piper_train', run_name='__main__', alter_sys=True)
+
+
+def main():
+    """Función principal"""
+    if '--' in sys.argv:
+        sep = sys.argv.index('--')
+        own_args, piper_args = sys.argv[1:sep], sys.argv[sep + 1:]
+    else:
+        own_args, piper_args = [], sys.argv[1:]
+
+    parser = argparse.ArgumentParser(
+        description='Lanza piper_train con ajustes en proceso',
+        usage='%(prog)s [opciones] -- [argumentos de piper_train]'
+    )
+    parser.add_argument(
+        '--split-dir',
+        help='Directorio con train.idx/val.idx/test.idx generados por split_dataset.py'
+    )
+    parser.add_argument(
+        '--emit-metrics',
+        action='store_true',
+        help='Imprimir líneas [METRICS] con las métricas de cada época y validación'
+    )
+    parser.add_argument(
+        '--checkpoint-dir',
+        help='Guardar checkpoints por val_loss en este directorio (en lugar de lightning_logs/)'
+    )
+    parser.add_argument(
+        '--keep-top-k',
+        type=int,
+        default=DEFAULT_KEEP_TOP_K,
+        help=f'Mejores checkpoints por val_loss a conservar (por defecto: {DEFAULT_KEEP_TOP_K})'
+    )
+    parser.add_argument(
+        '--checkpoint-epochs',
+        type=int,
+        help='Guardar además un checkpoint cada N épocas'
+    )
+    parser.add_argument(
+        '--patience',
+        type=int,
+        help='Validaciones sin mejora de val_loss antes de detener (early stopping)'
+    )
+    parser.add_argument(
+        '--min-delta',
+        type=float,
+        default=0.0,
+        help='Mejora mínima de val_loss que reinicia la paciencia (por defecto: 0.0)'
+    )
+    parser.add_argument(
+        '--train-indices',
+        help='Archivo con los índices de dataset.jsonl con los que entrenar (sondeo de memoria)'
+    )
+    parser.add_argument(
+        '--probe-report',
+        help='Archivo JSON donde guardar el pico de memoria al terminar'
+    )
+    parser.add_argument(
+        '--step-times',
+        help='Archivo JSON donde guardar el instante de fin de cada paso'
+    )
+    parser.add_argument(
+        '--profile-steps',
+        help='Perfilar con torch.profiler los pasos A a B-1 (formato A:B)'
+    )
+    parser.add_argument(
+        '--profile-dir',
+        default='.',
+        help='Directorio para la traza y la tabla del perfil (por defecto: el actual)'
+    )
+    parser.add_argument(
+        '--dataset-cache',
+        action='store_true',
+        help='Cargar el dataset en memoria compartida para los workers del DataLoader'
+    )
+    parser.add_argument(
+        '--cache-budget-gb',
+        type=float,
+        help='RAM máxima para la caché del dataset, sumando todos los procesos '
+             '(por defecto: la mitad de la disponible)'
+    )
+    parser.add_argument(
+        '--live-stats',
+        help='Archivo JSON donde publicar la espera de lotes y la memoria CUDA'
+    )
+    parser.add_argument(
+        '--no-test-audio',
+        action='store_true',
+        help='No sintetizar los ejemplos de test en cada validación'
+    )
+    parser.add_argument(
+        '--cpu-workers',
+        type=int,
+        default=1,
+        help='Procesos de entrenamiento data-parallel en CPU (backend gloo)'
+    )
+    parser.add_argument(
+        '--threads-per-worker',
+        type=int,
+        help='Hilos de PyTorch por proceso (por defecto: núcleos / procesos)'
+    )
+    parser.add_argument(
+        '--interop-threads',
+        type=int,
+        help='Hilos inter-operación de PyTorch por proceso'
+    )
+    parser.add_argument(
+        '--cpu-cores',
+        help='Núcleos a usar, separados por comas y en orden de preferencia'
+    )
+    parser.add_argument(
+        '--dataloader-workers',
+        type=int,
+        help='Workers de los DataLoader de piper_train'
+    )
+    parser.add_argument(
+        '--pin-memory',
+        action='store_true',
+        help='Usar memoria fijada en los DataLoader (copias más rápidas a la GPU)'
+    )
+    args = parser.parse_args(own_args)
+    profile_window = None
+    if args.profile_steps:
+        try:
+            profile_window = parse_step_window(args.profile_steps)
+        except ValueError as e:
+            parser.error(f"--profile-steps: {e}")
+
+    cores = [int(c) for c in args.cpu_cores.split(',')] if args.cpu_cores else None
+    if args.cpu_workers > 1 and 'LOCAL_RANK' not in os.environ:
+        # Proceso supervisor: lanza los procesos del grupo y espera
+        sys.exit(launch_workers([sys.executable] + sys.argv, args.cpu_workers,
+                                args.threads_per_worker, cores, args.interop_threads))
+    if CORES_ENV not in os.environ and 'LOCAL_RANK' not in os.environ:
+        # Un solo proceso: los hilos de cálculo más los workers del DataLoader
+        if cores and args.threads_per_worker:
+            cores = cores[:args.threads_per_worker + (args.dataloader_workers or 0)]
+        os.environ.update(worker_env(cores, args.threads_per_worker, args.interop_threads))
+    pin_current_worker()
+    if args.dataloader_workers is not None or args.pin_memory:
+        install_dataloader(args.dataloader_workers, args.pin_memory)
+
+    if args.dataset_cache:
+        install_dataset_cache(int(args.cache_budget_gb * 1024 ** 3) if args.cache_budget_gb else None)
+    if args.split_dir:
+        install_split(args.split_dir)
+    if args.train_indices:
+        install_train_subset(args.train_indices)
+
+    callbacks = []
+    if args.emit_metrics:
+        callbacks.append(make_metrics_callback())
+    if args.patience:
+        callbacks.append(make_early_stopping_callback(args.patience, args.min_delta))
+    if args.checkpoint_dir:
+        callbacks.append(make_checkpoint_callback(args.checkpoint_dir, args.keep_top_k,
+                                                  args.checkpoint_epochs))
+    if args.probe_report:
+        callbacks.append(make_probe_report_callback(args.probe_report))
+    if args.step_times:
+        callbacks.append(make_step_times_callback(args.step_times))
+    if args.live_stats:
+        callbacks.append(make_live_stats_callback(args.live_stats))
+    if args.no_test_audio:
+        callbacks.append(make_no_test_audio_callback())
+    if profile_window:
+        callbacks.append(make_profiler_callback(*profile_window, args.profile_dir))
+    if callbacks:
+        install_callbacks(callbacks, replace_checkpointing=bool(args.checkpoint_dir))
+
+    run_piper_train(piper_args)
+
+
+if __name__ == '__main__':
+    main()
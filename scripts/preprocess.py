@@ -9,12 +9,18 @@ Versión Python compatible con Windows y Linux
 import argparse
 import json
 import logging
-import os
 import shutil
-import subprocess
 import sys
+import time
 from pathlib import Path
 
+from configuracion import add_config_arguments, apply_config
+from instrumentacion import RunStats
+from manifest import build_manifest
+from perfiles_calidad import DEFAULT_QUALITY, QUALITIES, get_quality_profile, write_dataset_quality
+from piper_api import run_piper_module
+from split_dataset import create_split
+
 # Configurar logging con colores
 logging.basicConfig(
     level=logging.INFO,
@@ -101,7 +107,41 @@ def detect_speaker_type(metadata_path):
         return None, None
 
 
-def preprocess_dataset(input_dir, output_dir, language='es-es'):
+def record_preprocess_stats(stats, output_path):
+    """
+    Completa las métricas de rendimiento a partir de la salida de Piper
+    y guarda el resumen en preprocess_stats.json
+    
+    Args:
+        stats: RunStats de la ejecución
+        output_path: Directorio de salida del preprocesamiento
+        
+    Returns:
+        Path: Ruta del archivo JSON generado
+    """
+    with stats.stage('estadisticas'):
+        dataset_jsonl = output_path / "dataset.jsonl"
+        num_utterances = 0
+        if dataset_jsonl.exists():
+            with open(dataset_jsonl, 'rb') as f:
+                num_utterances = sum(1 for line in f if line.strip())
+        
+        output_bytes = sum(
+            item.stat().st_size for item in output_path.rglob('*') if item.is_file()
+        )
+    
+    piper_seconds = stats.stages.get('piper_preprocess', 0.0)
+    stats.set('num_utterances', num_utterances)
+    stats.set('utterances_per_sec', num_utterances / piper_seconds if piper_seconds else 0.0)
+    stats.set('output_bytes', output_bytes)
+    
+    stats_path = output_path / "preprocess_stats.json"
+    stats.write_json(stats_path)
+    return stats_path
+
+
+def preprocess_dataset(input_dir, output_dir, language='es-es', in_process=False,
+                       quality='medium', sample_rate=None, workers=None):
     """
     Preprocesa un dataset para entrenamiento con Piper
     
@@ -109,12 +149,19 @@ def preprocess_dataset(input_dir, output_dir, language='es-es'):
         input_dir: Directorio del dataset en formato LJSpeech
         output_dir: Directorio donde guardar los datos procesados
         language: Código de idioma (default: es-es)
+        in_process: Ejecutar piper_train en este intérprete en lugar de un
+            subproceso (evita reimportar torch desde un driver de larga duración)
+        quality: Calidad del modelo a entrenar; fija la frecuencia de muestreo
+        sample_rate: Frecuencia de muestreo explícita (anula la del perfil)
+        workers: Procesos de piper_train.preprocess (None = los de piper)
         
     Returns:
         bool: True si fue exitoso, False si falló
     """
     input_path = Path(input_dir)
     output_path = Path(output_dir)
+    stats = RunStats('preprocess')
+    stage_start = time.perf_counter()
     
     # Verificar que el directorio de entrada existe
     if not input_path.exists():
@@ -169,6 +216,11 @@ def preprocess_dataset(input_dir, output_dir, language='es-es'):
     print_info(f"Dataset de entrada: {input_dir}")
     print_info(f"Dataset de salida: {output_dir}")
     print_info(f"Idioma: {language}")
+    
+    profile = get_quality_profile(quality)
+    if sample_rate:
+        profile['sample_rate'] = sample_rate
+    print_info(f"Calidad: {quality} ({profile['sample_rate']} Hz)")
     print()
     
     # Detectar tipo de dataset
@@ -186,21 +238,27 @@ def preprocess_dataset(input_dir, output_dir, language='es-es'):
     print_info("Ejecutando preprocesamiento de Piper...")
     print()
     
-    cmd = [
-        sys.executable, '-m', 'piper_train.preprocess',
+    piper_args = [
         '--language', language,
         '--input-dir', str(input_path),
         '--output-dir', str(output_path),
         '--dataset-format', 'ljspeech',
-        '--sample-rate', '22050'
+        '--sample-rate', str(profile['sample_rate'])
     ]
     
     if speaker_flag:
-        cmd.append(speaker_flag)
+        piper_args.append(speaker_flag)
+    
+    if workers:
+        piper_args.extend(['--max-workers', str(workers)])
+    
+    stats.add_stage('verificacion', time.perf_counter() - stage_start)
     
     try:
-        result = subprocess.run(cmd, check=False)
-        exit_code = result.returncode
+        with stats.stage('piper_preprocess'):
+            exit_code, usage, ran_in_process = run_piper_module(
+                'piper_train.preprocess', piper_args, in_process=in_process
+            )
     except FileNotFoundError:
         print_error("No se pudo ejecutar piper_train.preprocess")
         print_info("Asegúrate de que Piper está instalado correctamente")
@@ -210,7 +268,36 @@ def preprocess_dataset(input_dir, output_dir, language='es-es'):
         print_error(f"Error ejecutando preprocesamiento: {e}")
         return False
     
+    stats.set('exit_code', exit_code)
+    stats.set('in_process', ran_in_process)
+    stats.set('quality', quality)
+    stats.set('sample_rate', profile['sample_rate'])
+    stats.set('num_wavs', num_wavs)
+    stats.set('input_audio_bytes', sum(p.stat().st_size for p in wavs_dir.glob("*.[wW][aA][vV]")))
+    stats.metrics.update(usage)
+    stats_path = record_preprocess_stats(stats, output_path)
+    
     if exit_code == 0:
+        # Registrar el perfil para que train.py use la misma calidad
+        write_dataset_quality(output_path, quality)
+        
+        # Manifiesto columnar para que los pasos siguientes no reparseen dataset.jsonl
+        if (output_path / "dataset.jsonl").exists():
+            try:
+                build_manifest(output_path)
+            except (RuntimeError, ValueError, OSError) as e:
+                print_warning(f"No se generó el manifiesto columnar: {e}")
+            
+            # División train/validación estable para todos los entrenamientos
+            try:
+                split_meta = create_split(output_path)
+            except (ValueError, OSError) as e:
+                print_warning(f"No se generó la división precalculada: {e}")
+            else:
+                counts = split_meta['counts']
+                print_info(f"División precalculada: train={counts['train']}, "
+                           f"val={counts['val']}, test={counts['test']}")
+        
         print()
         print_info("¡Preprocesamiento completado exitosamente!")
         print_info(f"Dataset procesado guardado en: {output_dir}")
@@ -243,6 +330,9 @@ def preprocess_dataset(input_dir, output_dir, language='es-es'):
             except Exception as e:
                 print_info(f"  No se pudo leer la configuración: {e}")
         
+        print_info("Rendimiento del preprocesamiento:")
+        print(stats.format_table())
+        print_info(f"Resumen guardado en: {stats_path}")
         print()
         print_info("Siguiente paso: Entrenar el modelo")
         if sys.platform == 'win32':
@@ -269,6 +359,8 @@ def main():
 Ejemplos:
   python preprocess.py mi_dataset dataset_procesado
   python preprocess.py mi_dataset dataset_procesado --language es-es
+  python preprocess.py mi_dataset dataset_procesado --quality low   # 16 kHz
+  python preprocess.py mi_dataset dataset_procesado --profile fast-cpu-smoke
 
 Estructura esperada del dataset:
   mi_dataset/
@@ -295,13 +387,48 @@ Formato de metadata.csv:
     
     parser.add_argument(
         '--language',
-        default='es-es',
         help='Código de idioma (por defecto: es-es)'
     )
     
+    parser.add_argument(
+        '--quality',
+        choices=QUALITIES,
+        help='Calidad del modelo; fija la frecuencia de muestreo (por defecto: medium)'
+    )
+    
+    parser.add_argument(
+        '--sample-rate',
+        type=int,
+        help='Frecuencia de muestreo explícita (por defecto: según --quality)'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Procesos de preprocesamiento (por defecto: los de piper_train)'
+    )
+    
+    parser.add_argument(
+        '--in-process',
+        action='store_true',
+        help='Ejecutar piper_train en este proceso en lugar de un subproceso'
+    )
+    
+    add_config_arguments(parser)
+    
     args = parser.parse_args()
     
-    success = preprocess_dataset(args.input_dir, args.output_dir, args.language)
+    try:
+        apply_config(args, ['language', 'quality', 'sample_rate', 'workers'])
+    except ValueError as e:
+        print_error(str(e))
+        sys.exit(1)
+    
+    success = preprocess_dataset(args.input_dir, args.output_dir, args.language or 'es-es',
+                                 in_process=args.in_process,
+                                 quality=args.quality or DEFAULT_QUALITY,
+                                 sample_rate=args.sample_rate,
+                                 workers=args.workers)
     sys.exit(0 if success else 1)
 
 
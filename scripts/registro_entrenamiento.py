@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Canal de salida de piper_train sin bloquear al proceso hijo
+
+train.py lee la salida del entrenamiento y la reparte entre:
+  - BackgroundLogWriter: escribe training.log desde un hilo propio con búfer,
+    rota el archivo por tamaño y comprime los segmentos rotados con gzip
+    (training.log.1.gz, training.log.2.gz, ...; se conservan los últimos N)
+  - ConsoleThrottle: muestra la salida en consola limitando las
+    actualizaciones de la barra de progreso (líneas terminadas en '\\r')
+  - BackgroundDispatcher: entrega las líneas desde un hilo propio a la
+    consola y, por separado, a las métricas (metrics.jsonl y sus oyentes)
+
+El hilo que lee la tubería solo decodifica, reparte y encola, así que el hijo
+no espera nunca por el disco ni por una terminal lenta.
+"""
+
+import codecs
+import gzip
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+READ_SIZE = 65536
+# Bytes acumulados en memoria antes de escribir a disco
+WRITE_BUFFER_BYTES = 256 * 1024
+
+_STOP = object()
+
+
+def iter_output_lines(stream):
+    """
+    Recorre la salida binaria del hijo separando líneas y actualizaciones
+
+    Args:
+        stream: Tubería binaria (process.stdout con bufsize=0 o similar)
+
+    Yields:
+        tuple: (texto, es_progreso); es_progreso=True si terminó en '\\r'
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    read = stream.read1 if hasattr(stream, 'read1') else stream.read
+    pending = ''
+    while True:
+        chunk = read(READ_SIZE)
+        pending += decoder.decode(chunk, final=not chunk)
+        start = 0
+        for match in re.finditer(r'\r\n|\r|\n', pending):
+            if match.group() == '\r' and match.end() == len(pending) and chunk:
+                # Puede ser la mitad de un '\r\n': se decide con el siguiente bloque
+                break
+            segment = pending[start:match.start()]
+            start = match.end()
+            is_progress = match.group() == '\r'
+            if segment or not is_progress:
+                yield segment, is_progress
+        pending = pending[start:]
+        if not chunk:
+            break
+    if pending:
+        yield pending, False
+
+
+class BackgroundLogWriter:
+    """
+    Escritor de log en segundo plano con rotación por tamaño
+
+    Args:
+        path: Ruta del log (training.log)
+        max_bytes: Tamaño a partir del cual se rota (0 = sin rotación)
+        backup_count: Segmentos comprimidos que se conservan
+        compress: Comprimir con gzip los segmentos rotados
+        flush_interval: Segundos máximos que un texto espera en el búfer
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT,
+                 compress=True, flush_interval=1.0):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.rotations = 0
+        self._queue = queue.SimpleQueue()
+        # Número de segmento -> hilo que lo comprime
+        self._compressors = {}
+        self._segment = self._last_segment_number()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._size = 0
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def _segment_numbers(self):
+        """Números de los segmentos rotados existentes (.N o .N.gz), ordenados"""
+        found = set()
+        for candidate in self.path.parent.glob(self.path.name + '.*'):
+            number = candidate.name[len(self.path.name) + 1:].split('.', 1)[0]
+            if number.isdigit():
+                found.add(int(number))
+        return sorted(found)
+
+    def _segment_path(self, number):
+        return self.path.with_name(f"{self.path.name}.{number}")
+
+    def _last_segment_number(self):
+        numbers = self._segment_numbers()
+        return numbers[-1] if numbers else 0
+
+    def write(self, text):
+        """Encola texto para el log (no bloquea)"""
+        self._queue.put(text)
+
+    def close(self):
+        """Vacía la cola, cierra el log y espera a las compresiones pendientes"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        for thread in self._compressors.values():
+            thread.join()
+
+    def _run(self):
+        buffer = []
+        buffered = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is not None and item is not _STOP:
+                buffer.append(item)
+                buffered += len(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if buffered < WRITE_BUFFER_BYTES:
+                    continue
+            if buffer:
+                self._write(''.join(buffer))
+                buffer = []
+                buffered = 0
+            deadline = None
+            if item is _STOP:
+                self._file.close()
+                return
+
+    def _write(self, text):
+        self._file.write(text)
+        self._file.flush()
+        self._size += len(text.encode('utf-8'))
+        if self.max_bytes and self._size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        self._segment += 1
+        rotated = self._segment_path(self._segment)
+        os.replace(self.path, rotated)
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._size = 0
+        self.rotations += 1
+        if self.compress:
+            thread = threading.Thread(target=self._compress, args=(rotated,),
+                                      name='log-gzip', daemon=True)
+            thread.start()
+            self._compressors = {n: t for n, t in self._compressors.items() if t.is_alive()}
+            self._compressors[self._segment] = thread
+        self._prune()
+
+    def _compress(self, segment):
+        target = segment.with_name(segment.name + '.gz')
+        try:
+            with open(segment, 'rb') as src, gzip.open(target, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, READ_SIZE)
+            segment.unlink()
+        except OSError as e:
+            print(f"[ADVERTENCIA] No se pudo comprimir {segment}: {e}", file=sys.stderr)
+
+    def _prune(self):
+        """
+        Borra los segmentos que exceden backup_count (solo desde el hilo escritor)
+
+        Cuenta números de segmento, no archivos, y espera a que termine la
+        compresión de un segmento antes de borrarlo.
+        """
+        oldest_kept = self._segment - self.backup_count
+        for number in self._segment_numbers():
+            if number > oldest_kept:
+                break
+            compressor = self._compressors.pop(number, None)
+            if compressor is not None:
+                compressor.join()
+            segment = self._segment_path(number)
+            for old in (segment, segment.with_name(segment.name + '.gz')):
+                try:
+                    old.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"[ADVERTENCIA] No se pudo borrar {old}: {e}", file=sys.stderr)
+
+
+class ConsoleThrottle:
+    """
+    Salida en consola con las actualizaciones de progreso limitadas
+
+    Las líneas normales se muestran siempre; las actualizaciones de la barra
+    de progreso se redibujan en la misma línea como mucho cada ``interval``
+    segundos y el resto se descarta (siguen llegando íntegras al log).
+    """
+
+    def __init__(self, stream=None, interval=0.5):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.skipped = 0
+        self._last_progress = 0.0
+        self._progress_width = 0
+
+    def show(self, text, is_progress=False):
+        if is_progress:
+            now = time.monotonic()
+            if now - self._last_progress < self.interval:
+                self.skipped += 1
+                return
+            self._last_progress = now
+            self.stream.write('\r' + text.ljust(self._progress_width))
+            self._progress_width = len(text)
+        elif self._progress_width:
+            # Sobrescribe la barra con la línea definitiva
+            self.stream.write('\r' + text.ljust(self._progress_width) + '\n')
+            self._progress_width = 0
+        else:
+            self.stream.write(text + '\n')
+        self.stream.flush()
+
+    def close(self):
+        if self._progress_width:
+            self.stream.write('\n')
+            self.stream.flush()
+            self._progress_width = 0
+
+
+class BackgroundDispatcher:
+    """
+    Entrega elementos a una función desde un hilo propio, en orden
+
+    train.py usa uno para la consola y otro para las métricas, de modo que ni
+    una terminal lenta ni la escritura de metrics.jsonl (y lo que hagan sus
+    oyentes) frenan la lectura de la tubería. Si la función lanza una
+    excepción, se descartan los elementos siguientes y close() la relanza.
+
+    Args:
+        handler: Función que recibe los argumentos de cada put()
+        name: Nombre del hilo
+    """
+
+    def __init__(self, handler, name='dispatcher'):
+        self._handler = handler
+        self._queue = queue.SimpleQueue()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, *args):
+        """Encola una llamada (no bloquea)"""
+        self._queue.put(args)
+
+    def close(self):
+        """Espera a que se entregue todo lo encolado"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            args = self._queue.get()
+            if args is _STOP:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._handler(*args)
+            except Exception as e:
+                self._error = e
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+División train/validación/test determinista y estratificada
+
+Precalcula la división del dataset al preprocesar, en lugar de que
+piper_train la sortee en cada lanzamiento. Las entradas se agrupan por
+hablante y por tramo de duración (cuantiles), y dentro de cada grupo se
+ordenan por un hash estable de (semilla, ruta del audio). Así la misma
+semilla da siempre la misma división, y añadir frases al dataset apenas
+mueve las existentes.
+
+Archivos generados en <dataset>/splits/:
+    train.idx, val.idx, test.idx  - índices (línea de dataset.jsonl, desde 0)
+    split.json                    - parámetros, conteos y huella de dataset.jsonl
+
+train.py usa estos archivos automáticamente si corresponden al dataset.jsonl
+actual (ver piper_launcher.py).
+
+Uso:
+    python split_dataset.py dataset_procesado --validation-split 0.05 --seed 1234
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import sys
+import wave
+from pathlib import Path
+
+from manifest import iter_dataset_entries, load_manifest
+
+SPLIT_DIR = "splits"
+SPLIT_VERSION = 1
+
+
+def _stable_hash(seed, key):
+    """Hash de 64 bits estable entre ejecuciones y plataformas"""
+    digest = hashlib.sha1(f"{seed}:{key}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def _wav_duration(path):
+    """Duración de un WAV leyendo solo la cabecera (None si no se puede)"""
+    try:
+        with wave.open(str(path), 'rb') as w:
+            return w.getnframes() / float(w.getframerate())
+    except (OSError, EOFError, wave.Error):
+        return None
+
+
+def _load_items(dataset_path):
+    """
+    Devuelve (clave, hablante, duración) de cada entrada de dataset.jsonl
+
+    La duración se lee de la cabecera WAV; si falta algún audio se usa el
+    número de fonemas de todas las entradas como aproximación (solo se
+    compara entre entradas, así que no importa la unidad).
+    """
+    manifest = load_manifest(dataset_path)
+    if manifest is not None:
+        n = len(manifest)
+        audio_paths = (manifest.strings('audio_path')
+                       if manifest.columns.get('audio_path') == 'str' else [None] * n)
+        speakers = manifest.values('speaker_id')
+        lengths = (manifest.phoneme_lengths().tolist()
+                   if 'phoneme_ids' in manifest.columns else [0] * n)
+        rows = list(zip(audio_paths, speakers, lengths))
+    else:
+        rows = []
+        for _, entry in iter_dataset_entries(dataset_path):
+            entry = entry or {}
+            rows.append((entry.get('audio_path'), entry.get('speaker_id'),
+                         len(entry.get('phoneme_ids') or [])))
+
+    durations = []
+    for audio_path, _, _ in rows:
+        duration = None
+        if audio_path:
+            audio_file = Path(audio_path)
+            if not audio_file.is_absolute():
+                audio_file = dataset_path / audio_file
+            duration = _wav_duration(audio_file)
+        if duration is None:
+            break
+        durations.append(duration)
+
+    if len(durations) == len(rows):
+        unit = 'seconds'
+    else:
+        unit = 'phonemes'
+        durations = [float(num_phonemes) for _, _, num_phonemes in rows]
+
+    items = [
+        (audio_path or str(index), speaker, duration)
+        for index, ((audio_path, speaker, _), duration) in enumerate(zip(rows, durations))
+    ]
+    return items, unit
+
+
+def entry_lengths(dataset_dir):
+    """
+    Longitud de cada entrada de dataset.jsonl, en el orden del archivo
+
+    Returns:
+        tuple: (lista de longitudes, unidad: 'seconds' o 'phonemes')
+    """
+    items, unit = _load_items(Path(dataset_dir))
+    return [duration for _, _, duration in items], unit
+
+
+def _quantile_edges(values, num_buckets):
+    """Límites de tramo por cuantiles (sin duplicados)"""
+    if not values:
+        return []
+    ordered = sorted(values)
+    edges = []
+    for b in range(1, num_buckets):
+        edge = ordered[min(len(ordered) - 1, (len(ordered) * b) // num_buckets)]
+        if not edges or edge > edges[-1]:
+            edges.append(edge)
+    return edges
+
+
+def _allocate(sizes, total):
+    """Reparte ``total`` entre grupos en proporción a su tamaño (resto mayor)"""
+    n = sum(sizes.values())
+    if n == 0 or total == 0:
+        return {key: 0 for key in sizes}
+    exact = {key: size * total / n for key, size in sizes.items()}
+    quota = {key: int(value) for key, value in exact.items()}
+    remaining = total - sum(quota.values())
+    # Orden determinista: mayor resto primero, luego clave
+    order = sorted(sizes, key=lambda k: (-(exact[k] - quota[k]), str(k)))
+    for key in order[:remaining]:
+        quota[key] += 1
+    return quota
+
+
+def _jsonl_fingerprint(jsonl_path):
+    stat = jsonl_path.stat()
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+def create_split(dataset_dir, validation_split=0.05, num_test_examples=5, seed=1234,
+                 num_buckets=10):
+    """
+    Calcula y guarda la división estratificada del dataset
+
+    Args:
+        dataset_dir: Dataset preprocesado (con dataset.jsonl)
+        validation_split: Fracción para validación (se redondea como piper_train)
+        num_test_examples: Número de ejemplos de test
+        seed: Semilla del orden estable
+        num_buckets: Número de tramos de duración
+
+    Returns:
+        dict: Contenido de split.json
+    """
+    dataset_path = Path(dataset_dir)
+    items, duration_unit = _load_items(dataset_path)
+    n = len(items)
+
+    # Mismos tamaños que calcularía piper_train
+    num_val = int(n * validation_split)
+    num_test = min(num_test_examples, max(0, n - num_val))
+
+    edges = _quantile_edges([d for _, _, d in items], num_buckets)
+    strata = {}
+    for index, (key, speaker, duration) in enumerate(items):
+        stratum = (str(speaker), bisect.bisect_right(edges, duration))
+        strata.setdefault(stratum, []).append((_stable_hash(seed, key), index))
+    for members in strata.values():
+        members.sort()
+
+    val_quota = _allocate({k: len(v) for k, v in strata.items()}, num_val)
+    val_idx = []
+    rest = {}
+    for stratum, members in strata.items():
+        q = val_quota[stratum]
+        val_idx.extend(index for _, index in members[:q])
+        rest[stratum] = members[q:]
+
+    # Test: repartido entre grupos igual que validación
+    test_quota = _allocate({k: len(v) for k, v in rest.items()}, num_test)
+    test_idx = []
+    train_idx = []
+    for stratum, members in rest.items():
+        q = test_quota[stratum]
+        test_idx.extend(index for _, index in members[:q])
+        train_idx.extend(index for _, index in members[q:])
+
+    split_path = dataset_path / SPLIT_DIR
+    split_path.mkdir(exist_ok=True)
+    for name, indices in (('train', train_idx), ('val', val_idx), ('test', test_idx)):
+        with open(split_path / f"{name}.idx", 'w', encoding='utf-8') as f:
+            f.writelines(f"{i}\n" for i in sorted(indices))
+
+    meta = {
+        'version': SPLIT_VERSION,
+        'seed': seed,
+        'validation_split': validation_split,
+        'num_test_examples': num_test_examples,
+        'num_buckets': num_buckets,
+        'duration_unit': duration_unit,
+        'bucket_edges': edges,
+        'num_strata': len(strata),
+        'counts': {'total': n, 'train': len(train_idx), 'val': len(val_idx), 'test': len(test_idx)},
+    }
+    meta.update(_jsonl_fingerprint(dataset_path / "dataset.jsonl"))
+    with open(split_path / "split.json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def load_split_meta(dataset_dir):
+    """
+    Devuelve split.json si la división corresponde al dataset.jsonl actual
+
+    Returns:
+        dict o None si no existe o dataset.jsonl cambió después de dividir
+    """
+    dataset_path = Path(dataset_dir)
+    meta_path = dataset_path / SPLIT_DIR / "split.json"
+    jsonl_path = dataset_path / "dataset.jsonl"
+    if not meta_path.exists() or not jsonl_path.exists():
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    fingerprint = _jsonl_fingerprint(jsonl_path)
+    if meta.get('version') != SPLIT_VERSION or any(meta.get(k) != v for k, v in fingerprint.items()):
+        return None
+    return meta
+
+
+def read_split_indices(split_dir, name):
+    """Lee un archivo de índices (train, val o test)"""
+    with open(Path(split_dir) / f"{name}.idx", 'r', encoding='utf-8') as f:
+        return [int(line) for line in f if line.strip()]
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Divide el dataset en train/validación/test de forma determinista y estratificada'
+    )
+    parser.add_argument(
+        'dataset_dir',
+        help='Dataset preprocesado (con dataset.jsonl)'
+    )
+    parser.add_argument(
+        '--validation-split',
+        type=float,
+        default=0.05,
+        help='Fracción para validación (por defecto: 0.05)'
+    )
+    parser.add_argument(
+        '--num-test-examples',
+        type=int,
+        default=5,
+        help='Número de ejemplos de test (por defecto: 5)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=1234,
+        help='Semilla de la división (por defecto: 1234)'
+    )
+    parser.add_argument(
+        '--num-buckets',
+        type=int,
+        default=10,
+        help='Tramos de duración para estratificar (por defecto: 10)'
+    )
+
+    args = parser.parse_args()
+
+    if not (Path(args.dataset_dir) / "dataset.jsonl").exists():
+        print(f"No se encontró dataset.jsonl en {args.dataset_dir}")
+        sys.exit(1)
+
+    meta = create_split(args.dataset_dir, args.validation_split, args.num_test_examples,
+                        args.seed, args.num_buckets)
+    counts = meta['counts']
+    print(f"División guardada en {Path(args.dataset_dir) / SPLIT_DIR}")
+    print(f"  Train: {counts['train']}  Validación: {counts['val']}  Test: {counts['test']}")
+    print(f"  Grupos (hablante x duración): {meta['num_strata']}  Unidad de duración: {meta['duration_unit']}")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Telemetría de recursos durante el entrenamiento
+
+train.py arranca un TelemetrySampler que, cada ``interval`` segundos, toma
+una muestra del árbol de procesos de piper_train y del sistema y la añade a
+checkpoints/telemetry.jsonl:
+
+  time, epoch, step     mismo reloj y posición que metrics.jsonl
+  cpu_pct               CPU del árbol de procesos (100 = un núcleo)
+  sys_cpu_pct, iowait_pct
+                        CPU ocupada y esperando E/S en todo el sistema
+  rss                   memoria residente del árbol (bytes)
+  read_bps, write_bps   E/S del árbol (bytes/s, incluye la page cache)
+  disk_read_bps, disk_write_bps
+                        E/S real de los discos del sistema (bytes/s)
+  blocked               procesos del árbol bloqueados en E/S (estado D)
+  data_wait_pct         % del tiempo que el bucle de entrenamiento esperó
+                        el siguiente lote (--live-stats de piper_launcher.py)
+  gpu_alloc, gpu_reserved
+                        memoria CUDA asignada y reservada (bytes), con GPU
+
+Un data_wait_pct alto con iowait_pct alto indica que el disco no da
+abasto; con CPU del árbol saturada, que faltan workers del DataLoader.
+
+Uso (resumen por época):
+    python telemetria.py checkpoints/telemetry.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from instrumentacion import _proc_children, format_bytes
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+TELEMETRY_FILE = "telemetry.jsonl"
+LIVE_STATS_FILE = "live_stats.json"
+DEFAULT_INTERVAL = 5.0
+_CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def _tree_processes(pid):
+    """
+    CPU, E/S y estado de un proceso y sus hijos
+
+    Returns:
+        dict: {pid: (segundos de CPU, bytes leídos, bytes escritos,
+            bloqueado en E/S, RSS)}
+    """
+    samples = {}
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return samples
+        for proc in procs:
+            try:
+                with proc.oneshot():
+                    cpu = proc.cpu_times()
+                    blocked = proc.status() == psutil.STATUS_DISK_SLEEP
+                    try:
+                        io = proc.io_counters()
+                        read_bytes = getattr(io, 'read_chars', io.read_bytes)
+                        write_bytes = getattr(io, 'write_chars', io.write_bytes)
+                    except (psutil.Error, AttributeError):
+                        read_bytes = write_bytes = 0
+                    rss = proc.memory_info().rss
+                samples[proc.pid] = (cpu.user + cpu.system, read_bytes, write_bytes, blocked, rss)
+            except psutil.Error:
+                continue
+        return samples
+
+    if not sys.platform.startswith('linux'):
+        return samples
+    for child_pid in [pid] + _proc_children(pid):
+        try:
+            with open(f"/proc/{child_pid}/stat", 'r') as f:
+                # El nombre del proceso puede contener espacios: se parte tras ')'
+                fields = f.read().rsplit(')', 1)[1].split()
+            rss = int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, IndexError, ValueError):
+            continue
+        read_bytes = write_bytes = 0
+        try:
+            with open(f"/proc/{child_pid}/io", 'r') as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if key == 'rchar':
+                        read_bytes = int(value)
+                    elif key == 'wchar':
+                        write_bytes = int(value)
+        except OSError:
+            pass
+        cpu = (int(fields[11]) + int(fields[12])) / _CLK_TCK
+        samples[child_pid] = (cpu, read_bytes, write_bytes, fields[0] == 'D', rss)
+    return samples
+
+
+def _system_cpu():
+    """(total, ocupada, iowait) en segundos de CPU acumulados del sistema, o None"""
+    if psutil is not None:
+        times = psutil.cpu_times()
+        total = sum(times)
+        return total, total - times.idle - getattr(times, 'iowait', 0.0), getattr(times, 'iowait', 0.0)
+    try:
+        with open('/proc/stat', 'r') as f:
+            values = [int(v) for v in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    # user nice system idle iowait irq softirq steal (guest ya está en user)
+    values = values[:8]
+    total = sum(values)
+    idle, iowait = values[3], values[4] if len(values) > 4 else 0
+    return total / _CLK_TCK, (total - idle - iowait) / _CLK_TCK, iowait / _CLK_TCK
+
+
+def _disk_bytes():
+    """(bytes leídos, bytes escritos) acumulados de los discos físicos, o None"""
+    if sys.platform.startswith('linux'):
+        try:
+            disks = {p.name for p in Path('/sys/block').iterdir()
+                     if not p.name.startswith(('loop', 'ram', 'zram'))}
+            read_bytes = write_bytes = 0
+            with open('/proc/diskstats', 'r') as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) > 9 and fields[2] in disks:
+                        # Sectores de 512 bytes, sean cuales sean los del disco
+                        read_bytes += int(fields[5]) * 512
+                        write_bytes += int(fields[9]) * 512
+            return read_bytes, write_bytes
+        except (OSError, ValueError):
+            pass
+    if psutil is not None:
+        counters = psutil.disk_io_counters()
+        if counters is not None:
+            return counters.read_bytes, counters.write_bytes
+    return None
+
+
+def _read_live_stats(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class TelemetrySampler:
+    """
+    Hilo que muestrea recursos del proceso de entrenamiento a intervalo fijo
+
+    Args:
+        path: Ruta de telemetry.jsonl
+        interval: Segundos entre muestras
+        position: Función sin argumentos que devuelve la época y el paso
+            actuales (MetricsStream.position) para alinear con metrics.jsonl
+        live_stats_path: Archivo que escribe piper_launcher.py --live-stats
+    """
+
+    def __init__(self, path, interval=DEFAULT_INTERVAL, position=None, live_stats_path=None):
+        self.path = Path(path)
+        self.interval = interval
+        self.position = position
+        self.live_stats_path = Path(live_stats_path) if live_stats_path else None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._previous = None
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+
+    def attach(self, pid):
+        """Empieza a muestrear el árbol de ``pid`` (None entre lanzamientos)"""
+        with self._lock:
+            self._pid = pid
+            self._previous = None
+        if pid is None and self.live_stats_path:
+            # Un nuevo lanzamiento vuelve a contar desde cero
+            try:
+                self.live_stats_path.unlink()
+            except OSError:
+                pass
+
+    def close(self):
+        """Detiene el muestreo y cierra el archivo"""
+        self._stop.set()
+        self._thread.join()
+        self._file.close()
+        self.attach(None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                pid = self._pid
+                if pid is None:
+                    continue
+                try:
+                    record = self.sample(pid)
+                except Exception:
+                    # La telemetría nunca debe interrumpir el entrenamiento
+                    continue
+            if record:
+                self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+                self._file.flush()
+
+    def sample(self, pid):
+        """
+        Toma una muestra y la compara con la anterior
+
+        Returns:
+            dict o None: Registro (None en la primera muestra de un proceso)
+        """
+        now = time.time()
+        current = {
+            'time': now,
+            'tree': _tree_processes(pid),
+            'cpu': _system_cpu(),
+            'disk': _disk_bytes(),
+            'live': _read_live_stats(self.live_stats_path) if self.live_stats_path else None,
+        }
+        previous, self._previous = self._previous, current
+        if previous is None:
+            return None
+        seconds = now - previous['time']
+        if seconds <= 0:
+            return None
+
+        record = {'time': round(now, 3)}
+        if self.position:
+            record.update(self.position())
+
+        tree, old_tree = current['tree'], previous['tree']
+        if tree:
+            # Cada proceso se compara consigo mismo: los workers que terminan
+            # no restan y los nuevos cuentan desde su arranque
+            cpu = read_bytes = write_bytes = 0
+            for child_pid, (child_cpu, child_read, child_write, _, _) in tree.items():
+                old = old_tree.get(child_pid, (0, 0, 0, False, 0))
+                cpu += max(0.0, child_cpu - old[0])
+                read_bytes += max(0, child_read - old[1])
+                write_bytes += max(0, child_write - old[2])
+            record['cpu_pct'] = round(100 * cpu / seconds, 1)
+            record['rss'] = sum(s[4] for s in tree.values())
+            record['read_bps'] = int(read_bytes / seconds)
+            record['write_bps'] = int(write_bytes / seconds)
+            record['blocked'] = sum(1 for s in tree.values() if s[3])
+
+        if current['cpu'] and previous['cpu']:
+            total = current['cpu'][0] - previous['cpu'][0]
+            if total > 0:
+                record['sys_cpu_pct'] = round(100 * (current['cpu'][1] - previous['cpu'][1]) / total, 1)
+                record['iowait_pct'] = round(100 * (current['cpu'][2] - previous['cpu'][2]) / total, 1)
+
+        if current['disk'] and previous['disk']:
+            record['disk_read_bps'] = int(max(0, current['disk'][0] - previous['disk'][0]) / seconds)
+            record['disk_write_bps'] = int(max(0, current['disk'][1] - previous['disk'][1]) / seconds)
+
+        live, old_live = current['live'], previous['live']
+        if live:
+            if old_live and live.get('train_s', 0) > old_live.get('train_s', 0):
+                # Proporción sobre el tiempo dentro del bucle de entrenamiento
+                # (sin validación)
+                record['data_wait_pct'] = round(
+                    100 * (live['data_wait_s'] - old_live['data_wait_s'])
+                    / (live['train_s'] - old_live['train_s']), 1)
+            for key in ('gpu_alloc', 'gpu_reserved'):
+                if live.get(key) is not None:
+                    record[key] = live[key]
+        return record
+
+
+def read_telemetry(path):
+    """Lee telemetry.jsonl (las líneas inválidas se ignoran)"""
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+def summarize_by_epoch(records):
+    """
+    Medias (y máximos de memoria) por época
+
+    Returns:
+        list: Un dict por época, en orden
+    """
+    epochs = {}
+    for record in records:
+        epochs.setdefault(record.get('epoch'), []).append(record)
+
+    summary = []
+    for epoch, group in epochs.items():
+        row = {'epoch': epoch, 'samples': len(group)}
+        for key in ('cpu_pct', 'sys_cpu_pct', 'iowait_pct', 'read_bps', 'disk_read_bps', 'data_wait_pct'):
+            values = [r[key] for r in group if r.get(key) is not None]
+            row[key] = sum(values) / len(values) if values else None
+        for key in ('rss', 'gpu_reserved'):
+            values = [r[key] for r in group if r.get(key) is not None]
+            row[key] = max(values) if values else None
+        summary.append(row)
+    return summary
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Resume por época la telemetría de recursos de un entrenamiento'
+    )
+    parser.add_argument(
+        'telemetry',
+        nargs='?',
+        default=f"checkpoints/{TELEMETRY_FILE}",
+        help=f'Archivo de telemetría (por defecto: checkpoints/{TELEMETRY_FILE})'
+    )
+
+    args = parser.parse_args()
+
+    records = read_telemetry(args.telemetry)
+    if not records:
+        print(f"No hay muestras en {args.telemetry}")
+        sys.exit(1)
+
+    def pct(value):
+        return f"{value:.0f}%" if value is not None else '-'
+
+    def rate(value):
+        return f"{format_bytes(int(value))}/s" if value is not None else '-'
+
+    print(f"{'época':>6}  {'CPU':>6}  {'sistema':>7}  {'iowait':>6}  {'espera datos':>12}  "
+          f"{'lectura':>12}  {'disco':>12}  {'RSS máx':>10}  {'VRAM máx':>10}")
+    for row in summarize_by_epoch(records):
+        epoch = row['epoch'] if row['epoch'] is not None else '-'
+        print(f"{epoch:>6}  {pct(row['cpu_pct']):>6}  {pct(row['sys_cpu_pct']):>7}  "
+              f"{pct(row['iowait_pct']):>6}  {pct(row['data_wait_pct']):>12}  "
+              f"{rate(row['read_bps']):>12}  {rate(row['disk_read_bps']):>12}  "
+              f"{format_bytes(row['rss']):>10}  {format_bytes(row['gpu_reserved']):>10}")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,10 +10,33 @@ import argparse
 import json
 import logging
 import os
+import math
 import subprocess
 import sys
+import time
 from pathlib import Path
 
+from ajuste_cpu import benchmark_tuning, launcher_args, load_cached_tuning, recommend_tuning
+from benchmark_entrenamiento import (DEFAULT_WARMUP_STEPS, HISTORY_FILE, append_history, git_commit,
+                                     machine_info, run_benchmark)
+from buscar_batch import default_budget, find_max_batch_size
+from cache_memoria import dataset_tensor_paths, default_cache_budget, estimate_cache_bytes
+from ejemplos_prueba import (LOG_FILE as EXAMPLES_LOG_FILE, AsyncTestExamples, onnxruntime_available,
+                             spare_cores)
+from configuracion import add_config_arguments, apply_config
+from gestor_checkpoints import DEFAULT_KEEP_TOP_K, CheckpointManager, best_checkpoint
+from instrumentacion import format_bytes
+from metricas_entrenamiento import METRICS_PREFIX, MetricsStream
+from piper_launcher import parse_step_window
+from perfiles_calidad import (DEFAULT_QUALITY, QUALITIES, read_dataset_audio_config,
+                              sample_rate_for_quality)
+from registro_entrenamiento import (BackgroundDispatcher, BackgroundLogWriter, ConsoleThrottle,
+                                   iter_output_lines)
+from split_dataset import SPLIT_DIR, create_split, load_split_meta
+from telemetria import DEFAULT_INTERVAL, LIVE_STATS_FILE, TELEMETRY_FILE, TelemetrySampler
+
+LAUNCHER_PATH = Path(__file__).resolve().parent / "piper_launcher.py"
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -112,39 +135,91 @@ def create_monitor_script(checkpoint_dir):
 """Script de monitoreo para el entrenamiento de Piper"""
 
 import os
+import shutil
 import sys
 import time
 import subprocess
+from collections import deque
 from pathlib import Path
 
+TAIL_LINES = 15
+BLOCK_SIZE = 8192
+
 def clear_screen():
     """Limpia la pantalla de forma compatible con Windows y Linux"""
     os.system('cls' if sys.platform == 'win32' else 'clear')
 
-def show_gpu_status():
+def find_gpu_command():
+    """Busca una sola vez rocm-smi (AMD) o nvidia-smi (NVIDIA)"""
+    if shutil.which('rocm-smi'):
+        return ['rocm-smi', '--showuse', '--showtemp', '--showmeminfo', 'vram']
+    if shutil.which('nvidia-smi'):
+        return ['nvidia-smi']
+    return None
+
+def show_gpu_status(gpu_command):
     """Muestra el estado de la GPU si está disponible"""
+    if gpu_command is None:
+        print("No se detectó comando de monitoreo de GPU (rocm-smi o nvidia-smi)")
+        return
     try:
-        # Intentar rocm-smi (AMD)
-        if subprocess.run(['rocm-smi', '--showuse', '--showtemp', '--showmeminfo', 'vram'],
-                         capture_output=True).returncode == 0:
-            subprocess.run(['rocm-smi', '--showuse', '--showtemp', '--showmeminfo', 'vram'])
-            return
-    except FileNotFoundError:
-        pass
-    
-    try:
-        # Intentar nvidia-smi (NVIDIA)
-        if subprocess.run(['nvidia-smi'], capture_output=True).returncode == 0:
-            subprocess.run(['nvidia-smi'])
-            return
-    except FileNotFoundError:
-        pass
-    
-    print("No se detectó comando de monitoreo de GPU (rocm-smi o nvidia-smi)")
+        result = subprocess.run(gpu_command, capture_output=True, text=True, timeout=10)
+        print(result.stdout.rstrip() if result.returncode == 0 else result.stderr.rstrip())
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Error ejecutando {gpu_command[0]}: {e}")
+
+class LogTail:
+    """Últimas líneas de un log que crece, leyendo solo los bytes nuevos"""
+
+    def __init__(self, path, num_lines=TAIL_LINES):
+        self.path = Path(path)
+        self.lines = deque(maxlen=num_lines)
+        self.offset = None
+        self.inode = None
+        self.partial = b''
+
+    def _initial_tail(self, f, size):
+        """Lee bloques desde el final hasta tener suficientes líneas"""
+        data = b''
+        position = size
+        while position > 0 and data.count(b'\\n') <= self.lines.maxlen:
+            step = min(BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+        return data
+
+    def update(self):
+        """Lee lo añadido desde la última llamada; False si el log no existe"""
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return False
+        # Log nuevo, rotado o truncado: empezar de nuevo por el final
+        if self.offset is None or stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.lines.clear()
+            self.partial = b''
+            self.offset = None
+            self.inode = stat.st_ino
+        if stat.st_size == self.offset:
+            return True
+        with open(self.path, 'rb') as f:
+            if self.offset is None:
+                data = self._initial_tail(f, stat.st_size)
+            else:
+                f.seek(self.offset)
+                data = f.read(stat.st_size - self.offset)
+        self.offset = stat.st_size
+        data = self.partial + data
+        *complete, self.partial = data.split(b'\\n')
+        for raw in complete:
+            self.lines.append(raw.decode('utf-8', errors='ignore').rstrip('\\r'))
+        return True
 
 def main():
     """Monitorea el entrenamiento"""
-    log_file = Path("training.log")
+    log_tail = LogTail("training.log")
+    gpu_command = find_gpu_command()
     
     print("========== Monitor de Entrenamiento Piper ==========")
     print("Presiona Ctrl+C para salir del monitor")
@@ -158,15 +233,13 @@ def main():
             print()
             
             print("Estado de GPU:")
-            show_gpu_status()
+            show_gpu_status(gpu_command)
             print()
             
             print("Últimas líneas del log de entrenamiento:")
-            if log_file.exists():
-                with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-                    for line in lines[-15:]:
-                        print(line.rstrip())
+            if log_tail.update():
+                for line in log_tail.lines:
+                    print(line)
             else:
                 print("Esperando inicio del entrenamiento...")
             
@@ -193,6 +266,180 @@ if __name__ == '__main__':
     return monitor_path
 
 
+# Mensajes de PyTorch/ROCm/CUDA que indican falta de memoria en el hijo
+OOM_PATTERNS = ('out of memory', 'outofmemoryerror', "can't allocate memory", 'memoryerror')
+
+
+def run_training_process(cmd, console, log_writer, metrics, telemetry=None):
+    """
+    Ejecuta piper_train repartiendo su salida entre consola, log y métricas
+    
+    Si se indica, telemetry (TelemetrySampler) muestrea el proceso mientras
+    se ejecuta.
+    
+    Returns:
+        tuple: (código de salida, True si la salida mostró un error de memoria)
+    """
+    saw_oom = False
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        bufsize=0
+    )
+    if telemetry:
+        telemetry.attach(process.pid)
+    
+    # Consola, log y métricas se atienden en sus propios hilos: este solo lee y encola
+    console_out = BackgroundDispatcher(console.show, name='console')
+    metrics_in = BackgroundDispatcher(metrics.feed, name='metrics')
+    try:
+        for text, is_progress in iter_output_lines(process.stdout):
+            if not text.startswith(METRICS_PREFIX):
+                console_out.put(text, is_progress)
+                if not is_progress and any(p in text.lower() for p in OOM_PATTERNS):
+                    saw_oom = True
+            log_writer.write(text + '\n')
+            metrics_in.put(text)
+        process.wait()
+    finally:
+        try:
+            console_out.close()
+        finally:
+            metrics_in.close()
+    if telemetry:
+        telemetry.attach(None)
+    return process.returncode, saw_oom
+
+
+def is_oom_exit(exit_code, saw_oom):
+    """137 / -9: proceso matado por el OOM killer; o error de memoria de PyTorch"""
+    return exit_code != 0 and (exit_code in (137, -9) or saw_oom)
+
+
+def log_supervisor(checkpoint_path, log_writer, message):
+    """Registra una decisión del modo supervisado (consola, training.log y supervisor.log)"""
+    line = f"[SUPERVISOR] {time.strftime('%Y-%m-%d %H:%M:%S')} {message}"
+    print_warning(message)
+    log_writer.write(line + '\n')
+    with open(checkpoint_path / 'supervisor.log', 'a', encoding='utf-8') as f:
+        f.write(line + '\n')
+
+
+def is_rocm_build():
+    """True si PyTorch está compilado con ROCm (HIP)"""
+    try:
+        import torch
+        return bool(getattr(torch.version, 'hip', None))
+    except ImportError:
+        return False
+
+
+def select_cpu_tuning(mode, dataset_path, cpu_processes, batch_size, quality):
+    """
+    Ajuste de hilos y workers para entrenar en CPU (ver ajuste_cpu.py)
+
+    Args:
+        mode: 'auto' (benchmark guardado o heurística), 'benchmark' (medir
+            ahora) u 'off'
+
+    Returns:
+        dict o None
+    """
+    if mode == 'off':
+        return None
+    if mode == 'benchmark':
+        print_info("Midiendo combinaciones de hilos y workers del DataLoader...")
+        tuning, _ = benchmark_tuning(dataset_path, cpu_processes, batch_size, quality=quality)
+        return tuning
+    return load_cached_tuning(processes=cpu_processes) or recommend_tuning(processes=cpu_processes)
+
+
+def run_training_benchmark(launcher_cmd, piper_args, dataset_path, log_path, config, steps,
+                           warmup=DEFAULT_WARMUP_STEPS, history_path=HISTORY_FILE):
+    """
+    Ejecuta el benchmark de pasos fijos y lo añade al historial
+
+    Args:
+        launcher_cmd: Lanzador con las opciones de rendimiento (sin '--')
+        piper_args: Argumentos de piper_train de la configuración a medir
+        dataset_path: Dataset preprocesado
+        log_path: Archivo para la salida de piper_train
+        config: Configuración medida (batch_size, processes, accelerator, ...)
+        steps, warmup: Pasos medidos y de calentamiento
+        history_path: Historial JSONL donde se añade el resultado
+
+    Returns:
+        bool: True si el benchmark terminó y midió pasos
+    """
+    print_info(f"Benchmark: {steps} pasos medidos tras {warmup} de calentamiento...")
+    result = run_benchmark(launcher_cmd, piper_args, dataset_path, config['batch_size'], steps, warmup,
+                           config['processes'], config['accelerator'], log_path)
+    record = {
+        'time': round(time.time(), 3),
+        'commit': git_commit(),
+        'machine': machine_info(),
+        'dataset': str(dataset_path),
+        'config': config,
+        'result': result,
+    }
+    append_history(history_path, record)
+
+    if result.get('steps_per_sec') is None:
+        print_error(f"El benchmark no midió ningún paso (código de salida {result['exit_code']})")
+        print_info(f"Revisa el log en: {log_path}")
+        return False
+    print_info("Resultado:")
+    print(f"  Pasos/s:           {result['steps_per_sec']:.3f}")
+    print(f"  Muestras/s:        {result['samples_per_sec']:.2f}")
+    if result.get('audio_seconds_per_sec') is not None:
+        print(f"  Audio (s/s):       {result['audio_seconds_per_sec']:.2f}")
+    print(f"  Memoria pico:      {format_bytes(result['peak_bytes'])} ({result['peak_kind'].upper()})")
+    print_info(f"Añadido a {history_path}; compáralo con: python scripts/benchmark_entrenamiento.py {history_path}")
+    return True
+
+
+def batch_size_arg(value):
+    """Tipo de argparse para --batch-size: entero positivo o 'auto'"""
+    if str(value).lower() == 'auto':
+        return 'auto'
+    try:
+        batch_size = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"batch size inválido: {value} (entero o 'auto')")
+    if batch_size < 1:
+        raise argparse.ArgumentTypeError("el batch size debe ser al menos 1")
+    return batch_size
+
+
+def step_window_arg(value):
+    """Tipo de argparse para --profile-steps: A:B con 0 <= A < B"""
+    try:
+        return parse_step_window(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+LR_SCALING_MODES = ('none', 'linear', 'sqrt')
+CPU_TUNING_MODES = ('auto', 'benchmark', 'off')
+
+
+def scale_learning_rate(learning_rate, accumulate_grad_batches, mode='sqrt'):
+    """
+    Ajusta la tasa de aprendizaje al batch efectivo
+
+    learning_rate se entiende ajustada para --batch-size sin acumulación; al
+    acumular N micro-batches el batch efectivo es N veces mayor. 'linear'
+    multiplica por N y 'sqrt' por raíz de N (más estable con AdamW, el
+    optimizador de VITS); 'none' la deja igual.
+    """
+    if mode == 'linear':
+        return learning_rate * accumulate_grad_batches
+    if mode == 'sqrt':
+        return learning_rate * math.sqrt(accumulate_grad_batches)
+    return learning_rate
+
+
 def train_model(dataset_dir, checkpoint_base=None, checkpoint_dir='./checkpoints', **kwargs):
     """
     Entrena un modelo de Piper TTS
@@ -229,24 +476,168 @@ def train_model(dataset_dir, checkpoint_base=None, checkpoint_dir='./checkpoints
     checkpoint_path.mkdir(parents=True, exist_ok=True)
     
     # Obtener parámetros de entrenamiento (usar valores por defecto o de variables de entorno)
-    batch_size = kwargs.get('batch_size') or int(os.environ.get('BATCH_SIZE', 8))
+    batch_size = kwargs.get('batch_size') or os.environ.get('BATCH_SIZE', 8)
+    auto_batch = str(batch_size).lower() == 'auto'
+    batch_size = None if auto_batch else int(batch_size)
+    memory_budget_gb = kwargs.get('memory_budget_gb') or float(os.environ.get('MEMORY_BUDGET_GB', 0))
     max_epochs = kwargs.get('max_epochs') or int(os.environ.get('MAX_EPOCHS', 10000))
     checkpoint_epochs = kwargs.get('checkpoint_epochs') or int(os.environ.get('CHECKPOINT_EPOCHS', 1000))
     learning_rate = kwargs.get('learning_rate') or float(os.environ.get('LEARNING_RATE', 1e-4))
-    validation_split = kwargs.get('validation_split') or float(os.environ.get('VALIDATION_SPLIT', 0.05))
-    num_test_examples = kwargs.get('num_test_examples') or int(os.environ.get('NUM_TEST_EXAMPLES', 5))
-    quality = kwargs.get('quality') or os.environ.get('QUALITY', 'medium')
+    accumulate_grad_batches = (kwargs.get('accumulate_grad_batches')
+                               or int(os.environ.get('ACCUMULATE_GRAD_BATCHES', 1)))
+    lr_scaling = kwargs.get('lr_scaling') or os.environ.get('LR_SCALING', 'sqrt')
+    if accumulate_grad_batches < 1:
+        print_error("accumulate_grad_batches debe ser al menos 1")
+        return False
+    if lr_scaling not in LR_SCALING_MODES:
+        print_error(f"lr_scaling inválido: {lr_scaling} ({', '.join(LR_SCALING_MODES)})")
+        return False
+    cpu_processes = kwargs.get('cpu_processes') or int(os.environ.get('CPU_PROCESSES', 1))
+    threads_per_process = kwargs.get('threads_per_process') or int(os.environ.get('THREADS_PER_PROCESS', 0))
+    dataloader_workers = kwargs.get('dataloader_workers')
+    if dataloader_workers is None and os.environ.get('DATALOADER_WORKERS'):
+        dataloader_workers = int(os.environ['DATALOADER_WORKERS'])
+    cpu_tuning = kwargs.get('cpu_tuning') or os.environ.get('CPU_TUNING', 'auto')
+    benchmark_steps = kwargs.get('benchmark_steps')
+    benchmark_warmup = kwargs.get('benchmark_warmup')
+    if benchmark_warmup is None:
+        benchmark_warmup = DEFAULT_WARMUP_STEPS
+    profile_steps = kwargs.get('profile_steps')
+    dataset_cache = bool(kwargs.get('dataset_cache')) or os.environ.get('DATASET_CACHE') == '1'
+    cache_budget_gb = kwargs.get('cache_budget_gb') or float(os.environ.get('CACHE_BUDGET_GB', 0))
+    async_test_examples = (bool(kwargs.get('async_test_examples'))
+                           or os.environ.get('ASYNC_TEST_EXAMPLES') == '1')
+    telemetry_interval = kwargs.get('telemetry_interval')
+    if telemetry_interval is None:
+        telemetry_interval = float(os.environ.get('TELEMETRY_INTERVAL', DEFAULT_INTERVAL))
+    if cpu_tuning not in CPU_TUNING_MODES:
+        print_error(f"cpu_tuning inválido: {cpu_tuning} ({', '.join(CPU_TUNING_MODES)})")
+        return False
+    if cpu_processes > 1 and kwargs.get('accelerator') not in (None, 'cpu'):
+        print_warning("--cpu-processes solo se aplica con --accelerator cpu; se ignora")
+        cpu_processes = 1
+    base_learning_rate = learning_rate
+    # Con N procesos data-parallel el batch efectivo también se multiplica por N
+    lr_factor = accumulate_grad_batches * cpu_processes
+    learning_rate = scale_learning_rate(learning_rate, lr_factor, lr_scaling)
+    # Valores pedidos explícitamente (CLI, YAML o entorno): tienen prioridad sobre split.json
+    requested_split = {}
+    if kwargs.get('validation_split') or os.environ.get('VALIDATION_SPLIT'):
+        requested_split['validation_split'] = (kwargs.get('validation_split')
+                                               or float(os.environ['VALIDATION_SPLIT']))
+    if kwargs.get('num_test_examples') or os.environ.get('NUM_TEST_EXAMPLES'):
+        requested_split['num_test_examples'] = (kwargs.get('num_test_examples')
+                                                or int(os.environ['NUM_TEST_EXAMPLES']))
+    validation_split = requested_split.get('validation_split', 0.05)
+    num_test_examples = requested_split.get('num_test_examples', 5)
+    dataset_audio = read_dataset_audio_config(dataset_path)
+    quality = kwargs.get('quality') or os.environ.get('QUALITY') or dataset_audio.get('quality') or DEFAULT_QUALITY
     precision = kwargs.get('precision') or os.environ.get('PRECISION', '16-mixed')
+    patience = kwargs.get('patience')
+    if patience is None:
+        patience = int(os.environ.get('PATIENCE', 5000))
+    min_delta = kwargs.get('min_delta')
+    if min_delta is None:
+        min_delta = float(os.environ.get('MIN_DELTA', 0.0))
+    supervise = bool(kwargs.get('supervise'))
+    max_oom_retries = kwargs.get('max_oom_retries')
+    if max_oom_retries is None:
+        max_oom_retries = int(os.environ.get('MAX_OOM_RETRIES', 3))
+    keep_checkpoints = kwargs.get('keep_checkpoints')
+    if keep_checkpoints is None:
+        keep_checkpoints = int(os.environ.get('KEEP_CHECKPOINTS', DEFAULT_KEEP_TOP_K))
+    
+    # División precalculada en el preprocesamiento (split_dataset.py)
+    split_meta = None if kwargs.get('no_split') else load_split_meta(dataset_path)
+    if split_meta:
+        changed = {key: value for key, value in requested_split.items() if split_meta[key] != value}
+        if changed:
+            print_warning("La división precalculada usa " + ", ".join(
+                f"{key}={split_meta[key]}" for key in changed) + "; se regenera con " + ", ".join(
+                f"{key}={value}" for key, value in changed.items()))
+            try:
+                split_meta = create_split(dataset_path, validation_split, num_test_examples,
+                                          split_meta['seed'], split_meta['num_buckets'])
+            except (OSError, ValueError) as e:
+                print_warning(f"No se pudo regenerar la división ({e}); piper_train dividirá al azar")
+                split_meta = None
+    if split_meta:
+        validation_split = split_meta['validation_split']
+        num_test_examples = split_meta['num_test_examples']
     
     # Mostrar configuración
     print_info("Configuración de entrenamiento:")
     print(f"  Dataset: {dataset_dir}")
-    print(f"  Batch size: {batch_size}")
+    if auto_batch:
+        print("  Batch size: auto (búsqueda bajo presupuesto de memoria)")
+    else:
+        print(f"  Batch size: {batch_size}")
+    if accumulate_grad_batches > 1:
+        effective = f"{batch_size * lr_factor}" if batch_size else "auto"
+        print(f"  Acumulación de gradientes: {accumulate_grad_batches} micro-batches "
+              f"(batch efectivo: {effective})")
+    if cpu_processes > 1:
+        threads = threads_per_process or 'núcleos / procesos'
+        print(f"  Data-parallel en CPU: {cpu_processes} procesos (gloo), hilos por proceso: {threads}")
     print(f"  Épocas máximas: {max_epochs}")
-    print(f"  Tasa de aprendizaje: {learning_rate}")
+    if learning_rate != base_learning_rate:
+        print(f"  Tasa de aprendizaje: {learning_rate:.6g} "
+              f"({base_learning_rate} escalada '{lr_scaling}' x{lr_factor})")
+    else:
+        print(f"  Tasa de aprendizaje: {learning_rate}")
     print(f"  Calidad: {quality}")
     print(f"  Precisión: {precision}")
     print(f"  Validación: {validation_split*100:.1f}%")
+    if patience:
+        print(f"  Early stopping: {patience} épocas sin mejora de val_loss (min_delta {min_delta})")
+    else:
+        print("  Early stopping: desactivado")
+    if supervise:
+        print(f"  Modo supervisado: hasta {max_oom_retries} reintentos tras OOM")
+    if dataset_cache:
+        # Cada proceso data-parallel carga su propia caché
+        cache_paths = dataset_tensor_paths(dataset_path)
+        cache_size = estimate_cache_bytes(cache_paths)
+        cache_budget = int(cache_budget_gb * 1024 ** 3) if cache_budget_gb else default_cache_budget()
+        if not cache_paths or cache_size is None:
+            print_warning("Faltan archivos .pt del dataset; la caché en memoria no se usará")
+            dataset_cache = False
+        elif cache_budget is not None and cache_size * cpu_processes > cache_budget:
+            print_warning(f"La caché del dataset ({format_bytes(cache_size * cpu_processes)}) supera el "
+                          f"presupuesto de RAM ({format_bytes(cache_budget)}); se leerá del disco")
+            dataset_cache = False
+        else:
+            print(f"  Caché del dataset: ~{format_bytes(cache_size * cpu_processes)} en memoria compartida "
+                  f"(presupuesto {format_bytes(cache_budget)})")
+    if async_test_examples and not benchmark_steps:
+        if not num_test_examples:
+            async_test_examples = False
+        elif not onnxruntime_available():
+            print_warning("--async-test-examples necesita onnxruntime (pip install onnxruntime); "
+                          "piper_train sintetizará los ejemplos durante la validación")
+            async_test_examples = False
+        else:
+            print(f"  Ejemplos de prueba: {num_test_examples} frases por checkpoint, en un proceso "
+                  f"aparte de baja prioridad (<checkpoint>.ejemplos/)")
+    if benchmark_steps:
+        print(f"  Benchmark: {benchmark_steps} pasos medidos + {benchmark_warmup} de calentamiento "
+              f"(no se guardan checkpoints)")
+    elif profile_steps:
+        print(f"  Perfil: pasos {profile_steps[0]} a {profile_steps[1] - 1} (torch.profiler, "
+              f"traza y tabla en {checkpoint_path})")
+    if split_meta:
+        counts = split_meta['counts']
+        print(f"  División: precalculada (semilla {split_meta['seed']}, "
+              f"train={counts['train']}, val={counts['val']}, test={counts['test']})")
+    elif (dataset_path / SPLIT_DIR).exists() and not kwargs.get('no_split'):
+        print_warning("La división precalculada no corresponde al dataset.jsonl actual; "
+                      "regenérala con: python scripts/split_dataset.py")
+    
+    dataset_sr = dataset_audio.get('sample_rate')
+    if dataset_sr and dataset_sr != sample_rate_for_quality(quality):
+        print_warning(f"El dataset está a {dataset_sr} Hz pero la calidad '{quality}' usa "
+                      f"{sample_rate_for_quality(quality)} Hz")
+        print_info(f"Repite el preprocesamiento con: python scripts/preprocess.py ... --quality {quality}")
     
     if checkpoint_base:
         print_info(f"Transfer learning desde: {checkpoint_base}")
@@ -256,10 +647,11 @@ def train_model(dataset_dir, checkpoint_base=None, checkpoint_dir='./checkpoints
     
     print()
     
-    # Configurar variables de entorno para ROCm (AMD GPU) si es Linux
-    if sys.platform == 'linux':
-        os.environ['HSA_OVERRIDE_GFX_VERSION'] = '10.3.0'
-        os.environ['PYTORCH_HIP_ALLOC_CONF'] = 'max_split_size_mb:512'
+    # Variables de entorno para ROCm (AMD GPU), solo con PyTorch compilado
+    # para ROCm y sin pisar los valores que ya haya fijado el usuario
+    if sys.platform == 'linux' and is_rocm_build():
+        os.environ.setdefault('HSA_OVERRIDE_GFX_VERSION', '10.3.0')
+        os.environ.setdefault('PYTORCH_HIP_ALLOC_CONF', 'max_split_size_mb:512')
     
     # Verificar GPU
     print_info("Verificando GPU disponible...")
@@ -267,7 +659,7 @@ def train_model(dataset_dir, checkpoint_base=None, checkpoint_dir='./checkpoints
     print()
     
     # Preguntar confirmación (solo si es interactivo)
-    if sys.stdin.isatty():
+    if sys.stdin.isatty() and not benchmark_steps:
         try:
             response = input("¿Continuar con el entrenamiento? (s/N): ")
             if response.lower() not in ['s', 'si', 'y', 'yes']:
@@ -278,82 +670,233 @@ def train_model(dataset_dir, checkpoint_base=None, checkpoint_dir='./checkpoints
             print_info("Entrenamiento cancelado")
             return False
     
-    # Crear script de monitoreo
-    monitor_script = create_monitor_script(checkpoint_path)
-    
-    print_info("Iniciando entrenamiento...")
-    print_info(f"Los checkpoints se guardarán en: {checkpoint_dir}")
-    print_info(f"Para monitorear el progreso:")
-    if sys.platform == 'win32':
-        print(f"  python {monitor_script}")
-    else:
-        print(f"  python {monitor_script}")
-        print(f"  # O para GPU: watch -n 2 'rocm-smi' (AMD) o 'nvidia-smi' (NVIDIA)")
-    print_info(f"Log de entrenamiento: {checkpoint_path / 'training.log'}")
-    print()
+    if not benchmark_steps:
+        # Crear script de monitoreo
+        monitor_script = create_monitor_script(checkpoint_path)
+        
+        print_info("Iniciando entrenamiento...")
+        print_info(f"Los checkpoints se guardarán en: {checkpoint_dir}")
+        print_info(f"Para monitorear el progreso:")
+        if sys.platform == 'win32':
+            print(f"  python {monitor_script}")
+        else:
+            print(f"  python {monitor_script}")
+            print(f"  # O para GPU: watch -n 2 'rocm-smi' (AMD) o 'nvidia-smi' (NVIDIA)")
+        print_info(f"Log de entrenamiento: {checkpoint_path / 'training.log'}")
+        print_info(f"Métricas (JSONL): {checkpoint_path / 'metrics.jsonl'}")
+        print()
     
-    # Determinar acelerador
+    # Determinar acelerador (configurado explícitamente o detectado)
     accelerator = 'gpu'
     devices = '1'
     
-    try:
-        import torch
-        if not torch.cuda.is_available():
-            try:
-                import torch_directml
-                if torch_directml.is_available():
-                    accelerator = 'dml'
-                    print_info("Usando acelerador: DirectML")
-                else:
+    if kwargs.get('accelerator'):
+        accelerator = kwargs['accelerator']
+        devices = 'auto' if accelerator == 'cpu' else '1'
+        print_info(f"Usando acelerador configurado: {accelerator}")
+    else:
+        try:
+            import torch
+            if not torch.cuda.is_available():
+                try:
+                    import torch_directml
+                    if torch_directml.is_available():
+                        accelerator = 'dml'
+                        print_info("Usando acelerador: DirectML")
+                    else:
+                        accelerator = 'cpu'
+                        devices = 'auto'
+                        print_warning("No se detectó GPU, usando CPU")
+                except ImportError:
                     accelerator = 'cpu'
                     devices = 'auto'
                     print_warning("No se detectó GPU, usando CPU")
-            except ImportError:
-                accelerator = 'cpu'
-                devices = 'auto'
-                print_warning("No se detectó GPU, usando CPU")
-    except ImportError:
-        pass
+        except ImportError:
+            pass
+    devices = kwargs.get('devices') or devices
+    if cpu_processes > 1:
+        if accelerator != 'cpu':
+            print_warning("Data-parallel en CPU desactivado: el acelerador no es CPU")
+            cpu_processes = 1
+            lr_factor = accumulate_grad_batches
+            learning_rate = scale_learning_rate(base_learning_rate, lr_factor, lr_scaling)
+        else:
+            devices = str(cpu_processes)
 
+    if auto_batch:
+        budget = int(memory_budget_gb * 1024 ** 3) if memory_budget_gb else default_budget(accelerator)
+        if budget and cpu_processes > 1:
+            # El sondeo usa un proceso; cada proceso del grupo tendrá su batch
+            budget //= cpu_processes
+        print_info("Buscando el batch size máximo con las frases más largas del dataset...")
+        batch_size, probes = find_max_batch_size(dataset_path, budget, accelerator=accelerator,
+                                                 devices='1' if cpu_processes > 1 else devices,
+                                                 precision=precision, quality=quality)
+        if batch_size == 0:
+            print_error("Ni siquiera batch size 1 cabe en el presupuesto de memoria")
+            for line in probes[-1].get('log_tail', []) if probes else []:
+                print(f"  {line}")
+            return False
+        peak = next(p['peak_bytes'] for p in probes if p['batch_size'] == batch_size)
+        print_info(f"Batch size seleccionado: {batch_size} (pico {format_bytes(peak)})")
+        if accumulate_grad_batches > 1:
+            print_info(f"Batch efectivo: {batch_size} x {lr_factor} = {batch_size * lr_factor}")
+        print()
+
+    # Hilos, afinidad y workers del DataLoader
+    tuning = None
+    if accelerator == 'cpu':
+        tuning = select_cpu_tuning(cpu_tuning, dataset_path, cpu_processes, batch_size, quality)
+    if tuning:
+        if threads_per_process:
+            tuning['threads'] = threads_per_process
+        if dataloader_workers is not None:
+            tuning['dataloader_workers'] = dataloader_workers
+        print_info(f"Ajuste de CPU: {tuning['threads']} hilos por proceso "
+                   f"(inter-op {tuning['interop_threads']}), "
+                   f"{tuning['dataloader_workers']} workers del DataLoader")
+
+    # Opciones de rendimiento del lanzador (procesos, hilos, workers)
+    performance_options = []
+    if cpu_processes > 1:
+        performance_options.extend(['--cpu-workers', str(cpu_processes)])
+    if tuning:
+        performance_options.extend(launcher_args(tuning))
+    else:
+        if threads_per_process:
+            performance_options.extend(['--threads-per-worker', str(threads_per_process)])
+        if dataloader_workers is not None:
+            performance_options.extend(['--dataloader-workers', str(dataloader_workers)])
+    if accelerator == 'gpu':
+        performance_options.append('--pin-memory')
+    if dataset_cache:
+        performance_options.append('--dataset-cache')
+        if cache_budget:
+            performance_options.extend(['--cache-budget-gb', f"{cache_budget / 1024 ** 3:.3f}"])
+    
+    def model_args(run_batch_size, accumulate):
+        args = [
+            '--dataset-dir', str(dataset_path),
+            '--accelerator', accelerator,
+            '--devices', devices,
+            '--batch-size', str(run_batch_size),
+            '--precision', precision,
+            '--quality', quality,
+            '--learning-rate', str(learning_rate),
+        ]
+        if accumulate > 1:
+            args.extend(['--accumulate_grad_batches', str(accumulate)])
+        if cpu_processes > 1:
+            args.extend(['--strategy', 'ddp'])
+        return args
+    
+    if benchmark_steps:
+        config = {
+            'batch_size': batch_size,
+            'accumulate_grad_batches': accumulate_grad_batches,
+            'processes': cpu_processes,
+            'precision': precision,
+            'quality': quality,
+            'accelerator': accelerator,
+            'devices': devices,
+        }
+        if tuning:
+            config.update({k: v for k, v in tuning.items() if k != 'cores'})
+        return run_training_benchmark(
+            [sys.executable, str(LAUNCHER_PATH)] + performance_options,
+            model_args(batch_size, accumulate_grad_batches), dataset_path,
+            checkpoint_path / 'benchmark.log', config, benchmark_steps, benchmark_warmup,
+            kwargs.get('benchmark_history') or HISTORY_FILE)
+    
     # Construir comando de entrenamiento
-    cmd = [
-        sys.executable, '-m', 'piper_train',
-        '--dataset-dir', str(dataset_path),
-        '--accelerator', accelerator,
-        '--devices', devices,
-        '--batch-size', str(batch_size),
-        '--validation-split', str(validation_split),
-        '--num-test-examples', str(num_test_examples),
-        '--max_epochs', str(max_epochs),
-        '--checkpoint-epochs', str(checkpoint_epochs),
-        '--precision', precision,
-        '--quality', quality,
-        '--learning-rate', str(learning_rate),
-    ]
+    launcher = [sys.executable, str(LAUNCHER_PATH), '--emit-metrics',
+                '--checkpoint-dir', str(checkpoint_path),
+                '--keep-top-k', str(keep_checkpoints),
+                '--checkpoint-epochs', str(checkpoint_epochs)]
+    if patience:
+        launcher.extend(['--patience', str(patience), '--min-delta', str(min_delta)])
+    if split_meta:
+        launcher.extend(['--split-dir', str(dataset_path / SPLIT_DIR)])
+    if telemetry_interval > 0:
+        launcher.extend(['--live-stats', str(checkpoint_path / LIVE_STATS_FILE)])
+    if async_test_examples:
+        launcher.append('--no-test-audio')
+    if profile_steps:
+        launcher.extend(['--profile-steps', f"{profile_steps[0]}:{profile_steps[1]}",
+                         '--profile-dir', str(checkpoint_path)])
+    launcher.extend(performance_options)
+    launcher.append('--')
     
-    if checkpoint_base:
-        cmd.extend(['--resume-from-checkpoint', checkpoint_base])
+    def build_command(run_batch_size, accumulate, resume_checkpoint):
+        cmd = launcher + model_args(run_batch_size, accumulate) + [
+            '--validation-split', str(validation_split),
+            '--num-test-examples', str(num_test_examples),
+            '--max_epochs', str(max_epochs),
+            '--checkpoint-epochs', str(checkpoint_epochs),
+        ]
+        if resume_checkpoint:
+            cmd.extend(['--resume_from_checkpoint', str(resume_checkpoint)])
+        return cmd
     
     # Ejecutar entrenamiento y guardar log
     log_path = checkpoint_path / 'training.log'
+    log_max_mb = kwargs.get('log_max_mb') or float(os.environ.get('LOG_MAX_MB', 100))
+    # Cada proceso data-parallel entrena su propio batch en cada paso
+    metrics = MetricsStream(checkpoint_path / 'metrics.jsonl', batch_size * cpu_processes, max_epochs,
+                            accumulate_grad_batches=accumulate_grad_batches)
+    checkpoints = CheckpointManager(checkpoint_path, keep_checkpoints)
+    metrics.add_listener(checkpoints.on_metrics)
+    log_writer = BackgroundLogWriter(log_path, max_bytes=int(log_max_mb * 1024 * 1024))
+    console = ConsoleThrottle()
+    telemetry = None
+    if telemetry_interval > 0:
+        telemetry = TelemetrySampler(checkpoint_path / TELEMETRY_FILE, telemetry_interval,
+                                     metrics.position, checkpoint_path / LIVE_STATS_FILE)
+    test_examples = None
+    if async_test_examples:
+        # Núcleos que no usa el entrenamiento en CPU; con GPU, los últimos de la máquina
+        test_examples = AsyncTestExamples(dataset_path, num_test_examples,
+                                          checkpoint_path / EXAMPLES_LOG_FILE,
+                                          spare_cores(busy=tuning.get('cores') if tuning else None))
+        metrics.add_listener(test_examples.on_metrics)
+    
+    run_batch_size = batch_size
+    accumulate = accumulate_grad_batches
+    effective_batch = batch_size * accumulate
+    resume_checkpoint = checkpoint_base
+    oom_retries = 0
     try:
-        with open(log_path, 'w', encoding='utf-8') as log_file:
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
-            )
-            
-            # Mostrar output en tiempo real y guardar en log
-            for line in process.stdout:
-                print(line, end='')
-                log_file.write(line)
-                log_file.flush()
+        while True:
+            exit_code, saw_oom = run_training_process(
+                build_command(run_batch_size, accumulate, resume_checkpoint),
+                console, log_writer, metrics, telemetry)
+            console.close()
+            if exit_code == 0 or not supervise or not is_oom_exit(exit_code, saw_oom):
+                break
             
-            process.wait()
-            exit_code = process.returncode
+            # Modo supervisado: reintentar con la mitad del batch y acumulación de gradientes
+            if oom_retries >= max_oom_retries:
+                log_supervisor(checkpoint_path, log_writer,
+                               f"OOM (código {exit_code}); se agotaron los {max_oom_retries} reintentos")
+                break
+            if run_batch_size <= 1:
+                log_supervisor(checkpoint_path, log_writer,
+                               f"OOM (código {exit_code}) con batch size 1; no se puede reducir más")
+                break
+            oom_retries += 1
+            run_batch_size = max(1, run_batch_size // 2)
+            accumulate = math.ceil(effective_batch / run_batch_size)
+            latest = checkpoints.latest() or best_checkpoint(checkpoint_path)
+            if latest:
+                resume_checkpoint = latest
+            log_supervisor(
+                checkpoint_path, log_writer,
+                f"OOM (código {exit_code}); reintento {oom_retries}/{max_oom_retries} con "
+                f"batch size {run_batch_size} x acumulación {accumulate} "
+                f"(batch efectivo {run_batch_size * accumulate}), reanudando desde "
+                f"{resume_checkpoint or 'cero'}")
+            metrics.batch_size = run_batch_size * cpu_processes
+            metrics.accumulate_grad_batches = accumulate
     
     except FileNotFoundError:
         print_error("No se pudo ejecutar piper_train")
@@ -362,23 +905,43 @@ def train_model(dataset_dir, checkpoint_base=None, checkpoint_dir='./checkpoints
     except Exception as e:
         print_error(f"Error ejecutando entrenamiento: {e}")
         return False
+    finally:
+        console.close()
+        if telemetry:
+            telemetry.close()
+        log_writer.close()
+        metrics.close()
+        checkpoints.close()
+        if test_examples:
+            if test_examples.sent:
+                print_info("Esperando a los ejemplos de prueba del último checkpoint...")
+            if test_examples.close() != 0:
+                print_warning(f"Fallaron algunos ejemplos de prueba; revisa "
+                              f"{checkpoint_path / EXAMPLES_LOG_FILE}")
     
     if exit_code == 0:
         print()
         print_info("¡Entrenamiento completado!")
+        early_stop = metrics.last.get('early_stop')
+        if early_stop:
+            print_info(f"Detenido por early stopping en la época {early_stop['epoch']}: "
+                       f"val_loss sin mejorar en {early_stop['patience']} épocas "
+                       f"(mejor: {early_stop['best_val_loss']:.4f})")
         
-        # Buscar el último checkpoint
-        ckpt_files = sorted(checkpoint_path.glob("*.ckpt"), key=lambda p: p.stat().st_mtime, reverse=True)
+        # Mejor checkpoint por val_loss (o el más reciente si no hay índice)
+        best = checkpoints.best() or best_checkpoint(checkpoint_path)
+        latest = checkpoints.latest()
         
-        if ckpt_files:
-            last_checkpoint = ckpt_files[0]
-            print_info(f"Último checkpoint: {last_checkpoint}")
+        if best:
+            print_info(f"Mejor checkpoint (val_loss): {best}")
+            if latest and latest != best:
+                print_info(f"Último checkpoint: {latest}")
             print()
-            print_info("Siguiente paso: Exportar el modelo")
+            print_info("Siguiente paso: Exportar el modelo (usa el mejor checkpoint del directorio)")
             if sys.platform == 'win32':
-                print(f"  python scripts\\export.py {last_checkpoint} mi_modelo.onnx")
+                print(f"  python scripts\\export.py {checkpoint_path} mi_modelo.onnx")
             else:
-                print(f"  python scripts/export.py {last_checkpoint} mi_modelo.onnx")
+                print(f"  python scripts/export.py {checkpoint_path} mi_modelo.onnx")
         else:
             print_warning("No se encontraron checkpoints guardados")
         
@@ -388,12 +951,15 @@ def train_model(dataset_dir, checkpoint_base=None, checkpoint_dir='./checkpoints
         print_error(f"El entrenamiento falló con código de salida {exit_code}")
         print_info(f"Revisa el log en: {log_path}")
         
-        if exit_code == 137:
-            print_error("Error 137: Out of Memory (OOM)")
+        if is_oom_exit(exit_code, saw_oom):
+            print_error(f"Error {exit_code}: Out of Memory (OOM)")
             print_info("Soluciones:")
-            print(f"  1. Reduce el batch size: --batch-size 4")
+            print(f"  1. Reduce el batch size y mantén el batch efectivo acumulando gradientes: "
+                  f"--batch-size {max(1, run_batch_size // 2)} --accumulate-grad-batches {accumulate * 2}")
             print(f"  2. Cierra otras aplicaciones que usen GPU")
             print(f"  3. Reduce la resolución/calidad del modelo: --quality low")
+            if not supervise:
+                print(f"  4. Usa --supervise para reintentar automáticamente con un batch menor")
         
         return False
 
@@ -407,13 +973,36 @@ def main():
 Ejemplos:
   python train.py dataset_procesado modelos_base/es_ES-sharvard-medium.ckpt
   python train.py dataset_procesado --batch-size 4 --max-epochs 5000
+  python train.py dataset_procesado --batch-size auto --memory-budget-gb 10
+  python train.py dataset_procesado --batch-size 4 --accumulate-grad-batches 8
+  python train.py dataset_procesado --accelerator cpu --cpu-processes 8
+  python train.py dataset_procesado --benchmark-steps 50 --batch-size 16 --precision 32
+  python train.py dataset_procesado --profile-steps 100:110
   python train.py dataset_procesado --quality low
+  python train.py dataset_procesado --config config.example.yaml
+  python train.py dataset_procesado --profile fast-cpu-smoke
 
 Parámetros de entorno:
-  BATCH_SIZE      - Tamaño del batch (por defecto: 8)
+  BATCH_SIZE      - Tamaño del batch o 'auto' (por defecto: 8)
+  MEMORY_BUDGET_GB - Presupuesto de memoria para --batch-size auto
   MAX_EPOCHS      - Número máximo de épocas (por defecto: 10000)
   LEARNING_RATE   - Tasa de aprendizaje (por defecto: 1e-4)
+  ACCUMULATE_GRAD_BATCHES - Micro-batches por paso del optimizador (por defecto: 1)
+  CPU_PROCESSES   - Procesos data-parallel en CPU (por defecto: 1)
+  THREADS_PER_PROCESS - Hilos por proceso con CPU_PROCESSES (por defecto: núcleos / procesos)
+  DATALOADER_WORKERS - Workers de los DataLoader (por defecto: según el ajuste de CPU)
+  CPU_TUNING      - Ajuste de hilos en CPU: auto, benchmark, off (por defecto: auto)
+  LR_SCALING      - Escalado de la tasa con la acumulación: none, linear, sqrt (por defecto: sqrt)
   QUALITY         - Calidad: x_low, low, medium, high (por defecto: medium)
+  PATIENCE        - Épocas sin mejora antes de parar, 0 = sin early stopping (por defecto: 5000)
+  MIN_DELTA       - Mejora mínima de val_loss (por defecto: 0.0)
+  KEEP_CHECKPOINTS - Mejores checkpoints a conservar (por defecto: 3)
+  MAX_OOM_RETRIES - Reintentos tras OOM con --supervise (por defecto: 3)
+  LOG_MAX_MB      - Tamaño de rotación de training.log en MB (por defecto: 100)
+  DATASET_CACHE   - 1 para cargar el dataset en memoria compartida (--dataset-cache)
+  CACHE_BUDGET_GB - RAM máxima para la caché del dataset (por defecto: 50% de la disponible)
+  ASYNC_TEST_EXAMPLES - 1 para sintetizar los ejemplos de prueba en otro proceso (--async-test-examples)
+  TELEMETRY_INTERVAL - Segundos entre muestras de telemetry.jsonl, 0 = desactivada (por defecto: 5)
         """
     )
     
@@ -431,14 +1020,47 @@ Parámetros de entorno:
     
     parser.add_argument(
         '--checkpoint-dir',
-        default='./checkpoints',
         help='Directorio para guardar checkpoints (por defecto: ./checkpoints)'
     )
     
     parser.add_argument(
         '--batch-size',
+        type=batch_size_arg,
+        help="Tamaño del batch, o 'auto' para buscar el máximo que cabe en memoria (por defecto: 8)"
+    )
+    
+    parser.add_argument(
+        '--memory-budget-gb',
+        type=float,
+        help='Presupuesto de memoria para --batch-size auto: VRAM en GPU, RSS en CPU '
+             '(por defecto: 90%% de la VRAM o 80%% de la RAM disponible)'
+    )
+    
+    parser.add_argument(
+        '--dataset-cache',
+        action='store_true',
+        default=None,
+        help='Cargar el audio y los espectrogramas una vez en memoria compartida para todos los '
+             'workers del DataLoader (se lee del disco si no cabe en --cache-budget-gb)'
+    )
+    
+    parser.add_argument(
+        '--cache-budget-gb',
+        type=float,
+        help='RAM máxima para --dataset-cache, sumando todos los procesos '
+             '(por defecto: 50%% de la RAM disponible)'
+    )
+    
+    parser.add_argument(
+        '--accumulate-grad-batches',
         type=int,
-        help='Tamaño del batch (por defecto: 8)'
+        help='Micro-batches por paso del optimizador; el batch efectivo es batch size x N (por defecto: 1)'
+    )
+    
+    parser.add_argument(
+        '--lr-scaling',
+        choices=LR_SCALING_MODES,
+        help='Escalado de la tasa de aprendizaje con la acumulación (por defecto: sqrt)'
     )
     
     parser.add_argument(
@@ -471,10 +1093,25 @@ Parámetros de entorno:
         help='Número de ejemplos de prueba (por defecto: 5)'
     )
     
+    parser.add_argument(
+        '--async-test-examples',
+        action='store_true',
+        default=None,
+        help='Sintetizar los ejemplos de prueba de cada checkpoint con onnxruntime en un proceso '
+             'de baja prioridad, sin detener el entrenamiento en cada validación'
+    )
+    
+    parser.add_argument(
+        '--no-split',
+        action='store_true',
+        default=None,
+        help='Ignorar la división precalculada (splits/) y dejar que piper_train divida al azar'
+    )
+    
     parser.add_argument(
         '--quality',
-        choices=['x_low', 'low', 'medium', 'high'],
-        help='Calidad del modelo (por defecto: medium)'
+        choices=QUALITIES,
+        help='Calidad del modelo (por defecto: la del dataset preprocesado o medium)'
     )
     
     parser.add_argument(
@@ -482,16 +1119,141 @@ Parámetros de entorno:
         help='Precisión de entrenamiento (por defecto: 16-mixed)'
     )
     
+    parser.add_argument(
+        '--patience',
+        type=int,
+        help='Early stopping: épocas sin mejora de val_loss antes de parar, 0 = desactivado (por defecto: 5000)'
+    )
+    
+    parser.add_argument(
+        '--min-delta',
+        type=float,
+        help='Mejora mínima de val_loss para reiniciar la paciencia (por defecto: 0.0)'
+    )
+    
+    parser.add_argument(
+        '--keep-checkpoints',
+        type=int,
+        help=f'Mejores checkpoints por val_loss a conservar, además del último (por defecto: {DEFAULT_KEEP_TOP_K})'
+    )
+    
+    parser.add_argument(
+        '--log-max-mb',
+        type=float,
+        help='Rotar training.log (comprimiendo con gzip) al superar estos MB (por defecto: 100)'
+    )
+    
+    parser.add_argument(
+        '--telemetry-interval',
+        type=float,
+        help=f'Segundos entre muestras de CPU, memoria, E/S y espera de datos en '
+             f'{TELEMETRY_FILE}; 0 la desactiva (por defecto: {DEFAULT_INTERVAL:g})'
+    )
+    
+    parser.add_argument(
+        '--supervise',
+        action='store_true',
+        default=None,
+        help='Modo supervisado: tras un OOM reanudar desde el último checkpoint con la mitad de batch '
+             'y acumulación de gradientes'
+    )
+    
+    parser.add_argument(
+        '--max-oom-retries',
+        type=int,
+        help='Reintentos máximos tras OOM en modo supervisado (por defecto: 3)'
+    )
+    
+    parser.add_argument(
+        '--accelerator',
+        choices=['gpu', 'cpu', 'dml'],
+        help='Acelerador de entrenamiento (por defecto: detección automática)'
+    )
+    
+    parser.add_argument(
+        '--devices',
+        help='Dispositivos para Lightning (por defecto: 1 en GPU, auto en CPU)'
+    )
+    
+    parser.add_argument(
+        '--cpu-processes',
+        type=int,
+        help='Entrenamiento data-parallel en CPU con N procesos (gloo), cada uno con su grupo de núcleos '
+             '(por defecto: 1)'
+    )
+    
+    parser.add_argument(
+        '--threads-per-process',
+        type=int,
+        help='Hilos de PyTorch por proceso con --cpu-processes (por defecto: núcleos / procesos)'
+    )
+    
+    parser.add_argument(
+        '--dataloader-workers',
+        type=int,
+        help='Workers de los DataLoader de piper_train (por defecto: según el ajuste de CPU)'
+    )
+    
+    parser.add_argument(
+        '--cpu-tuning',
+        choices=CPU_TUNING_MODES,
+        help='Ajuste de hilos, afinidad y workers en CPU: auto usa el último benchmark de esta máquina '
+             'o una heurística, benchmark lo mide antes de entrenar (por defecto: auto)'
+    )
+    
+    parser.add_argument(
+        '--benchmark-steps',
+        type=int,
+        help='Benchmark: entrenar N pasos sobre un subconjunto fijo del dataset, medir pasos/s, '
+             'muestras/s, audio/s y memoria pico, y añadirlo al historial (sin checkpoints)'
+    )
+    
+    parser.add_argument(
+        '--benchmark-warmup',
+        type=int,
+        help=f'Pasos de calentamiento que no se miden (por defecto: {DEFAULT_WARMUP_STEPS})'
+    )
+    
+    parser.add_argument(
+        '--benchmark-history',
+        help=f'Historial JSONL de benchmarks (por defecto: {HISTORY_FILE})'
+    )
+    
+    parser.add_argument(
+        '--profile-steps',
+        type=step_window_arg,
+        metavar='A:B',
+        help='Perfilar con torch.profiler los pasos A a B-1 y guardar en el directorio de '
+             'checkpoints una traza de Chrome y una tabla de operadores (ej: 100:110)'
+    )
+    
+    add_config_arguments(parser)
+    
     args = parser.parse_args()
     
+    try:
+        apply_config(args, [
+            'checkpoint_base', 'checkpoint_dir', 'batch_size', 'accumulate_grad_batches',
+            'lr_scaling', 'max_epochs', 'checkpoint_epochs',
+            'learning_rate', 'validation_split', 'num_test_examples', 'quality', 'precision',
+            'patience', 'min_delta', 'keep_checkpoints', 'accelerator', 'devices',
+            'cpu_processes', 'threads_per_process', 'dataloader_workers', 'cpu_tuning',
+            'supervise', 'max_oom_retries', 'memory_budget_gb', 'dataset_cache', 'cache_budget_gb',
+            'async_test_examples',
+        ])
+    except ValueError as e:
+        print_error(str(e))
+        sys.exit(1)
+    
     # Preparar kwargs con valores no-None
     kwargs = {k: v for k, v in vars(args).items() 
-              if v is not None and k not in ['dataset_dir', 'checkpoint_base', 'checkpoint_dir']}
+              if v is not None and k not in ['dataset_dir', 'checkpoint_base', 'checkpoint_dir',
+                                             'config', 'profile']}
     
     success = train_model(
         args.dataset_dir,
         args.checkpoint_base,
-        args.checkpoint_dir,
+        args.checkpoint_dir or './checkpoints',
         **kwargs
     )
     
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Verificación completa de integridad de un dataset preprocesado
+
+Recorre dataset.jsonl en streaming y comprueba en paralelo, entrada por
+entrada, que:
+  - los archivos referenciados (audio_norm_path, audio_spec_path, audio_path)
+    existen y se pueden cargar;
+  - los phoneme_ids están dentro de num_symbols de config.json;
+  - las longitudes son coherentes (espectrograma frente a audio, frases vacías).
+
+Se detiene en cuanto se supera el presupuesto de errores, así que un dataset
+roto de 200k frases se detecta en segundos y no tras horas de entrenamiento.
+
+Sin PyTorch instalado solo se comprueba que los .pt existen y tienen formato
+válido (no se cargan ni se comparan longitudes).
+
+Uso:
+    python verificar_dataset.py dataset_procesado --max-errors 20 --workers 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
+
+from limpiar_dataset import probe_wav
+from manifest import iter_dataset_entries
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+BATCH_SIZE = 64
+# Margen de frames entre espectrograma y audio (padding de la STFT)
+FRAME_TOLERANCE = 2
+
+
+def _resolve(dataset_path, value):
+    path = Path(value)
+    return path if path.is_absolute() else dataset_path / path
+
+
+def _load_tensor(path):
+    """Carga un .pt de Piper; sin torch solo valida el contenedor"""
+    if torch is None:
+        if path.stat().st_size == 0:
+            raise ValueError("archivo vacío")
+        if not zipfile.is_zipfile(path):
+            # Formato antiguo de torch.save (pickle): al menos debe empezar como pickle
+            with open(path, 'rb') as f:
+                if f.read(1) != b'\x80':
+                    raise ValueError("no es un archivo de PyTorch")
+        return None
+    try:
+        return torch.load(path, map_location='cpu', weights_only=True)
+    except TypeError:
+        return torch.load(path, map_location='cpu')
+
+
+def check_entry(dataset_path, line_number, entry, num_symbols, hop_length):
+    """
+    Comprueba una entrada del dataset
+
+    Returns:
+        list: Mensajes de error (vacía si la entrada es correcta)
+    """
+    if entry is None:
+        return [f"Línea {line_number}: JSON inválido"]
+
+    errors = []
+    phoneme_ids = entry.get('phoneme_ids')
+    if not isinstance(phoneme_ids, list) or not phoneme_ids:
+        errors.append(f"Línea {line_number}: phoneme_ids vacío o con formato inválido")
+    elif num_symbols:
+        bad = [p for p in phoneme_ids if not isinstance(p, int) or p < 0 or p >= num_symbols]
+        if bad:
+            errors.append(f"Línea {line_number}: phoneme_ids fuera de rango [0, {num_symbols}): "
+                          f"{sorted(set(bad))[:5]}")
+
+    audio = spec = None
+    for field in ('audio_norm_path', 'audio_spec_path'):
+        value = entry.get(field)
+        if not value:
+            errors.append(f"Línea {line_number}: falta {field}")
+            continue
+        path = _resolve(dataset_path, value)
+        if not path.exists():
+            errors.append(f"Línea {line_number}: {field} no existe - {value}")
+            continue
+        try:
+            tensor = _load_tensor(path)
+        except Exception as e:
+            errors.append(f"Línea {line_number}: {field} no se puede cargar - {e}")
+            continue
+        if field == 'audio_norm_path':
+            audio = tensor
+        else:
+            spec = tensor
+
+    audio_path = entry.get('audio_path')
+    if audio_path:
+        wav = _resolve(dataset_path, audio_path)
+        if wav.exists():
+            duration, info = probe_wav(wav)
+            if duration is None:
+                errors.append(f"Línea {line_number}: audio_path no se puede leer - {info}")
+            elif duration <= 0:
+                errors.append(f"Línea {line_number}: audio_path vacío - {audio_path}")
+
+    if audio is not None and spec is not None:
+        num_samples = audio.shape[-1]
+        num_frames = spec.shape[-1]
+        expected = num_samples // hop_length
+        if num_samples == 0 or num_frames == 0:
+            errors.append(f"Línea {line_number}: audio o espectrograma vacío")
+        elif abs(num_frames - expected) > FRAME_TOLERANCE:
+            errors.append(f"Línea {line_number}: espectrograma con {num_frames} frames, "
+                          f"se esperaban ~{expected} ({num_samples} muestras / hop {hop_length})")
+        elif phoneme_ids and len(phoneme_ids) > num_frames:
+            errors.append(f"Línea {line_number}: más fonemas ({len(phoneme_ids)}) que frames "
+                          f"de espectrograma ({num_frames})")
+    return errors
+
+
+def _check_batch(dataset_dir, batch, num_symbols, hop_length):
+    dataset_path = Path(dataset_dir)
+    errors = []
+    for line_number, entry in batch:
+        errors.extend((line_number, message) for message in
+                      check_entry(dataset_path, line_number, entry, num_symbols, hop_length))
+    return len(batch), errors
+
+
+def read_dataset_config(dataset_dir):
+    """Devuelve (num_symbols, hop_length) de config.json"""
+    try:
+        with open(Path(dataset_dir) / "config.json", 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return None, 256
+    num_symbols = config.get('num_symbols')
+    if not num_symbols and config.get('phoneme_id_map'):
+        ids = [i for values in config['phoneme_id_map'].values() for i in values]
+        num_symbols = max(ids) + 1 if ids else None
+    hop_length = (config.get('audio') or {}).get('hop_length', 256)
+    return num_symbols, hop_length
+
+
+def verify_dataset(dataset_dir, max_errors=20, workers=None, progress=True):
+    """
+    Verifica el dataset deteniéndose al superar ``max_errors``
+
+    Returns:
+        dict: {'checked', 'errors' (lista), 'stopped_early', 'seconds'}
+    """
+    num_symbols, hop_length = read_dataset_config(dataset_dir)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+
+    start = time.perf_counter()
+    checked = 0
+    errors = []
+    stopped_early = False
+    entries = iter_dataset_entries(dataset_dir)
+
+    def collect(done):
+        nonlocal checked
+        for future in done:
+            count, batch_errors = future.result()
+            checked += count
+            errors.extend(batch_errors)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        while True:
+            if len(errors) > max_errors:
+                stopped_early = True
+                break
+            batch = list(islice(entries, BATCH_SIZE))
+            if not batch:
+                break
+            pending.add(pool.submit(_check_batch, str(dataset_dir), batch, num_symbols, hop_length))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+                if progress:
+                    rate = checked / max(time.perf_counter() - start, 1e-9)
+                    print(f"\r  Verificadas: {checked} ({rate:.0f}/s), errores: {len(errors)}",
+                          end='', flush=True)
+        if stopped_early:
+            for future in pending:
+                future.cancel()
+            pending = {f for f in pending if not f.cancelled()}
+        done, _ = wait(pending)
+        collect(done)
+
+    if progress:
+        print()
+    return {
+        'checked': checked,
+        'errors': [message for _, message in sorted(errors)],
+        'stopped_early': stopped_early,
+        'seconds': time.perf_counter() - start,
+        'num_symbols': num_symbols,
+        'deep': torch is not None,
+    }
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Verifica en paralelo la integridad de un dataset preprocesado de Piper'
+    )
+    parser.add_argument(
+        'dataset_dir',
+        help='Dataset preprocesado (con dataset.jsonl y config.json)'
+    )
+    parser.add_argument(
+        '--max-errors',
+        type=int,
+        default=20,
+        help='Detener tras superar este número de errores (por defecto: 20)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Procesos de verificación (por defecto: número de CPUs)'
+    )
+
+    args = parser.parse_args()
+
+    if not (Path(args.dataset_dir) / "dataset.jsonl").exists():
+        print(f"  ❌ No se encontró dataset.jsonl en {args.dataset_dir}")
+        sys.exit(1)
+
+    result = verify_dataset(args.dataset_dir, args.max_errors, args.workers,
+                            progress=sys.stdout.isatty())
+
+    if not result['deep']:
+        print("  ⚠️  PyTorch no está instalado: los .pt no se cargan ni se comparan longitudes")
+    if result['num_symbols'] is None:
+        print("  ⚠️  config.json sin num_symbols: no se comprueba el rango de phoneme_ids")
+
+    shown = max(args.max_errors, 1)
+    for error in result['errors'][:shown]:
+        print(f"  ❌ {error}")
+    if len(result['errors']) > shown:
+        print(f"  ... y {len(result['errors']) - shown} errores más")
+
+    rate = result['checked'] / max(result['seconds'], 1e-9)
+    print(f"  Entradas verificadas: {result['checked']} en {result['seconds']:.1f}s ({rate:.0f}/s)")
+    if result['stopped_early']:
+        print(f"  ❌ Verificación detenida: se superó el límite de {args.max_errors} errores")
+
+    sys.exit(1 if result['errors'] else 0)
+
+
+if __name__ == '__main__':
+    main()
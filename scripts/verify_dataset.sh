@@ -29,6 +29,7 @@ if [ $# -lt 1 ]; then
 fi
 
 DATASET_DIR="$1"
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
 if [ ! -d "$DATASET_DIR" ]; then
     print_error "El directorio no existe: $DATASET_DIR"
@@ -76,7 +77,8 @@ if [ -f "$DATASET_DIR/dataset.jsonl" ]; then
         fi
     fi
     
-    python3 << PYTHON_SCRIPT
+    if python3 << PYTHON_SCRIPT
+import itertools
 import json
 import sys
 from pathlib import Path
@@ -87,18 +89,33 @@ jsonl_file = dataset_dir / "dataset.jsonl"
 errors = 0
 warnings = 0
 
-# Leer todas las entradas
-entries = []
-with open(jsonl_file, 'r', encoding='utf-8') as f:
-    for i, line in enumerate(f, 1):
-        try:
-            entry = json.loads(line)
-            entries.append(entry)
-        except json.JSONDecodeError as e:
-            print(f"  ❌ Línea {i}: JSON inválido - {e}")
-            errors += 1
+sys.path.insert(0, "$SCRIPT_DIR")
+try:
+    from manifest import load_manifest
+    manifest = load_manifest(dataset_dir)
+except ImportError:
+    manifest = None
+
+if manifest is not None:
+    # El manifiesto solo se genera a partir de JSON válido y se invalida si
+    # dataset.jsonl cambia: basta con leer las primeras entradas
+    print("  📦 Usando manifiesto columnar (manifest/)")
+    num_entries = len(manifest)
+    entries = list(itertools.islice(manifest.entries(), 10))
+else:
+    # Leer todas las entradas
+    entries = []
+    with open(jsonl_file, 'r', encoding='utf-8') as f:
+        for i, line in enumerate(f, 1):
+            try:
+                entry = json.loads(line)
+                entries.append(entry)
+            except json.JSONDecodeError as e:
+                print(f"  ❌ Línea {i}: JSON inválido - {e}")
+                errors += 1
+    num_entries = len(entries)
 
-print(f"  Total de entradas: {len(entries)}")
+print(f"  Total de entradas: {num_entries}")
 
 # Verificar campos requeridos
 required_fields = ['audio_file', 'text', 'phoneme_ids', 'audio_norm_path', 'audio_spec_path']
@@ -133,8 +150,7 @@ if entries:
 
 sys.exit(errors)
 PYTHON_SCRIPT
-    
-    if [ $? -eq 0 ]; then
+    then
         echo "  ✅ dataset.jsonl válido"
     else
         ERRORS=$((ERRORS + 1))
@@ -142,6 +158,17 @@ PYTHON_SCRIPT
 fi
 echo ""
 
+# Verificación completa: todas las entradas, en paralelo, con límite de errores
+if [ -f "$DATASET_DIR/dataset.jsonl" ]; then
+    print_info "Verificando integridad de todas las entradas (máx. ${MAX_ERRORS:-20} errores)..."
+    if python3 "$SCRIPT_DIR/verificar_dataset.py" "$DATASET_DIR" --max-errors "${MAX_ERRORS:-20}"; then
+        echo "  ✅ Archivos, phoneme_ids y longitudes correctos"
+    else
+        ERRORS=$((ERRORS + 1))
+    fi
+fi
+echo ""
+
 # Verificar configuración
 if [ -f "$DATASET_DIR/config.json" ]; then
     print_info "Verificando config.json..."